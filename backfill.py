@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Backfill the tweet queue from an archive of past newsletters
+
+Streams an mbox file (memory-mapped, one message at a time) or a Maildir
+directory and generates tweets for many newsletters concurrently. Results go
+into the tweet queue like any other generated tweets.
+
+- Newsletters are deduplicated by Message-ID (by content if there is none)
+  against everything processed before, including by the live bot. Only the
+  headers are parsed for messages that turn out to be duplicates.
+- Progress is checkpointed in the state database. An interrupted backfill
+  resumes from the first newsletter that was not finished; failed ones are
+  retried on the next run.
+- Throughput is reported in newsletters per minute.
+
+Examples:
+    python backfill.py archive.mbox --concurrency 4
+    python backfill.py ~/Maildir/newsletters --sender news@smol.ai --limit 200
+    python backfill.py archive.mbox --dry-run
+"""
+
+import argparse
+import contextvars
+import json
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.parser import BytesHeaderParser
+from dotenv import load_dotenv
+from gmail_ingest import parse_newsletter
+from llm import generate_tweets_for_newsletter
+from logger_config import get_logger, shutdown_logging
+from newsletter_cache import get_newsletter_cache, newsletter_key
+from state_db import get_connection
+from tracing import span
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("backfill")
+
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+# How often progress is logged and the checkpoint written
+PROGRESS_INTERVAL = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    archive TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    generated INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def iter_mbox(path, start=0):
+    """Yield (offset, raw message bytes) from an mbox file, starting at byte `start`
+
+    The file is memory-mapped and split on "From " separator lines, so only
+    the message being handed out is copied into memory.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            if start == 0 and mm[:5] == b"From ":
+                offset = 0
+            else:
+                # First separator at or after `start`
+                separator = mm.find(b"\nFrom ", max(start - 1, 0))
+                if separator == -1:
+                    return
+                offset = separator + 1
+            while offset < size:
+                separator = mm.find(b"\nFrom ", offset)
+                end = size if separator == -1 else separator + 1
+                # Drop the "From sender date" envelope line
+                line_end = mm.find(b"\n", offset, end)
+                yield offset, mm[end if line_end == -1 else line_end + 1:end]
+                offset = end
+
+
+def maildir_files(path):
+    """Message files of a Maildir, oldest delivery first"""
+    names = []
+    for folder in ("cur", "new"):
+        directory = os.path.join(path, folder)
+        if os.path.isdir(directory):
+            names.extend(os.path.join(directory, name) for name in os.listdir(directory))
+    # Maildir names start with the delivery time; the part before ":2," never changes
+    names.sort(key=lambda name: os.path.basename(name).split(":")[0])
+    return names
+
+
+def iter_maildir(path, start=0):
+    """Yield (index, raw message bytes) from a Maildir, starting at message `start`"""
+    names = maildir_files(path)
+    for index in range(start, len(names)):
+        try:
+            with open(names[index], "rb") as f:
+                yield index, f.read()
+        except FileNotFoundError:
+            # Moved or deleted by a mail client since the listing
+            continue
+
+
+class Checkpoint:
+    """Resumable position in one archive
+
+    Messages finish out of order, so the stored position is a low-water
+    mark: the start of the earliest message that has not finished
+    successfully. Everything before it is done; anything after it is
+    skipped on resume through the Message-ID check.
+    """
+
+    def __init__(self, archive, size, db_path=None):
+        self.archive = archive
+        self.size = size
+        self.db_path = db_path
+        self._conn().executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._failed = set()
+        self._scanned = None
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def load(self):
+        """Position to resume from (0 when there is no usable checkpoint)"""
+        row = self._conn().execute(
+            "SELECT position, size FROM backfill_checkpoints WHERE archive = ?", (self.archive,)
+        ).fetchone()
+        if row is None:
+            return 0
+        if self.size < row["size"]:
+            # The archive was rewritten or truncated; positions no longer line up
+            logger.warning("⚠️ Archive is smaller than at the last checkpoint - starting over")
+            return 0
+        return row["position"]
+
+    def reset(self):
+        self._conn().execute("DELETE FROM backfill_checkpoints WHERE archive = ?", (self.archive,))
+
+    def started(self, position):
+        with self._lock:
+            self._pending.add(position)
+
+    def finished(self, position, ok):
+        with self._lock:
+            self._pending.discard(position)
+            if not ok:
+                self._failed.add(position)
+
+    def scanned(self, position):
+        """Everything before `position` has been read from the archive"""
+        with self._lock:
+            self._scanned = position
+
+    def save(self, generated):
+        with self._lock:
+            marks = self._pending | self._failed
+            if self._scanned is not None:
+                marks.add(self._scanned)
+            if not marks:
+                return
+            position = min(marks)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO backfill_checkpoints (archive, position, size, generated, updated_at)"
+            " VALUES (?, ?, ?, COALESCE((SELECT generated FROM backfill_checkpoints WHERE archive = ?), 0) + ?, ?)",
+            (self.archive, position, self.size, self.archive, generated, time.time()),
+        )
+
+
+class Backfill:
+    """One backfill run over one archive"""
+
+    def __init__(self, path, concurrency=None, sender=None, limit=None, dry_run=False):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.is_maildir = os.path.isdir(self.path)
+        self.concurrency = concurrency or BACKFILL_CONCURRENCY
+        self.sender = sender.lower() if sender else None
+        self.limit = limit
+        self.dry_run = dry_run
+        self.header_parser = BytesHeaderParser()
+        size = len(maildir_files(self.path)) if self.is_maildir else os.path.getsize(self.path)
+        self.checkpoint = Checkpoint(self.path, size)
+        self.counts = {
+            "scanned": 0,
+            "duplicates": 0,
+            "filtered": 0,
+            "generated": 0,
+            "failed": 0,
+            "tweets": 0,
+        }
+        self._saved_generated = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._start = None
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def _messages(self, start):
+        if self.is_maildir:
+            return iter_maildir(self.path, start)
+        return iter_mbox(self.path, start)
+
+    def _is_new(self, raw):
+        """Header-only check: returns the newsletter key, or None to skip the message"""
+        headers = self.header_parser.parsebytes(raw)
+        if self.sender and self.sender not in (headers["from"] or "").lower():
+            self._count("filtered")
+            return None
+        message_id = (headers["message-id"] or "").strip()
+        if message_id:
+            key = newsletter_key({"message_id": message_id})
+        else:
+            key = newsletter_key(parse_newsletter(raw))
+        with self._lock:
+            duplicate = key in self._seen
+            self._seen.add(key)
+        if duplicate or get_newsletter_cache().is_processed(key):
+            self._count("duplicates")
+            return None
+        return key
+
+    def _generate(self, key, raw):
+        newsletter = parse_newsletter(raw)
+        with span("backfill_newsletter"):
+            logger.info(f"📄 Backfilling: {newsletter['subject'][:50]}... ({newsletter['date'] or 'no date'})")
+            result = generate_tweets_for_newsletter(newsletter["content"])
+        if result is None:
+            return False
+        get_newsletter_cache().mark_processed(key)
+        self._count("generated")
+        self._count("tweets", len(result))
+        return True
+
+    def rate(self):
+        """Newsletters generated per minute so far"""
+        elapsed = time.perf_counter() - self._start
+        return self.counts["generated"] / elapsed * 60 if elapsed > 0 else 0.0
+
+    def _progress(self):
+        with self._lock:
+            generated = self.counts["generated"]
+            unsaved = generated - self._saved_generated
+            self._saved_generated = generated
+        self.checkpoint.save(unsaved)
+        logger.info(
+            f"📈 {self.counts['scanned']} scanned, {generated} generated,"
+            f" {self.counts['duplicates']} duplicates, {self.counts['failed']} failed"
+            f" - {self.rate():.1f} newsletters/min"
+        )
+
+    def run(self, reset=False):
+        """Process the archive; returns a report with counts and newsletters per minute"""
+        if reset:
+            self.checkpoint.reset()
+        start = self.checkpoint.load()
+        if start:
+            logger.info(f"⏩ Resuming {self.path} from position {start}")
+        logger.info(
+            f"🚀 Backfilling {'Maildir' if self.is_maildir else 'mbox'} {self.path}"
+            f" with {self.concurrency} concurrent generations{' (dry run)' if self.dry_run else ''}"
+        )
+
+        self._start = time.perf_counter()
+        last_progress = time.monotonic()
+        in_flight = {}
+        queued = 0
+        interrupted = False
+        with span("backfill") as trace_id, ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="backfill"
+        ) as pool:
+            try:
+                position = None
+                for position, raw in self._messages(start):
+                    self.checkpoint.scanned(position)
+                    self._count("scanned")
+                    key = self._is_new(raw)
+                    if key is None:
+                        continue
+                    queued += 1
+                    if not self.dry_run:
+                        # At most `concurrency` more wait behind the running ones, so the
+                        # archive is read only as fast as it is processed
+                        while len(in_flight) >= self.concurrency * 2:
+                            self._collect(in_flight, FIRST_COMPLETED)
+                        self.checkpoint.started(position)
+                        future = pool.submit(contextvars.copy_context().run, self._generate, key, raw)
+                        in_flight[future] = position
+
+                    if time.monotonic() - last_progress > PROGRESS_INTERVAL:
+                        self._progress()
+                        last_progress = time.monotonic()
+                    if self.limit and queued >= self.limit:
+                        logger.info(f"🛑 Reached --limit {self.limit}")
+                        break
+                else:
+                    if position is not None:
+                        # Whole archive read; a resume starts after the last message
+                        self.checkpoint.scanned(position + 1)
+                self._collect(in_flight, ALL_COMPLETED)
+            except KeyboardInterrupt:
+                interrupted = True
+                logger.warning("🛑 Interrupted - finishing newsletters in flight, then saving the checkpoint")
+                for future in in_flight:
+                    future.cancel()
+                self._collect(in_flight, ALL_COMPLETED)
+            finally:
+                if not self.dry_run:
+                    self._progress()
+
+        report = {
+            "archive": self.path,
+            "trace_id": trace_id,
+            **self.counts,
+            "new": queued,
+            "interrupted": interrupted,
+            "elapsed_s": round(time.perf_counter() - self._start, 1),
+            "newsletters_per_min": round(self.rate(), 2),
+        }
+        if self.dry_run:
+            logger.info(
+                f"🔍 Dry run: {queued} new newsletters, {report['duplicates']} duplicates,"
+                f" {report['filtered']} from other senders"
+            )
+        else:
+            logger.info(
+                f"✅ Backfill {'stopped' if interrupted else 'done'}: {report['generated']} newsletters"
+                f" → {report['tweets']} tweets in {report['elapsed_s']}s"
+                f" ({report['newsletters_per_min']} newsletters/min),"
+                f" {report['duplicates']} duplicates skipped, {report['failed']} failed"
+            )
+        return report
+
+    def _collect(self, in_flight, return_when):
+        """Wait for running generations and record their outcome"""
+        if not in_flight:
+            return
+        done, _ = wait(list(in_flight), return_when=return_when)
+        for future in done:
+            position = in_flight.pop(future)
+            if future.cancelled():
+                # Never started; the checkpoint stays before it
+                self.checkpoint.finished(position, False)
+                continue
+            try:
+                ok = future.result()
+            except Exception as e:
+                logger.error(f"💥 Backfill generation failed: {e}")
+                ok = False
+            if not ok:
+                self._count("failed")
+            self.checkpoint.finished(position, ok)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate tweets from an mbox file or Maildir of past newsletters")
+    parser.add_argument("archive", help="Path to an mbox file or a Maildir directory")
+    parser.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY, help="Newsletters generated at once")
+    parser.add_argument("--sender", help="Only newsletters whose From contains this")
+    parser.add_argument("--limit", type=int, help="Stop after this many new newsletters")
+    parser.add_argument("--dry-run", action="store_true", help="Count new newsletters without generating")
+    parser.add_argument("--reset", action="store_true", help="Ignore the saved checkpoint and start over")
+    parser.add_argument("--json", action="store_true", help="Print the final report as JSON")
+    args = parser.parse_args()
+
+    try:
+        report = Backfill(
+            args.archive,
+            concurrency=args.concurrency,
+            sender=args.sender,
+            limit=args.limit,
+            dry_run=args.dry_run,
+        ).run(reset=args.reset)
+    finally:
+        shutdown_logging()
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
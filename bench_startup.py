@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the bot's entry points
+
+Imports each entry-point module in a fresh interpreter under
+`python -X importtime` and reports the median import time, the median wall
+time of the whole process (interpreter startup included) and the heaviest
+dependencies. Importing an entry point must not do any work, so these
+numbers are what every CLI command, scheduled run and server worker pays
+before it starts.
+
+Save a baseline and compare later runs against it to catch regressions:
+
+    python bench_startup.py --save startup_baseline.json
+    python bench_startup.py --compare startup_baseline.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = (
+    "tweet",
+    "slack_webhook",
+    "slack_webhook_async",
+    "llm",
+    "x_poster",
+    "tweet_queue",
+    "log_query",
+)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into [(name, depth, self_us, cumulative_us)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:   self |  cumulative | <two spaces per level>name"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module):
+    """Import `module` in a fresh interpreter, returns (wall_s, importtime rows)"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+        raise RuntimeError(f"import {module} failed: {error}")
+    return wall, parse_importtime(result.stderr)
+
+
+def bench(module, runs, top):
+    walls, imports = [], []
+    heaviest = {}
+    for _ in range(runs):
+        wall, rows = measure(module)
+        walls.append(wall)
+        total = next((cum for name, depth, _, cum in rows if name == module and depth == 0), 0)
+        imports.append(total)
+        # Direct dependencies of the entry point, by cumulative time
+        for name, depth, _, cum in rows:
+            if depth == 1:
+                heaviest.setdefault(name, []).append(cum)
+    ranked = sorted(
+        ((name, statistics.median(times)) for name, times in heaviest.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    return {
+        "import_ms": round(statistics.median(imports) / 1000, 1),
+        "wall_ms": round(statistics.median(walls) * 1000, 1),
+        "heaviest": [{"module": name, "ms": round(us / 1000, 1)} for name, us in ranked[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of each entry point")
+    parser.add_argument("modules", nargs="*", help=f"Modules to measure (default: {' '.join(ENTRY_POINTS)})")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument("--top", type=int, default=3, help="Heaviest direct imports to list per module")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Show the change against a JSON file written by --save")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules or ENTRY_POINTS:
+        try:
+            results[module] = bench(module, args.runs, args.top)
+        except RuntimeError as e:
+            print(f"❌ {e}", file=sys.stderr)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'entry point':<22}{'import ms':>11}{'wall ms':>10}{'vs base':>10}  heaviest imports")
+        for module, result in results.items():
+            change = ""
+            if module in baseline:
+                change = f"{result['import_ms'] - baseline[module]['import_ms']:+.1f}"
+            heaviest = ", ".join(f"{h['module']} {h['ms']:.0f}" for h in result["heaviest"])
+            print(
+                f"{module:<22}{result['import_ms']:>11.1f}{result['wall_ms']:>10.1f}{change:>10}  {heaviest}"
+            )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Saved to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Shared API clients for Gemini, Slack, X and plain HTTP (feeds)
+
+Each process builds at most one client per API, and every thread reuses it.
+TLS handshakes, connection pools and auth setup are therefore paid once per
+process, not once per call. Each client keeps a pool of keep-alive
+connections; timeouts and pool sizes come from the environment.
+
+SDKs are imported when their client is first requested, so importing this
+module stays cheap.
+"""
+
+import os
+import threading
+from dotenv import load_dotenv
+from logger_config import get_logger
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("clients")
+
+# Generation calls can run for minutes on large newsletters
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "300"))
+GEMINI_POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", "8"))
+SLACK_TIMEOUT = int(os.getenv("SLACK_TIMEOUT", "30"))
+SLACK_POOL_SIZE = int(os.getenv("SLACK_POOL_SIZE", "8"))
+X_TIMEOUT = float(os.getenv("X_TIMEOUT", "15"))
+X_POOL_SIZE = int(os.getenv("X_POOL_SIZE", "4"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "20"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "4"))
+
+# slack_sdk release whose private urllib method PooledWebClient overrides
+SLACK_SDK_TESTED = "3.23."
+
+# OAuth 1.0a user-context credentials for posting to X
+X_CREDENTIALS = ("API_KEY", "API_SECRET", "ACCESS_TOKEN", "ACCESS_TOKEN_SECRET")
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _get(name, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+                logger.info(f"🔌 Created {name} client")
+    return client
+
+
+def _pooled_session(pool_size, pool_connections=1):
+    """requests.Session whose HTTPS connections are kept alive and reused"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _create_genai_client():
+    import httpx
+    from google import genai
+    from google.genai import types
+
+    limits = httpx.Limits(
+        max_connections=GEMINI_POOL_SIZE, max_keepalive_connections=GEMINI_POOL_SIZE
+    )
+    return genai.Client(
+        http_options=types.HttpOptions(
+            timeout=int(GEMINI_TIMEOUT * 1000),  # milliseconds
+            client_args={"limits": limits},
+        )
+    )
+
+
+def _create_slack_client():
+    import io
+    from http.client import HTTPMessage
+    from urllib.error import HTTPError, URLError
+    import requests
+    from slack_sdk import WebClient
+    from slack_sdk.version import __version__ as slack_sdk_version
+
+    token = os.getenv("SLACK_BOT_TOKEN")
+    if not slack_sdk_version.startswith(SLACK_SDK_TESTED):
+        logger.warning(
+            f"⚠️ slack_sdk {slack_sdk_version} is not the tested {SLACK_SDK_TESTED}x"
+            " - Slack calls will not reuse connections"
+        )
+        return WebClient(token=token, timeout=SLACK_TIMEOUT)
+
+    class PooledWebClient(WebClient):
+        """WebClient that sends requests over a keep-alive session
+
+        The stock client opens a new connection (and TLS handshake) per call
+        through urllib, and neither its options nor its retry handlers can
+        change that. This overrides the one private method that performs the
+        urllib call, so it is only used with the slack_sdk release it was
+        written against (SLACK_SDK_TESTED, pinned in requirements.txt and
+        checked by test_clients.py). It keeps urllib's contract: error
+        statuses raise HTTPError, connection errors raise URLError, and
+        headers are an HTTPMessage. Request building, 429 handling and the
+        retry handlers in slack_sdk are therefore unchanged.
+        """
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.session = _pooled_session(SLACK_POOL_SIZE)
+            if self.proxy:
+                self.session.proxies = {"http": self.proxy, "https": self.proxy}
+
+        def _perform_urllib_http_request_internal(self, url, req):
+            headers = {name: str(value) for name, value in req.header_items()}
+            try:
+                resp = self.session.request(
+                    req.get_method(), url, data=req.data, headers=headers, timeout=self.timeout
+                )
+            except requests.ConnectionError as e:
+                raise URLError(e) from e
+
+            message = HTTPMessage()
+            for name, value in resp.headers.items():
+                message[name] = value
+            if resp.status_code >= 400:
+                raise HTTPError(url, resp.status_code, resp.reason, message, io.BytesIO(resp.content))
+            if message.get_content_type() == "application/gzip":
+                # admin.analytics.getFile
+                return {"status": resp.status_code, "headers": message, "body": resp.content}
+            body = resp.content.decode(message.get_content_charset() or "utf-8")
+            return {"status": resp.status_code, "headers": message, "body": body}
+
+    return PooledWebClient(token=token, timeout=SLACK_TIMEOUT)
+
+
+def _create_x_session():
+    from requests_oauthlib import OAuth1
+
+    # OAuth1 accepts None and only fails when signing, on every single post
+    missing = [name for name in X_CREDENTIALS if not os.getenv(name)]
+    if missing:
+        raise RuntimeError(f"X credentials not found in environment variables: {', '.join(missing)}")
+
+    session = _pooled_session(X_POOL_SIZE)
+    session.auth = OAuth1(*(os.getenv(name) for name in X_CREDENTIALS))
+    return session
+
+
+def get_genai_client():
+    """Get the shared Gemini client"""
+    return _get("gemini", _create_genai_client)
+
+
+def get_slack_client():
+    """Get the shared Slack WebClient (thread-safe)"""
+    return _get("slack", _create_slack_client)
+
+
+def get_x_session():
+    """Get the shared OAuth1-signed session for the X API"""
+    return _get("x", _create_x_session)
+
+
+def get_http_session():
+    """Get the shared session for plain HTTP fetches (e.g. newsletter feeds), pooled per host"""
+    return _get("http", lambda: _pooled_session(HTTP_POOL_SIZE, pool_connections=10))
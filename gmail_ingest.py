@@ -0,0 +1,262 @@
+import email
+import imaplib
+import os
+import socket
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from dotenv import load_dotenv
+from state_db import get_connection
+from logger_config import get_logger, log_performance
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("gmail")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_state (
+    source TEXT PRIMARY KEY,
+    uidvalidity INTEGER NOT NULL,
+    last_uid INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Servers drop IDLE after 30 minutes, so re-issue it a bit earlier
+IDLE_TIMEOUT = 29 * 60
+
+
+def extract_text_body(email_message):
+    """Get the text/plain body of an email message"""
+    if email_message.is_multipart():
+        for part in email_message.walk():
+            if part.get_content_type() == "text/plain":
+                charset = part.get_content_charset() or "utf-8"
+                return part.get_payload(decode=True).decode(charset, errors="replace")
+        return ""
+    charset = email_message.get_content_charset() or "utf-8"
+    return email_message.get_payload(decode=True).decode(charset, errors="replace")
+
+
+def parse_newsletter(raw_email, uid=None):
+    """Parse raw RFC822 bytes into a newsletter dict"""
+    email_message = email.message_from_bytes(raw_email)
+    subject = email_message["subject"] or ""
+    from_email = email_message["from"] or ""
+    body = extract_text_body(email_message)
+
+    date = None
+    if email_message["date"]:
+        try:
+            date = parsedate_to_datetime(email_message["date"]).isoformat()
+        except (TypeError, ValueError):
+            date = None
+
+    return {
+        "uid": uid,
+        "message_id": (email_message["message-id"] or "").strip(),
+        "subject": subject,
+        "from": from_email,
+        "date": date,
+        # Same shape the prompt has always received
+        "content": f"Subject: {subject}\nFrom: {from_email}\n\n{body}",
+    }
+
+
+class GmailIngester:
+    """Incremental newsletter ingestion over one long-lived IMAP session
+
+    The last seen UID is stored per mailbox together with its UIDVALIDITY, so
+    each poll only runs UID SEARCH over messages that arrived since the last
+    one, and every new newsletter is returned, not just the latest.
+    """
+
+    def __init__(self, sender=None, mailbox=None, db_path=None):
+        self.user = os.getenv("GMAIL_USER")
+        self.password = os.getenv("GMAIL_APP_PASSWORD")
+        self.sender = sender or os.getenv("NEWSLETTER_SENDER", "news@smol.ai")
+        self.mailbox = mailbox or os.getenv("GMAIL_MAILBOX", "inbox")
+        self.db_path = db_path
+        self.source = f"gmail:{self.user}:{self.mailbox}:{self.sender}"
+        self._mail = None
+        self._uidvalidity = None
+        self._lock = threading.RLock()
+        get_connection(self.db_path).executescript(SCHEMA)
+
+    # === SESSION ===
+
+    def _connect(self):
+        if not self.user or not self.password:
+            raise RuntimeError("Gmail credentials not found in environment variables")
+
+        mail = imaplib.IMAP4_SSL("imap.gmail.com")
+        mail.login(self.user, self.password)
+        status, _ = mail.select(self.mailbox, readonly=True)
+        if status != "OK":
+            raise RuntimeError(f"Could not select mailbox {self.mailbox}")
+        self._uidvalidity = int(mail.response("UIDVALIDITY")[1][0])
+        self._mail = mail
+        logger.info(f"📬 IMAP session opened for {self.mailbox}")
+
+    def session(self):
+        """Get the authenticated IMAP session, reconnecting if it went stale"""
+        with self._lock:
+            if self._mail is not None:
+                try:
+                    self._mail.noop()
+                    return self._mail
+                except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError):
+                    logger.info("🔌 IMAP session dropped, reconnecting...")
+                    self._mail = None
+            self._connect()
+            return self._mail
+
+    def close(self):
+        with self._lock:
+            if self._mail is not None:
+                try:
+                    self._mail.logout()
+                except Exception:
+                    pass
+                self._mail = None
+
+    # === STATE ===
+
+    def _load_last_uid(self):
+        row = get_connection(self.db_path).execute(
+            "SELECT uidvalidity, last_uid FROM ingest_state WHERE source = ?",
+            (self.source,),
+        ).fetchone()
+        if row is None:
+            return 0
+        if row["uidvalidity"] != self._uidvalidity:
+            # The server renumbered the mailbox; old UIDs mean nothing now
+            logger.warning("⚠️ UIDVALIDITY changed - rescanning mailbox")
+            return 0
+        return row["last_uid"]
+
+    def _save_last_uid(self, uid):
+        get_connection(self.db_path).execute(
+            "INSERT OR REPLACE INTO ingest_state (source, uidvalidity, last_uid, updated_at)"
+            " VALUES (?, ?, ?, ?)",
+            (self.source, self._uidvalidity, uid, time.time()),
+        )
+
+    # === FETCHING ===
+
+    def _search_uids(self, mail, criteria):
+        status, data = mail.uid("SEARCH", None, criteria)
+        if status != "OK":
+            raise RuntimeError(f"UID SEARCH failed: {status}")
+        return [int(uid) for uid in data[0].split()]
+
+    def _fetch(self, mail, uid):
+        # BODY.PEEK so ingesting does not mark newsletters as read
+        status, msg_data = mail.uid("FETCH", str(uid), "(BODY.PEEK[])")
+        if status != "OK" or not msg_data or msg_data[0] is None:
+            raise RuntimeError(f"UID FETCH {uid} failed: {status}")
+        return parse_newsletter(msg_data[0][1], uid=uid)
+
+    def fetch_new(self):
+        """Yield every newsletter that arrived since the last call
+
+        The stored position advances after the consumer has handled each
+        newsletter, so an interrupted run picks up where it stopped.
+        """
+        with self._lock:
+            mail = self.session()
+            last_uid = self._load_last_uid()
+            uids = self._search_uids(
+                mail, f'UID {last_uid + 1}:* FROM "{self.sender}"'
+            )
+        # "n:*" always matches the highest UID, even when it is below n
+        uids = sorted(uid for uid in uids if uid > last_uid)
+
+        if not uids:
+            logger.info(f"📭 No new emails from {self.sender}")
+            return
+
+        logger.info(f"📨 {len(uids)} new emails from {self.sender}")
+        for uid in uids:
+            with self._lock:
+                newsletter = self._fetch(mail, uid)
+            logger.info(f"✅ Fetched email: {newsletter['subject'][:50]}...")
+            yield newsletter
+            with self._lock:
+                self._save_last_uid(uid)
+
+    @log_performance
+    def fetch_latest(self):
+        """Fetch only the most recent newsletter, without moving the stored position"""
+        with self._lock:
+            mail = self.session()
+            uids = self._search_uids(mail, f'FROM "{self.sender}"')
+            if not uids:
+                logger.warning(f"No emails found from {self.sender}")
+                return None
+            return self._fetch(mail, max(uids))
+
+    def wait_for_new(self, timeout=IDLE_TIMEOUT):
+        """Block in IMAP IDLE until the server reports new mail or timeout passes
+
+        Returns True when new mail arrived. Falls back to sleeping when the
+        server does not advertise IDLE.
+        """
+        with self._lock:
+            mail = self.session()
+            if "IDLE" not in mail.capabilities:
+                time.sleep(timeout)
+                return True
+
+            tag = mail._new_tag()
+            mail.send(tag + b" IDLE\r\n")
+            if not mail.readline().startswith(b"+"):
+                raise RuntimeError("Server refused IDLE")
+
+            got_mail = False
+            mail.sock.settimeout(timeout)
+            try:
+                while True:
+                    line = mail.readline()
+                    if not line:
+                        raise imaplib.IMAP4.abort("Connection closed during IDLE")
+                    if b"EXISTS" in line:
+                        got_mail = True
+                        break
+            except socket.timeout:
+                pass
+            finally:
+                mail.sock.settimeout(None)
+
+            # Leave IDLE and consume the tagged completion
+            mail.send(b"DONE\r\n")
+            while True:
+                line = mail.readline()
+                if not line or line.startswith(tag):
+                    break
+            return got_mail
+
+    def stream(self, timeout=IDLE_TIMEOUT):
+        """Yield new newsletters forever, idling between batches"""
+        while True:
+            yield from self.fetch_new()
+            try:
+                self.wait_for_new(timeout)
+            except (imaplib.IMAP4.abort, OSError) as e:
+                logger.warning(f"⚠️ IMAP IDLE interrupted: {e}")
+                self.close()
+
+
+_ingester = None
+_ingester_lock = threading.Lock()
+
+
+def get_gmail_ingester():
+    """Get the process-wide Gmail ingester (one IMAP session per process)"""
+    global _ingester
+    if _ingester is None:
+        with _ingester_lock:
+            if _ingester is None:
+                _ingester = GmailIngester()
+    return _ingester
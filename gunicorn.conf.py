@@ -0,0 +1,57 @@
+"""
+Gunicorn settings for serving the Slack webhook in production
+
+    gunicorn -c gunicorn.conf.py slack_webhook:app
+
+Threaded workers (gthread): each process serves WEBHOOK_THREADS requests
+concurrently, and slow work already runs on the per-process action pool, so
+a handful of processes covers bursty interaction traffic. On SIGTERM each
+worker stops accepting connections, finishes in-flight requests within
+WEBHOOK_GRACEFUL_TIMEOUT and then drains its queued Slack actions before
+exiting.
+"""
+
+import multiprocessing
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("WEBHOOK_BIND", "127.0.0.1:5003")
+workers = int(os.getenv("WEBHOOK_PROCESSES", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "gthread"
+threads = int(os.getenv("WEBHOOK_THREADS", "8"))
+
+# A worker stuck on one request this long is killed and replaced
+timeout = int(os.getenv("WEBHOOK_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("WEBHOOK_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("WEBHOOK_KEEPALIVE", "5"))
+
+# Recycle workers now and then to cap slow leaks; jitter avoids restarting them all at once
+max_requests = int(os.getenv("WEBHOOK_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("WEBHOOK_ACCESS_LOG") or None
+loglevel = os.getenv("WEBHOOK_LOG_LEVEL", "info")
+proc_name = "slack-webhook"
+
+
+def post_worker_init(worker):
+    """Resume posting anything left in the X outbox as soon as the worker is up"""
+    import slack_webhook
+
+    slack_webhook.start_x_engine()
+
+
+def worker_exit(server, worker):
+    """Drain queued Slack actions and flush logs before the worker process exits"""
+    import slack_webhook
+    import x_poster
+    from logger_config import shutdown_logging
+
+    pending = slack_webhook.action_pool.depth()
+    server.log.info(f"Worker {worker.pid} draining {pending} queued Slack action(s)")
+    slack_webhook.action_pool.shutdown(wait=True)
+    # Jobs still in the outbox are picked up by the next worker to start
+    x_poster.get_x_engine().stop(timeout=graceful_timeout)
+    shutdown_logging()
@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from state_db import get_connection, transaction
+from logger_config import get_logger
+
+# Get logger for this module
+logger = get_logger("idempotency")
+
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interaction_results (
+    key TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_interaction_results_updated_at ON interaction_results (updated_at);
+"""
+
+# Slack retries a request for a few minutes and buttons stay clickable until the
+# message is updated, so records are kept far longer than either
+RETENTION = float(os.getenv("IDEMPOTENCY_RETENTION_HOURS", "168")) * 3600
+# Seconds between purges of expired records, run from claim()
+PURGE_INTERVAL = 3600
+
+# Approving and submitting an edit both write to X, so they share a key
+ACTION_KINDS = {"approve": "post", "edit": "post", "reject": "reject"}
+
+
+def interaction_key(message_ts, action, tweet_id=None):
+    """Build the idempotency key for an action on a Slack message
+
+    Digest messages hold several tweets, so their keys include the tweet ID.
+    """
+    if tweet_id:
+        return f"{message_ts}:{tweet_id}:{ACTION_KINDS.get(action, action)}"
+    return f"{message_ts}:{ACTION_KINDS.get(action, action)}"
+
+
+class IdempotencyStore:
+    """Deduplicates Slack interactions with a TTL cache in front of SQLite
+
+    A key is claimed once; later claims get the stored record back instead.
+    Finished results are cached in memory. Another process can still fail a
+    finished key (the X engine gives up on a post after the approval was
+    recorded), so a cache hit is confirmed with one primary-key read. A
+    cached duplicate click or Slack retry costs that read, not a write
+    transaction.
+    Failed actions can be claimed again so the user is able to retry them.
+
+    ttl only bounds the in-memory cache. Rows older than retention are
+    purged from the database, at most once per PURGE_INTERVAL.
+    """
+
+    def __init__(self, db_path=None, max_entries=1024, ttl=3600, stale_after=600, retention=RETENTION):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.retention = retention
+        # In-progress claims older than this are assumed to belong to a dead worker
+        self.stale_after = stale_after
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.purged = 0
+        # The first claim purges, so short-lived processes still clean up
+        self._last_purge = float("-inf")
+        get_connection(self.db_path).executescript(SCHEMA)
+
+    def _cache_get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, record = entry
+            if expires_at < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return record
+
+    def _cache_put(self, key, record):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.ttl, record)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def claim(self, key):
+        """Try to claim a key, returns (claimed, existing_record)"""
+        conn = get_connection(self.db_path)
+        record = self._cache_get(key)
+        if record is not None:
+            row = conn.execute(
+                "SELECT status, updated_at FROM interaction_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and (row["status"], row["updated_at"]) == (
+                record["status"],
+                record["updated_at"],
+            ):
+                self.hits += 1
+                return False, record
+            # Changed by another worker since it was cached
+            with self._lock:
+                self._cache.pop(key, None)
+
+        if time.monotonic() - self._last_purge > PURGE_INTERVAL:
+            self.purge()
+
+        now = time.time()
+        with transaction(conn):
+            row = conn.execute(
+                "SELECT * FROM interaction_results WHERE key = ?", (key,)
+            ).fetchone()
+            reclaimable = row is not None and (
+                row["status"] == FAILED
+                or (row["status"] == IN_PROGRESS and now - row["updated_at"] > self.stale_after)
+            )
+            if row is None or reclaimable:
+                conn.execute(
+                    "INSERT OR REPLACE INTO interaction_results"
+                    " (key, status, result, created_at, updated_at) VALUES (?, ?, NULL, ?, ?)",
+                    (key, IN_PROGRESS, now, now),
+                )
+                self.misses += 1
+                return True, None
+
+        self.hits += 1
+        record = dict(row)
+        if record["status"] == DONE:
+            self._cache_put(key, record)
+        logger.info(f"🔁 Duplicate interaction {key} ({record['status']})")
+        return False, record
+
+    def _finish(self, key, status, result):
+        now = time.time()
+        get_connection(self.db_path).execute(
+            "UPDATE interaction_results SET status = ?, result = ?, updated_at = ? WHERE key = ?",
+            (status, result, now, key),
+        )
+        record = {"key": key, "status": status, "result": result, "updated_at": now}
+        if status == DONE:
+            self._cache_put(key, record)
+        else:
+            with self._lock:
+                self._cache.pop(key, None)
+
+    def complete(self, key, result):
+        """Record the final result of a claimed action"""
+        self._finish(key, DONE, result)
+
+    def fail(self, key, result=None):
+        """Record a failure, releasing the key so the action can be retried"""
+        self._finish(key, FAILED, result)
+
+    def purge(self):
+        """Delete records not updated within the retention window, returns how many"""
+        self._last_purge = time.monotonic()
+        cursor = get_connection(self.db_path).execute(
+            "DELETE FROM interaction_results WHERE updated_at < ?", (time.time() - self.retention,)
+        )
+        if cursor.rowcount:
+            self.purged += cursor.rowcount
+            logger.info(f"🧹 Purged {cursor.rowcount} interaction records")
+        return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            cached = len(self._cache)
+        return {"hits": self.hits, "misses": self.misses, "cached": cached, "purged": self.purged}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store():
+    """Get the process-wide idempotency store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = IdempotencyStore(
+                    ttl=int(os.getenv("IDEMPOTENCY_TTL", "3600")),
+                    max_entries=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "1024")),
+                )
+    return _store
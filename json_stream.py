@@ -0,0 +1,58 @@
+import json
+
+
+class JsonArrayStreamParser:
+    """Incrementally parse a streamed JSON array of objects
+
+    Feed text chunks as they arrive; each call returns the objects that were
+    completed by that chunk, so the first element is available long before the
+    closing bracket of the array has been received.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.finished = False
+
+    def feed(self, chunk):
+        """Consume a chunk of text, returns a list of newly completed objects"""
+        completed = []
+        for char in chunk:
+            if self.finished:
+                break
+
+            if not self._started:
+                if char == "[":
+                    self._started = True
+                continue
+
+            if self._depth == 0:
+                # Between elements: skip whitespace and commas until the next object
+                if char == "{":
+                    self._depth = 1
+                    self._buffer = [char]
+                elif char == "]":
+                    self.finished = True
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append(json.loads("".join(self._buffer)))
+                    self._buffer = []
+        return completed
@@ -1,11 +1,19 @@
+import contextvars
+import functools
 import json
-import imaplib
-import email
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
-from google import genai
+from clients import get_genai_client
 from logger_config import get_logger, log_performance
+from tweet_queue import get_tweet_queue, make_tweet_id
+from gmail_ingest import get_gmail_ingester
+from newsletter_sections import split_newsletter_sections
+from newsletter_compactor import compact_newsletter, restore_urls
+from json_stream import JsonArrayStreamParser
+from llm_cache import get_response_cache, response_cache_key
+from tracing import current_trace_id, span
 
 # Load environment variables
 load_dotenv()
@@ -14,96 +22,44 @@ load_dotenv()
 logger = get_logger("llm")
 
 
-class Tweet(BaseModel):
-    tweet: str = Field(description="The tweet to be posted")
+@functools.lru_cache(maxsize=None)
+def tweet_model():
+    """Response schema for one generated tweet (pydantic is imported on first use)"""
+    from pydantic import BaseModel, Field
 
+    class Tweet(BaseModel):
+        tweet: str = Field(description="The tweet to be posted")
 
-@log_performance
-def fetch_latest_email_from_gmail():
-    """Fetch the latest email from Gmail using IMAP"""
-    try:
-        # Gmail IMAP settings
-        gmail_user = os.getenv("GMAIL_USER")
-        gmail_password = os.getenv("GMAIL_APP_PASSWORD")
-
-        if not gmail_user or not gmail_password:
-            logger.error("Gmail credentials not found in environment variables")
-            return None
+    return Tweet
 
-        # Connect to Gmail
-        mail = imaplib.IMAP4_SSL("imap.gmail.com")
-        mail.login(gmail_user, gmail_password)
 
-        # Select inbox
-        mail.select("inbox")
+@functools.lru_cache(maxsize=None)
+def tweet_schema():
+    """JSON schema of the tweet model, part of every response cache key"""
+    return tweet_model().model_json_schema()
 
-        # Search for emails from news@smol.ai and get the latest one
-        status, messages = mail.search(None, 'FROM "news@smol.ai"')
-        email_ids = messages[0].split()
 
-        if not email_ids:
-            logger.warning("No emails found from news@smol.ai")
-            return None
-
-        # Get the latest email (last ID in the list)
-        latest_email_id = email_ids[-1]
-
-        # Fetch the email
-        status, msg_data = mail.fetch(latest_email_id, "(RFC822)")
-        email_body = msg_data[0][1]
-        email_message = email.message_from_bytes(email_body)
-
-        # Extract email content
-        email_content = ""
-        subject = email_message["subject"]
-        from_email = email_message["from"]
-
-        # Get email body
-        if email_message.is_multipart():
-            for part in email_message.walk():
-                if part.get_content_type() == "text/plain":
-                    email_content = part.get_payload(decode=True).decode()
-                    break
-        else:
-            email_content = email_message.get_payload(decode=True).decode()
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
+# Cheaper model for the merge/rank pass of chunked generation
+GEMINI_RANK_MODEL = os.getenv("GEMINI_RANK_MODEL", "gemini-2.5-flash")
 
-        # Close connection
-        mail.logout()
+# "single" sends the whole newsletter in one call, "chunked" maps over sections,
+# "stream" parses the response incrementally and queues tweets as they arrive
+GENERATION_MODE = os.getenv("TWEET_GEN_MODE", "single")
+GENERATION_MAX_PARALLEL = int(os.getenv("TWEET_GEN_MAX_PARALLEL", "4"))
+SECTION_MAX_CHARS = int(os.getenv("TWEET_GEN_SECTION_MAX_CHARS", "20000"))
 
-        # Combine subject and content
-        full_email_content = (
-            f"Subject: {subject}\nFrom: {from_email}\n\n{email_content}"
-        )
+# Pre-LLM compaction of the newsletter text (see newsletter_compactor.py)
+COMPACT_NEWSLETTER = os.getenv("NEWSLETTER_COMPACT", "1") == "1"
+SHORTEN_URLS = os.getenv("NEWSLETTER_SHORTEN_URLS", "0") == "1"
 
-        logger.info(f"✅ Successfully fetched email: {subject[:50]}...")
-        return full_email_content
+HOW_MANY_NEWSLETTER = "Aim for 8–12 tweets per newsletter."
+HOW_MANY_SECTION = "Aim for 2–5 candidate tweets for this newsletter section, fewer if it is thin."
 
-    except Exception as e:
-        logger.error(f"💥 Error fetching email: {e}")
-        return None
+# Bump whenever PROMPT_TEMPLATE changes so cached responses are not reused
+PROMPT_VERSION = "2"
 
-
-@log_performance
-def generate_tweets_from_email():
-    # Try to fetch from Gmail first, fallback to text file
-    try:
-        with open("email.txt", "r") as f:
-            email_content = f.read()
-        logger.info("📄 Using email content from email.txt file")
-    except FileNotFoundError:
-        logger.info("📧 email.txt not found, fetching from Gmail...")
-        email_content = fetch_latest_email_from_gmail()
-
-        if email_content:
-            # save email to file
-            with open("email.txt", "w") as f:
-                f.write(email_content)
-            logger.info("💾 Email content saved to email.txt")
-        else:
-            logger.error("❌ Failed to fetch email from Gmail")
-            return None
-
-    user_message = f"""### SYSTEM
+PROMPT_TEMPLATE = """### SYSTEM
 You are "Ani on X” — an irreverent but insightful AI engineer who writes tweets that mix sharp analysis with light shit-posting.  
 Assume the audience is technically literate (builders, PMs, VCs) and lives on tech Twitter.
 
@@ -112,15 +68,15 @@ Turn the newsletter text I supply (inside the <NEWSLETTER> … </NEWSLETTER> tag
 
 ### DELIVERABLE
 Return valid JSON shaped like:
-{
+{{
         [
-            {"tweet": "tweet 1"},
-            {"tweet": "tweet 2"},
+            {{"tweet": "tweet 1"}},
+            {{"tweet": "tweet 2"}},
         ]
-    }
+    }}
 
 ### HOW MANY
-* Aim for 8–12 tweets per newsletter.
+* {how_many}
 * Each tweet must be self-contained (no “1/🧵” unless explicitly asked).
 * If the newsletter has a blockbuster story (e.g., paradigm-shifting model release) add **one** bonus “mini-thread”: 1 headline tweet + up to 3 follow-ups. Use the same JSON schema but wrap that thread inside a `"thread"` key.
 * The tweets can be longer than 280 characters if needed.
@@ -163,29 +119,260 @@ Return valid JSON shaped like:
 </NEWSLETTER>
 """
 
-    logger.info("🤖 Generating tweets using Gemini API...")
-    client = genai.Client()
+RANK_PROMPT_TEMPLATE = """### TASK
+The candidate tweets below (inside <CANDIDATES>) were drafted from different sections of the same newsletter.
+Pick the best 8–12 of them for "Ani on X":
+* Strong hook, concrete fact from the source, and a real take.
+* Drop duplicates and near-duplicates covering the same story; keep the spicier one.
+* Prefer a mix of stories over several tweets on one topic.
+Return the chosen tweets unchanged, as a JSON list of {{"tweet": "..."}} objects.
+
+<CANDIDATES>
+{candidates}
+</CANDIDATES>
+"""
 
+@log_performance
+def fetch_latest_email_from_gmail():
+    """Fetch the latest email from Gmail using IMAP"""
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=user_message,
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": list[Tweet],
-            },
-        )
-        response_json = json.loads(response.text)
+        newsletter = get_gmail_ingester().fetch_latest()
+        if newsletter is None:
+            return None
+
+        logger.info(f"✅ Successfully fetched email: {newsletter['subject'][:50]}...")
+        return newsletter["content"]
+
+    except Exception as e:
+        logger.error(f"💥 Error fetching email: {e}")
+        return None
+
+
+@log_performance
+def generate_tweets_from_email(on_tweet=None):
+    """Generate tweets for every new newsletter from the configured sources
+
+    on_tweet(tweet_id, tweet_text) is called for each tweet once it is in the
+    queue; in stream mode that happens while generation is still running.
+
+    Starts a trace; its ID is stored with every queued tweet so the approval
+    and posting steps join the same trace. Returns the tweets generated for
+    all new newsletters, or None when there was nothing new.
+    """
+    # pipeline imports this module for the generate stage
+    from pipeline import get_ingest_pipeline
+
+    with span("generate_tweets_from_email"):
+        return get_ingest_pipeline().run(on_tweet=on_tweet)
+
+
+def cached_generate(client, model, prompt):
+    """Ask Gemini for a list of tweets, going through the response cache"""
+    cache = get_response_cache()
+    cache_key = response_cache_key(PROMPT_VERSION, prompt, model, tweet_schema())
+    cached = cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"⚡ Using cached Gemini response ({len(cached)} tweets, {cache.stats()})")
+        return cached
+
+    response = client.models.generate_content(
+        model=model,
+        contents=prompt,
+        config={
+            "response_mime_type": "application/json",
+            "response_schema": list[tweet_model()],
+        },
+    )
+    tweets = json.loads(response.text)
+    cache.put(cache_key, model, tweets)
+    return tweets
+
+
+def compact_for_prompt(text, label="newsletter"):
+    """Compact newsletter text before it goes into a prompt, returns (text, url_map)"""
+    if not COMPACT_NEWSLETTER:
+        return text, {}
+
+    result = compact_newsletter(text, shorten_links=SHORTEN_URLS)
+    before, after = result["bytes_before"], result["bytes_after"]
+    change = 100 * (after - before) / before if before else 0
+    logger.info(
+        f"🗜️ Compacted {label}: {before} → {after} bytes ({change:+.0f}%),"
+        f" ~{result['tokens_before']} → ~{result['tokens_after']} tokens"
+    )
+    return result["text"], result["url_map"]
+
+
+def restore_tweet_urls(tweets, url_map):
+    """Swap [Ln] link tokens in generated tweets back to the original URLs"""
+    if not url_map:
+        return tweets
+    return [
+        {**tweet, "tweet": restore_urls(tweet.get("tweet", ""), url_map)}
+        for tweet in tweets
+    ]
+
+
+def generate_tweets_single(client, email_content, compacted=None):
+    """Generate tweets from the whole newsletter in one call"""
+    content, url_map = compacted or compact_for_prompt(email_content)
+    prompt = PROMPT_TEMPLATE.format(how_many=HOW_MANY_NEWSLETTER, email_content=content)
+    return restore_tweet_urls(cached_generate(client, GEMINI_MODEL, prompt), url_map)
+
+
+@log_performance
+def generate_section_candidates(client, section):
+    """Map step: draft candidate tweets for one newsletter section"""
+    # Sections are compacted individually since the splitter relies on separator lines
+    content, url_map = compact_for_prompt(
+        section["text"], label=f"section '{section['title'][:30]}'"
+    )
+    prompt = PROMPT_TEMPLATE.format(how_many=HOW_MANY_SECTION, email_content=content)
+    candidates = restore_tweet_urls(cached_generate(client, GEMINI_MODEL, prompt), url_map)
+    logger.info(f"🧩 {len(candidates)} candidates from section: {section['title'][:50]}")
+    return candidates
+
+
+@log_performance
+def rank_candidates(client, candidates):
+    """Reduce step: pick the final 8–12 tweets from all section candidates"""
+    if len(candidates) <= 12:
+        return candidates
+
+    prompt = RANK_PROMPT_TEMPLATE.format(
+        candidates=json.dumps(candidates, indent=2, ensure_ascii=False)
+    )
+    return cached_generate(client, GEMINI_RANK_MODEL, prompt)
+
+
+def generate_tweets_chunked(client, email_content):
+    """Generate candidates per section concurrently, then merge and rank them
+
+    Wall-clock time is bounded by the slowest section (plus the short rank
+    call) instead of growing with the length of the whole newsletter.
+    """
+    sections = split_newsletter_sections(email_content, max_chars=SECTION_MAX_CHARS)
+    logger.info(f"🧩 Split newsletter into {len(sections)} sections")
+
+    results = [[] for _ in sections]
+    workers = max(1, min(GENERATION_MAX_PARALLEL, len(sections)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            # Run each section in a copy of this context so it stays in the trace
+            pool.submit(
+                contextvars.copy_context().run, generate_section_candidates, client, section
+            ): i
+            for i, section in enumerate(sections)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                logger.warning(f"⚠️ Section '{sections[i]['title'][:50]}' failed: {e}")
+
+    # Keep document order so the rank pass sees stories in their original sequence
+    candidates = [tweet for section_tweets in results for tweet in section_tweets]
+    if not candidates:
+        raise RuntimeError("No candidate tweets generated from any section")
+    return rank_candidates(client, candidates)
+
+
+def generate_tweets_streaming(client, email_content, on_tweet, compacted=None):
+    """Stream the Gemini response and hand over each tweet as soon as it is complete
+
+    The JSON array is parsed incrementally, so the first tweet reaches
+    on_tweet after the first object is generated rather than the whole list.
+    """
+    content, url_map = compacted or compact_for_prompt(email_content)
+    prompt = PROMPT_TEMPLATE.format(how_many=HOW_MANY_NEWSLETTER, email_content=content)
+
+    cache = get_response_cache()
+    cache_key = response_cache_key(PROMPT_VERSION, prompt, GEMINI_MODEL, tweet_schema())
+    cached = cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"⚡ Using cached Gemini response ({len(cached)} tweets, {cache.stats()})")
+        tweets = restore_tweet_urls(cached, url_map)
+        for tweet in tweets:
+            on_tweet(tweet)
+        return tweets
+
+    parser = JsonArrayStreamParser()
+    raw_tweets = []
+    start_time = time.perf_counter()
+    for chunk in client.models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config={
+            "response_mime_type": "application/json",
+            "response_schema": list[tweet_model()],
+        },
+    ):
+        for tweet in parser.feed(chunk.text or ""):
+            if not raw_tweets:
+                logger.info(
+                    f"⚡ First tweet streamed after {time.perf_counter() - start_time:.2f}s"
+                )
+            raw_tweets.append(tweet)
+            on_tweet(restore_tweet_urls([tweet], url_map)[0])
+
+    if not parser.finished:
+        raise RuntimeError(f"Stream ended before the JSON array was closed ({len(raw_tweets)} tweets)")
+    cache.put(cache_key, GEMINI_MODEL, raw_tweets)
+    return restore_tweet_urls(raw_tweets, url_map)
+
+
+@log_performance
+def generate_tweets_for_newsletter(email_content, mode=None, on_tweet=None, compacted=None):
+    """Generate tweets for one newsletter and add them to the queue
+
+    compacted is an optional (text, url_map) from compact_for_prompt, so a
+    caller that compacted the newsletter already does not pay for it twice
+    (chunked mode compacts per section and ignores it).
+    """
+    mode = mode or GENERATION_MODE
+    logger.info(f"🤖 Generating tweets using Gemini API ({mode} mode)...")
+    client = get_genai_client()
+    queue = get_tweet_queue()
+    trace_id = current_trace_id()
+
+    def enqueue_tweet(tweet):
+        tweet_text = tweet.get("tweet", "")
+        if not tweet_text:
+            return
+        tweet["id"] = make_tweet_id(tweet_text)
+        tweet_id = queue.enqueue(tweet_text, tweet_id=tweet["id"], trace_id=trace_id)
+        if on_tweet:
+            on_tweet(tweet_id, tweet_text)
+
+    try:
+        if mode == "stream":
+            response_json = generate_tweets_streaming(
+                client, email_content, enqueue_tweet, compacted
+            )
+        elif mode == "chunked":
+            response_json = generate_tweets_chunked(client, email_content)
+        else:
+            response_json = generate_tweets_single(client, email_content, compacted)
 
         # Log the number of tweets generated
         tweet_count = len(response_json)
         logger.info(f"✅ Generated {tweet_count} tweets successfully")
 
-        with open("generated_tweets.json", "w") as f:
-            json.dump(response_json, f, indent=2)
-
-        logger.info("💾 Tweets saved to generated_tweets.json")
-        return response
+        if mode == "stream":
+            logger.info(f"💾 {tweet_count} tweets streamed into the queue")
+        else:
+            # Assign stable IDs now; they identify the tweet in Slack payloads from here on
+            for tweet in response_json:
+                if tweet.get("tweet"):
+                    tweet["id"] = make_tweet_id(tweet["tweet"])
+            added = queue.enqueue_many(response_json, trace_id=trace_id)
+            logger.info(f"💾 {added} new tweets added to the queue")
+            if on_tweet:
+                for tweet in response_json:
+                    if tweet.get("tweet"):
+                        on_tweet(tweet["id"], tweet["tweet"])
+        return response_json
 
     except Exception as e:
         logger.error(f"💥 Error generating tweets with Gemini: {e}")
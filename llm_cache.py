@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from state_db import get_connection
+from logger_config import get_logger
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("cache")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses (last_access);
+"""
+
+
+def response_cache_key(prompt_version, content, model, schema):
+    """Hash everything that can change the model output"""
+    material = json.dumps(
+        [prompt_version, content, model, schema], sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk LRU cache of parsed LLM responses with a TTL
+
+    Entries live in the state database; the least recently used ones are
+    dropped once max_entries is exceeded and anything older than ttl is
+    treated as a miss.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, db_path=None):
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+        self.ttl = ttl or int(os.getenv("LLM_CACHE_TTL_DAYS", "7")) * 86400
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def get(self, key):
+        """Return the cached response for key, or None"""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        now = time.time()
+        if row is None or now - row["created_at"] > self.ttl:
+            with self._lock:
+                self.misses += 1
+            if row is not None:
+                conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            return None
+
+        conn.execute(
+            "UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key)
+        )
+        with self._lock:
+            self.hits += 1
+        return json.loads(row["response"])
+
+    def put(self, key, model, response):
+        """Store a parsed response and trim the cache to max_entries"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, last_access)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, model, json.dumps(response), now, now),
+        )
+        conn.execute(
+            "DELETE FROM llm_responses WHERE key IN (SELECT key FROM llm_responses"
+            " ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Get the process-wide LLM response cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
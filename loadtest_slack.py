@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Load test for the Slack interaction webhook
+
+Replays signed Slack interaction payloads against /slack/interactions from
+a pool of keep-alive connections and reports throughput and latency
+percentiles. Requests are signed with SLACK_SIGNING_SECRET exactly as Slack
+signs them, so they pass verification on a production server.
+
+By default the payloads click the disabled button, which exercises
+verification, parsing and routing without touching X or Slack. Use
+--payloads to replay captured payloads (one JSON payload per line), or
+--action reject to go through the idempotency store and the action pool.
+
+Examples:
+    python loadtest_slack.py --requests 2000 --concurrency 50
+    python loadtest_slack.py --url http://127.0.0.1:5003 --payloads payloads.jsonl
+"""
+
+import argparse
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def sign(body, signing_secret, timestamp):
+    """Slack request signature headers for a body"""
+    basestring = f"v0:{timestamp}:{body}".encode("utf-8")
+    signature = "v0=" + hmac.new(signing_secret.encode("utf-8"), basestring, hashlib.sha256).hexdigest()
+    return {
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": signature,
+    }
+
+
+def synthetic_payload(action):
+    """A block_actions payload with a fresh message_ts so idempotency never short-circuits"""
+    action_id = "disabled_button" if action == "noop" else f"{action}_tweet_0"
+    message_ts = f"{time.time():.6f}{uuid.uuid4().hex[:6]}"
+    return {
+        "type": "block_actions",
+        "trigger_id": "loadtest",
+        "actions": [
+            {
+                "action_id": action_id,
+                "block_id": f"tweet_actions:loadtest{uuid.uuid4().hex[:8]}",
+                "value": f"Load test tweet {message_ts}",
+            }
+        ],
+        "message": {"ts": message_ts},
+    }
+
+
+def load_payloads(path):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class Client:
+    """One keep-alive connection per worker thread"""
+
+    def __init__(self, url):
+        self.url = urlparse(url)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn_class = (
+                http.client.HTTPSConnection if self.url.scheme == "https" else http.client.HTTPConnection
+            )
+            conn = self._local.conn = conn_class(self.url.netloc, timeout=30)
+        return conn
+
+    def post(self, body, headers):
+        """Send one request, returns (status, latency seconds)"""
+        start = time.perf_counter()
+        try:
+            conn = self._connection()
+            conn.request("POST", self.url.path or "/", body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+            if response.getheader("Connection", "").lower() == "close":
+                conn.close()
+                self._local.conn = None
+        except (OSError, http.client.HTTPException) as e:
+            status = type(e).__name__
+            self._local.conn = None
+        return status, time.perf_counter() - start
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay signed Slack interactions against the webhook")
+    parser.add_argument("--url", default="http://127.0.0.1:5003/slack/interactions")
+    parser.add_argument("--requests", type=int, default=1000, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests in flight")
+    parser.add_argument("--payloads", help="JSON-lines file of payloads to replay (cycled)")
+    parser.add_argument(
+        "--action",
+        choices=("noop", "reject", "approve"),
+        default="noop",
+        help="Synthetic payload action (approve posts to X!)",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    signing_secret = os.getenv("SLACK_SIGNING_SECRET", "")
+    if not signing_secret:
+        print("⚠️ SLACK_SIGNING_SECRET not set - sending unsigned requests")
+
+    payloads = load_payloads(args.payloads) if args.payloads else None
+    client = Client(args.url)
+
+    def one_request(i):
+        payload = payloads[i % len(payloads)] if payloads else synthetic_payload(args.action)
+        body = urlencode({"payload": json.dumps(payload)})
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        if signing_secret:
+            headers.update(sign(body, signing_secret, str(int(time.time()))))
+        return client.post(body, headers)
+
+    print(f"🚀 {args.requests} requests, {args.concurrency} concurrent -> {args.url}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    statuses = Counter(str(status) for status, _ in results)
+    latencies = sorted(latency * 1000 for _, latency in results)
+    report = {
+        "requests": len(results),
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 1),
+        "statuses": dict(statuses),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"✅ {report['requests']} requests in {report['elapsed_s']}s ({report['throughput_rps']} req/s)")
+        print(f"   statuses: {report['statuses']}")
+        print(
+            f"   latency ms: p50 {report['p50_ms']}  p95 {report['p95_ms']}"
+            f"  p99 {report['p99_ms']}  max {report['max_ms']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Latency index and query tool for the structured events.jsonl logs
+
+Streams logs/events.jsonl and its rotated backups line by line and builds
+per-function, per-day latency histograms from the "performance" events
+written by log_performance. Each file's histograms are cached in
+logs/latency_index.json, keyed by a fingerprint of the file, so re-running
+a query only reads files that changed since the last run.
+
+Examples:
+    python log_query.py
+    python log_query.py --function post_tweet_to_twitter --days 7
+    python log_query.py --component webhook --days 1
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+INDEX_VERSION = 1
+
+# Histogram bucket upper bounds in milliseconds (~25% apart, 0.5ms to ~4min)
+BUCKETS = [round(0.5 * 1.25**i, 3) for i in range(60)]
+
+
+def bucket_for(duration_ms):
+    """Index of the histogram bucket for a duration (len(BUCKETS) is overflow)"""
+    return bisect.bisect_left(BUCKETS, duration_ms)
+
+
+def file_fingerprint(path):
+    """Identify a log file across renames: size, mtime and a hash of its first line
+
+    Rotation renames events.jsonl.1 to events.jsonl.2 without changing its
+    content, so the path alone is not a usable cache key.
+    """
+    stat = path.stat()
+    with open(path, "rb") as f:
+        first_line = f.readline()
+    digest = hashlib.sha1(first_line).hexdigest()[:16]
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{digest}"
+
+
+def index_file(path):
+    """Stream one events file into {day: {component|function: histogram}}"""
+    days = {}
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if '"performance"' not in line:
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get("event") != "performance" or "duration_ms" not in event:
+                continue
+
+            day = datetime.fromtimestamp(event["ts"]).strftime("%Y-%m-%d")
+            key = f"{event.get('component', '?')}|{event.get('function', '?')}"
+            stats = days.setdefault(day, {}).setdefault(
+                key, {"counts": {}, "count": 0, "errors": 0, "sum_ms": 0.0, "max_ms": 0.0}
+            )
+            duration = float(event["duration_ms"])
+            bucket = str(bucket_for(duration))
+            stats["counts"][bucket] = stats["counts"].get(bucket, 0) + 1
+            stats["count"] += 1
+            stats["sum_ms"] += duration
+            stats["max_ms"] = max(stats["max_ms"], duration)
+            if event.get("outcome") == "error":
+                stats["errors"] += 1
+    return days
+
+
+def load_index(index_path):
+    try:
+        with open(index_path, "r") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": INDEX_VERSION, "files": {}}
+
+
+def build_index(logs_dir):
+    """Update the on-disk index for every events file and return it"""
+    logs_dir = Path(logs_dir)
+    index_path = logs_dir / "latency_index.json"
+    index = load_index(index_path)
+
+    files = {}
+    indexed = 0
+    for path in sorted(logs_dir.glob("events.jsonl*")):
+        fingerprint = file_fingerprint(path)
+        if fingerprint in index["files"]:
+            files[fingerprint] = index["files"][fingerprint]
+        else:
+            files[fingerprint] = index_file(path)
+            indexed += 1
+
+    # Files that rotated away entirely drop out of the index here
+    index["files"] = files
+    tmp_path = index_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+    print(f"Indexed {indexed} new/changed file(s), {len(files)} total", file=sys.stderr)
+    return index
+
+
+def merge(index, since_day=None, function=None, component=None):
+    """Merge histograms across files and days into one per component|function"""
+    merged = {}
+    for days in index["files"].values():
+        for day, functions in days.items():
+            if since_day and day < since_day:
+                continue
+            for key, stats in functions.items():
+                comp, func = key.split("|", 1)
+                if function and func != function:
+                    continue
+                if component and comp != component:
+                    continue
+                total = merged.setdefault(
+                    key, {"counts": {}, "count": 0, "errors": 0, "sum_ms": 0.0, "max_ms": 0.0}
+                )
+                for bucket, n in stats["counts"].items():
+                    total["counts"][bucket] = total["counts"].get(bucket, 0) + n
+                total["count"] += stats["count"]
+                total["errors"] += stats["errors"]
+                total["sum_ms"] += stats["sum_ms"]
+                total["max_ms"] = max(total["max_ms"], stats["max_ms"])
+    return merged
+
+
+def percentile(stats, q):
+    """Approximate percentile (upper bound of the bucket holding the q-th value)"""
+    target = q * stats["count"]
+    seen = 0
+    for bucket in sorted(stats["counts"], key=int):
+        seen += stats["counts"][bucket]
+        if seen >= target:
+            i = int(bucket)
+            upper = BUCKETS[i] if i < len(BUCKETS) else stats["max_ms"]
+            return round(min(upper, stats["max_ms"]), 1)
+    return stats["max_ms"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency percentiles from events.jsonl logs")
+    parser.add_argument("--logs-dir", default="logs")
+    parser.add_argument("--days", type=int, help="Only include the last N days")
+    parser.add_argument("--function", help="Only this function (e.g. post_tweet_to_twitter)")
+    parser.add_argument("--component", help="Only this component/logger name")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_index(args.logs_dir)
+    since_day = None
+    if args.days:
+        since_day = (datetime.now() - timedelta(days=args.days - 1)).strftime("%Y-%m-%d")
+    merged = merge(index, since_day, args.function, args.component)
+
+    rows = []
+    for key, stats in sorted(merged.items()):
+        rows.append(
+            {
+                "function": key,
+                "count": stats["count"],
+                "errors": stats["errors"],
+                "mean_ms": round(stats["sum_ms"] / stats["count"], 1),
+                "p50_ms": percentile(stats, 0.50),
+                "p95_ms": percentile(stats, 0.95),
+                "p99_ms": percentile(stats, 0.99),
+                "max_ms": round(stats["max_ms"], 1),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(
+            f"{'function':50} {'count':>7} {'err':>5} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+        )
+        for row in rows:
+            print(
+                f"{row['function'][:50]:50} {row['count']:>7} {row['errors']:>5}"
+                f" {row['mean_ms']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9}"
+                f" {row['p99_ms']:>9} {row['max_ms']:>9}"
+            )
+    print(f"Query took {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
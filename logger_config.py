@@ -1,8 +1,16 @@
+import atexit
+import copy
+import functools
+import json
 import logging
 import logging.handlers
 import os
+import queue
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
+from metrics import observe_call
 
 
 class ColoredFormatter(logging.Formatter):
@@ -19,6 +27,9 @@ class ColoredFormatter(logging.Formatter):
     }
 
     def format(self, record):
+        # Color a copy so other handlers still see the plain level name
+        record = copy.copy(record)
+
         # Add color to the level name
         if record.levelname in self.COLORS:
             record.levelname = f"{self.COLORS[record.levelname]}{record.levelname}{self.COLORS['RESET']}"
@@ -28,8 +39,170 @@ class ColoredFormatter(logging.Formatter):
         return formatted
 
 
-def setup_logging():
-    """Configure logging for the entire project"""
+class JsonLinesFormatter(logging.Formatter):
+    """Formatter for the structured events.jsonl sink (one JSON object per line)"""
+
+    # Typed fields picked up from `extra=` when present
+    FIELDS = (
+        "event",
+        "function",
+        "duration_ms",
+        "outcome",
+        "tweet_id",
+        "message_ts",
+        "trace_id",
+        "span",
+        "parent_span",
+    )
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "component": record.name,
+            "function": record.funcName,
+            "message": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for a bounded queue that never formats on the caller's thread
+
+    With the "drop" policy DEBUG/INFO records are dropped when the queue is
+    full, while WARNING and above wait briefly for room. With "block" every
+    record waits (backpressure on the logging thread).
+    """
+
+    def __init__(self, log_queue, policy="drop", block_timeout=1.0):
+        super().__init__(log_queue)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.enqueued = 0
+
+    def prepare(self, record):
+        # Only merge the message; formatting happens on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.policy == "block":
+                self.queue.put(record)
+            elif record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose stop() waits for room instead of failing on a full queue"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+# Async logging state (see setup_logging)
+_queue_handler = None
+_queue_listener = None
+
+# Lazy setup state (see _LazySetupHandler)
+_setup_done = False
+_setup_lock = threading.RLock()
+
+
+class _LazySetupHandler(logging.Handler):
+    """Placeholder root handler that configures logging on the first record
+
+    Importing a module that logs no longer creates the log directory and
+    file handlers; that happens the first time anything is actually logged.
+    """
+
+    def emit(self, record):
+        pass
+
+    def handle(self, record):
+        with _setup_lock:
+            if not _setup_done:
+                setup_logging()
+                # This record was created before tracing.install() ran
+                import tracing
+
+                if not hasattr(record, "trace_id"):
+                    tracing.stamp(record)
+        # setup_logging() replaced this handler, so this reaches the real ones
+        logging.getLogger(record.name).handle(record)
+        return True
+
+
+def get_logging_stats():
+    """Counters for the async logging queue (empty in synchronous mode)"""
+    if _queue_handler is None:
+        return {}
+    return {
+        "policy": _queue_handler.policy,
+        "enqueued": _queue_handler.enqueued,
+        "dropped": _queue_handler.dropped,
+        "queue_depth": _queue_handler.queue.qsize(),
+        "queue_capacity": _queue_handler.queue.maxsize,
+    }
+
+
+def shutdown_logging():
+    """Flush queued records to disk and stop the background logging thread"""
+    global _queue_handler, _queue_listener
+    if _queue_listener is None:
+        return
+    _queue_listener.stop()
+    if _queue_handler.dropped:
+        # The listener is gone, so write straight to the handlers
+        record = logging.LogRecord(
+            "root",
+            logging.WARNING,
+            __file__,
+            0,
+            f"⚠️ {_queue_handler.dropped} log records were dropped (queue full)",
+            None,
+            None,
+            func="shutdown_logging",
+        )
+        for handler in _queue_listener.handlers:
+            if record.levelno >= handler.level and handler.filter(record):
+                handler.handle(record)
+    for handler in _queue_listener.handlers:
+        handler.flush()
+    _queue_handler = None
+    _queue_listener = None
+
+
+def setup_logging(async_mode=None):
+    """Configure logging for the entire project
+
+    In async mode (LOG_ASYNC=1) loggers only put records on a bounded queue
+    and a single background thread does the formatting and file I/O.
+    """
+    global _setup_done
+    # Imported here: tracing itself logs through this module
+    import tracing
+
+    tracing.install()
+    if async_mode is None:
+        async_mode = os.getenv("LOG_ASYNC", "0") == "1"
+
+    # Stop a previous async listener before replacing the handlers
+    shutdown_logging()
 
     # Create logs directory if it doesn't exist
     logs_dir = Path("logs")
@@ -39,8 +212,10 @@ def setup_logging():
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.DEBUG)
 
-    # Clear any existing handlers
-    root_logger.handlers.clear()
+    # Drop any existing handlers. A new list rather than clear(): when the lazy
+    # handler triggers this, logging is still iterating the old list
+    root_logger.handlers = []
+    _setup_done = True
 
     # Formatter for files (detailed)
     file_formatter = logging.Formatter(
@@ -53,6 +228,8 @@ def setup_logging():
         fmt="%(asctime)s | %(name)s | %(levelname)s | %(message)s", datefmt="%H:%M:%S"
     )
 
+    root_handlers = []
+
     # === FILE HANDLERS ===
 
     # Main application log (rotating)
@@ -60,83 +237,96 @@ def setup_logging():
         logs_dir / "tweet_bot.log",
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=5,
+        delay=True,
     )
     main_file_handler.setLevel(logging.INFO)
     main_file_handler.setFormatter(file_formatter)
-    root_logger.addHandler(main_file_handler)
+    root_handlers.append(main_file_handler)
 
     # Error log (only errors and critical)
     error_file_handler = logging.handlers.RotatingFileHandler(
         logs_dir / "errors.log",
         maxBytes=5 * 1024 * 1024,  # 5MB
         backupCount=3,
+        delay=True,
     )
     error_file_handler.setLevel(logging.ERROR)
     error_file_handler.setFormatter(file_formatter)
-    root_logger.addHandler(error_file_handler)
+    root_handlers.append(error_file_handler)
 
     # Debug log (everything, for development)
     debug_file_handler = logging.handlers.RotatingFileHandler(
         logs_dir / "debug.log",
         maxBytes=20 * 1024 * 1024,  # 20MB
         backupCount=2,
+        delay=True,
     )
     debug_file_handler.setLevel(logging.DEBUG)
     debug_file_handler.setFormatter(file_formatter)
-    root_logger.addHandler(debug_file_handler)
+    root_handlers.append(debug_file_handler)
+
+    # Structured JSON-lines log (typed fields, see log_query.py)
+    if os.getenv("LOG_JSON", "0") == "1":
+        json_file_handler = logging.handlers.RotatingFileHandler(
+            logs_dir / "events.jsonl",
+            maxBytes=20 * 1024 * 1024,  # 20MB
+            backupCount=5,
+            delay=True,
+        )
+        json_file_handler.setLevel(logging.DEBUG)
+        json_file_handler.setFormatter(JsonLinesFormatter())
+        root_handlers.append(json_file_handler)
 
     # === CONSOLE HANDLER ===
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(console_formatter)
-    root_logger.addHandler(console_handler)
+    root_handlers.append(console_handler)
 
     # === COMPONENT-SPECIFIC LOGGERS ===
 
-    # Gmail logger
-    gmail_logger = logging.getLogger("gmail")
-    gmail_file_handler = logging.handlers.RotatingFileHandler(
-        logs_dir / "gmail.log", maxBytes=5 * 1024 * 1024, backupCount=2
-    )
-    gmail_file_handler.setFormatter(file_formatter)
-    gmail_logger.addHandler(gmail_file_handler)
-
-    # Slack logger
-    slack_logger = logging.getLogger("slack")
-    slack_file_handler = logging.handlers.RotatingFileHandler(
-        logs_dir / "slack.log", maxBytes=5 * 1024 * 1024, backupCount=2
-    )
-    slack_file_handler.setFormatter(file_formatter)
-    slack_logger.addHandler(slack_file_handler)
-
-    # Twitter logger
-    twitter_logger = logging.getLogger("twitter")
-    twitter_file_handler = logging.handlers.RotatingFileHandler(
-        logs_dir / "twitter.log", maxBytes=5 * 1024 * 1024, backupCount=2
-    )
-    twitter_file_handler.setFormatter(file_formatter)
-    twitter_logger.addHandler(twitter_file_handler)
-
-    # LLM logger
-    llm_logger = logging.getLogger("llm")
-    llm_file_handler = logging.handlers.RotatingFileHandler(
-        logs_dir / "llm.log", maxBytes=5 * 1024 * 1024, backupCount=2
-    )
-    llm_file_handler.setFormatter(file_formatter)
-    llm_logger.addHandler(llm_file_handler)
-
-    # Webhook logger
-    webhook_logger = logging.getLogger("webhook")
-    webhook_file_handler = logging.handlers.RotatingFileHandler(
-        logs_dir / "webhook.log", maxBytes=5 * 1024 * 1024, backupCount=2
-    )
-    webhook_file_handler.setFormatter(file_formatter)
-    webhook_logger.addHandler(webhook_file_handler)
+    # Gmail, Slack, Twitter, LLM and webhook each get their own file
+    component_handlers = {}
+    for component in ("gmail", "slack", "twitter", "llm", "webhook"):
+        component_logger = logging.getLogger(component)
+        component_logger.handlers.clear()
+        component_file_handler = logging.handlers.RotatingFileHandler(
+            logs_dir / f"{component}.log", maxBytes=5 * 1024 * 1024, backupCount=2, delay=True
+        )
+        component_file_handler.setFormatter(file_formatter)
+        component_handlers[component] = component_file_handler
+
+    if async_mode:
+        global _queue_handler, _queue_listener
+        log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        _queue_handler = BoundedQueueHandler(
+            log_queue, policy=os.getenv("LOG_QUEUE_POLICY", "drop")
+        )
+        root_logger.addHandler(_queue_handler)
+
+        # Component files only see their own logger's records, as when attached directly
+        for component, handler in component_handlers.items():
+            handler.addFilter(logging.Filter(component))
+        _queue_listener = DrainingQueueListener(
+            log_queue,
+            *component_handlers.values(),
+            *root_handlers,
+            respect_handler_level=True,
+        )
+        _queue_listener.start()
+        atexit.register(shutdown_logging)
+    else:
+        for handler in root_handlers:
+            root_logger.addHandler(handler)
+        for component, handler in component_handlers.items():
+            logging.getLogger(component).addHandler(handler)
 
     # === INITIAL LOG MESSAGE ===
     logging.info("=" * 60)
     logging.info("🚀 Tweet Automation Bot - Logging System Initialized")
     logging.info(f"📅 Session started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    if async_mode:
+        logging.info("🧵 Async logging enabled (queue + background writer)")
     logging.info("=" * 60)
 
 
@@ -147,30 +337,52 @@ def get_logger(name: str) -> logging.Logger:
 
 # Performance logging decorator
 def log_performance(func):
-    """Decorator to log function performance"""
+    """Decorator to log function performance
 
-    def wrapper(*args, **kwargs):
-        import time
+    Every call is timed with a monotonic clock and recorded in the in-process
+    metrics (see metrics.py and /metrics). The per-call DEBUG line can be
+    turned off with LOG_PERFORMANCE=0 once the metrics are enough.
+    """
+    component = func.__module__
+    log_calls = os.getenv("LOG_PERFORMANCE", "1") == "1"
 
-        logger = get_logger(func.__module__)
-        start_time = time.time()
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        logger = get_logger(component)
+        start_time = time.perf_counter()
         try:
             result = func(*args, **kwargs)
-            end_time = time.time()
-            logger.debug(
-                f"⚡ {func.__name__} completed in {end_time - start_time:.2f}s"
-            )
+            duration = time.perf_counter() - start_time
+            observe_call(component, func.__name__, duration, "success")
+            if log_calls and logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"⚡ {func.__name__} completed in {duration:.2f}s",
+                    extra={
+                        "event": "performance",
+                        "function": func.__name__,
+                        "duration_ms": round(duration * 1000, 3),
+                        "outcome": "success",
+                    },
+                )
             return result
         except Exception as e:
-            end_time = time.time()
+            duration = time.perf_counter() - start_time
+            observe_call(component, func.__name__, duration, "error")
             logger.error(
-                f"💥 {func.__name__} failed after {end_time - start_time:.2f}s: {e}"
+                f"💥 {func.__name__} failed after {duration:.2f}s: {e}",
+                extra={
+                    "event": "performance",
+                    "function": func.__name__,
+                    "duration_ms": round(duration * 1000, 3),
+                    "outcome": "error",
+                },
             )
             raise
 
     return wrapper
 
 
-# Initialize logging when module is imported
+# Configure logging on first use rather than at import
 if __name__ != "__main__":
-    setup_logging()
+    logging.getLogger().setLevel(logging.DEBUG)
+    logging.getLogger().addHandler(_LazySetupHandler())
@@ -0,0 +1,161 @@
+import bisect
+import threading
+
+# Latency buckets in seconds (Prometheus "le" upper bounds)
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Histogram:
+    """Latency histogram with fixed buckets; one small lock per label set"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class MetricFamily:
+    """A named metric with one child (Histogram or Counter) per label set"""
+
+    def __init__(self, name, help_text, kind, label_names, factory):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.label_names = label_names
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            labels = list(zip(self.label_names, values))
+            if self.kind == "counter":
+                lines.append(f"{self.name}{_format_labels(labels)} {child.value}")
+                continue
+
+            counts, count, total = child.snapshot()
+            cumulative = 0
+            for bound, n in zip(child.buckets, counts):
+                cumulative += n
+                bucket_labels = labels + [("le", repr(float(bound)))]
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._families = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def _family(self, name, help_text, kind, label_names, factory):
+        family = self._families.get(name)
+        if family is None:
+            with self._lock:
+                family = self._families.setdefault(
+                    name, MetricFamily(name, help_text, kind, label_names, factory)
+                )
+        return family
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._family(name, help_text, "histogram", label_names, lambda: Histogram(buckets))
+
+    def counter(self, name, help_text, label_names=()):
+        return self._family(name, help_text, "counter", label_names, Counter)
+
+    def register_gauge(self, name, help_text, callback, label_name=None):
+        """Register a gauge read at scrape time
+
+        callback returns a number, or a {label_value: number} dict when
+        label_name is given.
+        """
+        with self._lock:
+            self._gauges[name] = (help_text, callback, label_name)
+
+    def render(self):
+        lines = []
+        for family in list(self._families.values()):
+            lines.extend(family.render())
+        for name, (help_text, callback, label_name) in list(self._gauges.items()):
+            try:
+                value = callback()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            if label_name:
+                for label_value, number in sorted(value.items()):
+                    lines.append(f"{name}{_format_labels([(label_name, label_value)])} {number}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+function_duration = registry.histogram(
+    "function_duration_seconds",
+    "Wall time of @log_performance functions",
+    ("component", "function"),
+)
+function_calls = registry.counter(
+    "function_calls_total",
+    "Calls of @log_performance functions by outcome",
+    ("component", "function", "outcome"),
+)
+
+
+def observe_call(component, function, duration, outcome):
+    """Record one timed call (used by log_performance)"""
+    function_duration.labels(component, function).observe(duration)
+    function_calls.labels(component, function, outcome).inc()
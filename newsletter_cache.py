@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+from state_db import get_connection
+from logger_config import get_logger
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("cache")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS newsletter_cache (
+    key TEXT PRIMARY KEY,
+    message_id TEXT,
+    subject TEXT,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_newsletter_cache_fetched_at ON newsletter_cache (fetched_at);
+CREATE TABLE IF NOT EXISTS processed_newsletters (
+    key TEXT PRIMARY KEY,
+    processed_at REAL NOT NULL
+);
+-- Running total of cached bytes, kept by triggers so a put never scans the index
+CREATE TABLE IF NOT EXISTS newsletter_cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO newsletter_cache_size (id, bytes)
+    SELECT 1, COALESCE(SUM(size), 0) FROM newsletter_cache;
+CREATE TRIGGER IF NOT EXISTS newsletter_cache_size_insert AFTER INSERT ON newsletter_cache
+BEGIN
+    UPDATE newsletter_cache_size SET bytes = bytes + NEW.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS newsletter_cache_size_delete AFTER DELETE ON newsletter_cache
+BEGIN
+    UPDATE newsletter_cache_size SET bytes = bytes - OLD.size WHERE id = 1;
+END;
+"""
+
+# Seconds between age-based eviction passes
+EVICT_INTERVAL = int(os.getenv("NEWSLETTER_CACHE_EVICT_INTERVAL", "3600"))
+# Entries looked at per eviction query
+EVICT_BATCH = 100
+
+
+class CacheFullError(RuntimeError):
+    """The cache is full of unprocessed newsletters and cannot take another"""
+
+
+def newsletter_key(newsletter):
+    """Cache key for a newsletter: its Message-ID if it has one, else its content"""
+    message_id = newsletter.get("message_id")
+    source = f"id:{message_id}" if message_id else f"content:{newsletter['content']}"
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+class NewsletterCache:
+    """Content-addressed on-disk cache of parsed newsletters
+
+    Each newsletter is stored as <key>.json with its metadata; the index and
+    the "already processed" marks live in the state database. Processed marks
+    outlive eviction, so an evicted newsletter is never regenerated.
+
+    Only processed newsletters are ever evicted. When unprocessed ones fill
+    the cache, put() raises CacheFullError instead, so the source does not
+    move its checkpoint past a newsletter that was never stored.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, max_age=None, db_path=None):
+        self.cache_dir = Path(
+            cache_dir or os.getenv("NEWSLETTER_CACHE_DIR", "cache/newsletters")
+        )
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes or int(os.getenv("NEWSLETTER_CACHE_MAX_MB", "200")) * 1024 * 1024
+        self.max_age = max_age or int(os.getenv("NEWSLETTER_CACHE_MAX_AGE_DAYS", "30")) * 86400
+        self.db_path = db_path
+        self._conn().executescript(SCHEMA)
+        self._last_evict = 0.0
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def total_bytes(self):
+        row = self._conn().execute("SELECT bytes FROM newsletter_cache_size WHERE id = 1").fetchone()
+        return row["bytes"] if row else 0
+
+    def put(self, newsletter):
+        """Store a newsletter, returns its cache key
+
+        Raises CacheFullError if it only fits by evicting unprocessed newsletters.
+        """
+        key = newsletter_key(newsletter)
+        if self.contains(key):
+            return key
+
+        size = len(newsletter["content"].encode("utf-8"))
+        over = self.total_bytes() + size - self.max_bytes
+        if over > 0 and self.evict(need=over) < over:
+            raise CacheFullError(
+                f"Newsletter cache is full ({self.max_bytes // (1024 * 1024)} MB of unprocessed"
+                f" newsletters), not caching: {(newsletter.get('subject') or key[:12])[:50]}"
+            )
+        if time.monotonic() - self._last_evict > EVICT_INTERVAL:
+            self.evict()
+
+        entry = {
+            "key": key,
+            "message_id": newsletter.get("message_id"),
+            "subject": newsletter.get("subject"),
+            "date": newsletter.get("date"),
+            "fetched_at": time.time(),
+            "size": size,
+            "content": newsletter["content"],
+        }
+        tmp_path = self._path(key).with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._path(key))
+
+        self._conn().execute(
+            "INSERT OR IGNORE INTO newsletter_cache (key, message_id, subject, size, fetched_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, entry["message_id"], entry["subject"], entry["size"], entry["fetched_at"]),
+        )
+        logger.info(f"💾 Cached newsletter {key[:12]} ({entry['size']} bytes)")
+        return key
+
+    def get(self, key):
+        """Load a cached newsletter entry, or None if it is not cached"""
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def contains(self, key):
+        row = self._conn().execute(
+            "SELECT 1 FROM newsletter_cache WHERE key = ?", (key,)
+        ).fetchone()
+        return row is not None
+
+    def is_processed(self, key):
+        """Whether tweets were already generated for this newsletter"""
+        row = self._conn().execute(
+            "SELECT 1 FROM processed_newsletters WHERE key = ?", (key,)
+        ).fetchone()
+        return row is not None
+
+    def mark_processed(self, key):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO processed_newsletters (key, processed_at) VALUES (?, ?)",
+            (key, time.time()),
+        )
+
+    def unprocessed(self):
+        """Yield cached newsletters that have not been processed yet, oldest first"""
+        keys = [
+            row["key"]
+            for row in self._conn().execute(
+                "SELECT key FROM newsletter_cache c WHERE NOT EXISTS"
+                " (SELECT 1 FROM processed_newsletters p WHERE p.key = c.key)"
+                " ORDER BY fetched_at"
+            )
+        ]
+        for key in keys:
+            entry = self.get(key)
+            if entry is not None:
+                yield entry
+
+    def _drop(self, rows):
+        conn = self._conn()
+        for row in rows:
+            self._path(row["key"]).unlink(missing_ok=True)
+            conn.execute("DELETE FROM newsletter_cache WHERE key = ?", (row["key"],))
+
+    def evict(self, need=0):
+        """Drop processed entries older than max_age, then the oldest processed until need bytes are freed
+
+        Unprocessed newsletters are pending work and are never dropped.
+        Returns the number of bytes freed.
+        """
+        conn = self._conn()
+        self._last_evict = time.monotonic()
+        processed = "EXISTS (SELECT 1 FROM processed_newsletters p WHERE p.key = c.key)"
+        freed = 0
+        evicted = 0
+
+        cutoff = time.time() - self.max_age
+        while True:
+            rows = conn.execute(
+                f"SELECT key, size FROM newsletter_cache c WHERE fetched_at < ? AND {processed}"
+                " ORDER BY fetched_at LIMIT ?",
+                (cutoff, EVICT_BATCH),
+            ).fetchall()
+            self._drop(rows)
+            freed += sum(row["size"] for row in rows)
+            evicted += len(rows)
+            if len(rows) < EVICT_BATCH:
+                break
+
+        # Walks the fetched_at index and stops as soon as enough is freed
+        while freed < need:
+            rows = conn.execute(
+                f"SELECT key, size FROM newsletter_cache c WHERE {processed}"
+                " ORDER BY fetched_at LIMIT ?",
+                (EVICT_BATCH,),
+            ).fetchall()
+            if not rows:
+                break
+            batch = []
+            for row in rows:
+                if freed >= need:
+                    break
+                batch.append(row)
+                freed += row["size"]
+            self._drop(batch)
+            evicted += len(batch)
+
+        if evicted:
+            logger.info(f"🧹 Evicted {evicted} newsletters from cache ({freed} bytes)")
+        return freed
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_newsletter_cache():
+    """Get the process-wide newsletter cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = NewsletterCache()
+    return _cache
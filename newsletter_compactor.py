@@ -0,0 +1,113 @@
+import re
+
+URL_RE = re.compile(r"https?://[^\s<>()\[\]]+[^\s<>()\[\].,;:!?'\"]")
+SEPARATOR_LINE_RE = re.compile(r"^\s*([-=_*~#])\1{9,}\s*$")
+URL_TOKEN_RE = re.compile(r"\[L\d+\]")
+
+# Lines that start the mailing-list footer; everything after them is dropped
+FOOTER_MARKERS = (
+    "You are receiving this email because",
+    "Want to change how you receive these emails?",
+    "You can unsubscribe from this list",
+)
+
+# A URL repeated within this many characters is a duplicate (anchor text + href)
+DUPLICATE_URL_WINDOW = 300
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def strip_footer(text):
+    """Cut the text at the first mailing-list footer marker"""
+    cut = len(text)
+    for marker in FOOTER_MARKERS:
+        index = text.find(marker)
+        if index != -1:
+            cut = min(cut, index)
+    return text[:cut]
+
+
+def strip_quote_blocks(lines):
+    """Drop '>' quoted lines (the newsletter's stats and meta boilerplate)"""
+    return [line for line in lines if not line.lstrip().startswith(">")]
+
+
+def collapse_duplicate_urls(text):
+    """Remove a URL when the same URL already appeared just before it"""
+    last_seen = {}
+    pieces = []
+    position = 0
+    for match in URL_RE.finditer(text):
+        url = match.group(0)
+        previous = last_seen.get(url)
+        last_seen[url] = match.start()
+        if previous is not None and match.start() - previous <= DUPLICATE_URL_WINDOW:
+            pieces.append(text[position : match.start()].rstrip(" \t"))
+            position = match.end()
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def shorten_urls(text):
+    """Replace every URL with a short [Ln] token, returns (text, token -> url map)"""
+    url_map = {}
+    tokens = {}
+
+    def replace(match):
+        url = match.group(0)
+        if url not in tokens:
+            token = f"[L{len(tokens) + 1}]"
+            tokens[url] = token
+            url_map[token] = url
+        return tokens[url]
+
+    return URL_RE.sub(replace, text), url_map
+
+
+def restore_urls(text, url_map):
+    """Put the original URLs back in place of [Ln] tokens"""
+    if not url_map:
+        return text
+    return URL_TOKEN_RE.sub(lambda m: url_map.get(m.group(0), m.group(0)), text)
+
+
+def compact_newsletter(text, shorten_links=False):
+    """Deterministically shrink a newsletter before it goes into a prompt
+
+    Normalises line endings and whitespace, drops quoted boilerplate,
+    separator lines and the footer, collapses duplicated links and optionally
+    swaps URLs for [Ln] tokens (restore them with restore_urls).
+
+    Returns a dict with the compacted "text", the "url_map" and byte/token
+    counts before and after.
+    """
+    original = text
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = strip_footer(text)
+
+    lines = strip_quote_blocks(text.split("\n"))
+    lines = [line for line in lines if not SEPARATOR_LINE_RE.match(line)]
+    # Collapse runs of spaces/tabs (including indentation) and trailing whitespace
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in lines]
+    text = "\n".join(lines)
+
+    text = collapse_duplicate_urls(text)
+    text = re.sub(r"\n{3,}", "\n\n", text).strip() + "\n"
+
+    url_map = {}
+    if shorten_links:
+        text, url_map = shorten_urls(text)
+
+    bytes_before = len(original.encode("utf-8"))
+    bytes_after = len(text.encode("utf-8"))
+    return {
+        "text": text,
+        "url_map": url_map,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "tokens_before": estimate_tokens(original),
+        "tokens_after": estimate_tokens(text),
+    }
@@ -0,0 +1,75 @@
+import re
+
+# Horizontal rules separating the top-level parts of the newsletter
+SEPARATOR_RE = re.compile(r"^-{20,}\s*$", re.MULTILINE)
+# ALL-CAPS heading lines such as "AI TWITTER RECAP" or "1. LOCAL-FIRST AI APPLICATIONS"
+HEADING_RE = re.compile(r"^(?:\d+\.\s+)?[A-Z0-9][A-Z0-9/ +:&.,'()-]{7,}\s*$", re.MULTILINE)
+
+
+def _title(text):
+    match = HEADING_RE.search(text)
+    return match.group(0).strip() if match else text.strip().split("\n", 1)[0][:60]
+
+
+def _split_on(pattern, text):
+    """Split text in front of every match of pattern, keeping the match"""
+    starts = [m.start() for m in pattern.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+
+def _split_paragraphs(text, max_chars):
+    """Greedy split on blank lines so no chunk exceeds max_chars (unless one paragraph does)"""
+    chunks, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def split_newsletter_sections(content, max_chars=20000, min_chars=1500):
+    """Split a newsletter along its natural sections
+
+    Top-level parts are separated by dashed rules (intro, AI TWITTER RECAP,
+    AI REDDIT RECAP, AI DISCORD RECAP, ...). Parts longer than max_chars are
+    split again on their ALL-CAPS sub-headings, then on paragraphs. Parts
+    shorter than min_chars (headings, intro, footer) are merged into a neighbour.
+
+    Returns a list of {"title", "text"} dicts in document order.
+    """
+    parts = []
+    for part in SEPARATOR_RE.split(content):
+        if not part.strip():
+            continue
+        if len(part) <= max_chars:
+            parts.append(part)
+            continue
+        for sub in _split_on(HEADING_RE, part):
+            if len(sub) <= max_chars:
+                parts.append(sub)
+            else:
+                parts.extend(_split_paragraphs(sub, max_chars))
+
+    # Small parts are headings or intros, so they are carried into the next part;
+    # a small trailing part (footer) is folded into the last section instead
+    sections, carry = [], ""
+    for part in parts:
+        text = f"{carry}\n\n{part}" if carry else part
+        if len(text) < min_chars:
+            carry = text
+            continue
+        sections.append(text)
+        carry = ""
+    if carry:
+        if sections and len(sections[-1]) + len(carry) <= max_chars:
+            sections[-1] += "\n\n" + carry
+        else:
+            sections.append(carry)
+
+    return [{"title": _title(text), "text": text.strip()} for text in sections]
@@ -0,0 +1,189 @@
+import threading
+import time
+from state_db import ensure_column, get_connection, transaction
+from logger_config import get_logger
+
+# Get logger for this module
+logger = get_logger("pending")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_approvals (
+    message_ts TEXT NOT NULL,
+    tweet_id TEXT NOT NULL,
+    channel TEXT,
+    text TEXT NOT NULL,
+    tweet_index INTEGER NOT NULL DEFAULT 0,
+    digest INTEGER NOT NULL DEFAULT 0,
+    trace_id TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    version INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (message_ts, tweet_id)
+);
+CREATE INDEX IF NOT EXISTS idx_pending_approvals_tweet_id ON pending_approvals (tweet_id);
+"""
+
+
+class PendingApprovalStore:
+    """Tweets waiting for a decision in Slack, shared across processes
+
+    Stored in the same SQLite database as the tweet queue, so the bot process
+    that posts approval messages and the webhook process that updates them
+    see the same state, and nothing is lost on restart.
+
+    Every decision bumps the version of all rows of its message, so a
+    process that rendered the message can tell whether a decision made
+    elsewhere is missing from what it sent to Slack.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        ensure_column(conn, "pending_approvals", "digest", "INTEGER NOT NULL DEFAULT 0")
+        ensure_column(conn, "pending_approvals", "trace_id", "TEXT")
+        ensure_column(conn, "pending_approvals", "version", "INTEGER NOT NULL DEFAULT 0")
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def add(
+        self, message_ts, tweet_id, text, channel=None, tweet_index=0, digest=False, trace_id=None
+    ):
+        """Record a tweet that was sent to Slack for approval"""
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO pending_approvals"
+            " (message_ts, tweet_id, channel, text, tweet_index, digest, trace_id,"
+            " status, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?)",
+            (message_ts, tweet_id, channel, text, tweet_index, int(digest), trace_id, now, now),
+        )
+
+    def add_many(self, message_ts, tweets, channel=None, digest=True):
+        """Record every tweet of a digest message in one transaction
+
+        tweets is a list of dicts with "id", "text" and optionally "trace_id";
+        their position becomes the tweet_index.
+        """
+        now = time.time()
+        conn = self._conn()
+        with transaction(conn):
+            for index, tweet in enumerate(tweets):
+                conn.execute(
+                    "INSERT OR REPLACE INTO pending_approvals"
+                    " (message_ts, tweet_id, channel, text, tweet_index, digest, trace_id,"
+                    " status, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?)",
+                    (
+                        message_ts,
+                        tweet["id"],
+                        channel,
+                        tweet["text"],
+                        index,
+                        int(digest),
+                        tweet.get("trace_id"),
+                        now,
+                        now,
+                    ),
+                )
+
+    def get(self, message_ts, tweet_id):
+        """Get one tweet of a Slack message"""
+        row = self._conn().execute(
+            "SELECT * FROM pending_approvals WHERE message_ts = ? AND tweet_id = ?",
+            (message_ts, tweet_id),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_by_message_ts(self, message_ts):
+        """Get the pending tweet posted as the given Slack message"""
+        row = self._conn().execute(
+            "SELECT * FROM pending_approvals WHERE message_ts = ? LIMIT 1",
+            (message_ts,),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def list_by_message_ts(self, message_ts):
+        """Get every pending tweet attached to the given Slack message"""
+        rows = self._conn().execute(
+            "SELECT * FROM pending_approvals WHERE message_ts = ? ORDER BY tweet_index",
+            (message_ts,),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_by_tweet_id(self, tweet_id):
+        """Get the most recent approval message for a tweet"""
+        row = self._conn().execute(
+            "SELECT * FROM pending_approvals WHERE tweet_id = ?"
+            " ORDER BY created_at DESC LIMIT 1",
+            (tweet_id,),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def update_status(self, message_ts, status, tweet_id=None, text=None):
+        """Set the status (and optionally the edited text) of the tweet(s) attached to a message
+
+        Bumps the message's version in the same transaction.
+        """
+        conn = self._conn()
+        now = time.time()
+        with transaction(conn):
+            if tweet_id is None:
+                cursor = conn.execute(
+                    "UPDATE pending_approvals SET status = ?, text = COALESCE(?, text), updated_at = ?"
+                    " WHERE message_ts = ?",
+                    (status, text, now, message_ts),
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE pending_approvals SET status = ?, text = COALESCE(?, text), updated_at = ?"
+                    " WHERE message_ts = ? AND tweet_id = ?",
+                    (status, text, now, message_ts, tweet_id),
+                )
+            conn.execute(
+                "UPDATE pending_approvals SET version = version + 1 WHERE message_ts = ?",
+                (message_ts,),
+            )
+        return cursor.rowcount > 0
+
+    def message_version(self, message_ts):
+        """Number of decisions recorded on a message, or None if it is unknown"""
+        row = self._conn().execute(
+            "SELECT MAX(version) FROM pending_approvals WHERE message_ts = ?", (message_ts,)
+        ).fetchone()
+        return row[0]
+
+    def remove(self, message_ts, tweet_id=None):
+        """Forget the tweet(s) attached to a message"""
+        if tweet_id is None:
+            cursor = self._conn().execute(
+                "DELETE FROM pending_approvals WHERE message_ts = ?", (message_ts,)
+            )
+        else:
+            cursor = self._conn().execute(
+                "DELETE FROM pending_approvals WHERE message_ts = ? AND tweet_id = ?",
+                (message_ts, tweet_id),
+            )
+        return cursor.rowcount > 0
+
+    def count(self):
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM pending_approvals WHERE status = 'pending'"
+        ).fetchone()
+        return row[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_pending_store():
+    """Get the process-wide pending approval store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PendingApprovalStore()
+    return _store
@@ -0,0 +1,276 @@
+"""
+Newsletter ingestion pipeline
+
+    source producers ──► bounded queue ──► workers: parse → compact → generate
+
+Each source gets a producer thread that fetches raw items into a bounded
+queue. When the queue is full the producers block, so a backlog is fetched
+only as fast as it is processed (backpressure). A pool of workers takes
+items off the queue and runs them through three stages, each with its own
+concurrency limit. A burst of 30 newsletters therefore never means 30
+Gemini calls at once: at most PIPELINE_GENERATE_CONCURRENCY newsletters
+are being generated, while the others are parsed or wait in the queue.
+
+Newsletters are deduplicated through the newsletter cache (by Message-ID,
+or by content), and each one is marked processed only after its tweets are
+queued. Newsletters that were cached but not processed in an earlier,
+interrupted run are picked up again.
+"""
+
+import contextvars
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from llm import GENERATION_MODE, compact_for_prompt, generate_tweets_for_newsletter
+from logger_config import get_logger
+from newsletter_cache import CacheFullError, get_newsletter_cache
+from sources import configured_sources
+from tracing import span
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("pipeline")
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+# Newsletters allowed in each stage at once
+STAGE_LIMITS = {
+    "parse": int(os.getenv("PIPELINE_PARSE_CONCURRENCY", "4")),
+    "compact": int(os.getenv("PIPELINE_COMPACT_CONCURRENCY", "2")),
+    "generate": int(os.getenv("PIPELINE_GENERATE_CONCURRENCY", "2")),
+}
+
+_DONE = object()
+
+
+class CacheBacklog:
+    """Source for newsletters cached by an earlier run that never got processed"""
+
+    name = "cache:backlog"
+
+    def fetch(self):
+        yield from get_newsletter_cache().unprocessed()
+
+    def parse(self, entry):
+        return entry
+
+
+class Stage:
+    """Concurrency limit for one pipeline stage, with wait and busy counters"""
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = max(1, limit)
+        self._slots = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.completed = 0
+        self.waited = 0.0
+
+    @contextmanager
+    def slot(self):
+        start = time.perf_counter()
+        with self._slots:
+            with self._lock:
+                self.waited += time.perf_counter() - start
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "active": self.active,
+                "peak": self.peak,
+                "completed": self.completed,
+                "waited_s": round(self.waited, 3),
+            }
+
+
+class IngestPipeline:
+    """Runs every configured source through parse → compact → generate"""
+
+    def __init__(self, sources=None, workers=None, queue_size=None, limits=None):
+        self._sources = sources
+        self.workers = workers or PIPELINE_WORKERS
+        self.queue_size = queue_size or PIPELINE_QUEUE_SIZE
+        limits = {**STAGE_LIMITS, **(limits or {})}
+        self.stages = {name: Stage(name, limit) for name, limit in limits.items()}
+        self._run_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._claimed = set()
+        self._results = []
+
+    @property
+    def sources(self):
+        return self._sources if self._sources is not None else configured_sources()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def _claim(self, key):
+        """Whether this run should generate for `key` (not yet processed or in progress)"""
+        with self._lock:
+            if key in self._claimed:
+                return False
+            self._claimed.add(key)
+        return not get_newsletter_cache().is_processed(key)
+
+    def run(self, on_tweet=None):
+        """Fetch, parse and generate until every source is drained
+
+        Returns the tweets generated for all newsletters in this run, or
+        None if nothing new was generated. One run at a time per pipeline.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            logger.warning("⏭️ Ingest already running, skipping")
+            return None
+        try:
+            return self._run(on_tweet)
+        finally:
+            self._run_lock.release()
+
+    def _run(self, on_tweet):
+        start = time.perf_counter()
+        self._counts = {}
+        self._claimed = set()
+        self._results = []
+        items = queue.Queue(maxsize=self.queue_size)
+
+        def thread(target, name, *args):
+            # Each thread runs in a copy of this context, so its work joins the caller's trace
+            return threading.Thread(
+                target=contextvars.copy_context().run, args=(target, *args), name=name, daemon=True
+            )
+
+        sources = [CacheBacklog(), *self.sources]
+        producers = [
+            thread(self._produce, f"ingest-{source.name}", source, items) for source in sources
+        ]
+        workers = [
+            thread(self._work, f"ingest-worker-{i}", items, on_tweet) for i in range(self.workers)
+        ]
+        for t in producers + workers:
+            t.start()
+        for t in producers:
+            t.join()
+        for _ in workers:
+            items.put(_DONE)
+        for t in workers:
+            t.join()
+
+        counts = self._counts
+        elapsed = time.perf_counter() - start
+        generated = counts.get("generated", 0)
+        if generated == 0:
+            logger.info("📭 No new newsletters to process")
+        logger.info(
+            f"📊 Ingest finished in {elapsed:.1f}s: {counts.get('fetched', 0)} fetched,"
+            f" {generated} generated, {counts.get('duplicates', 0)} already seen,"
+            f" {counts.get('failed', 0)} failed, {counts.get('deferred', 0)} deferred (cache full), producers blocked {counts.get('blocked_ms', 0) / 1000:.1f}s",
+            extra={"event": "ingest", "duration_ms": round(elapsed * 1000, 3)},
+        )
+        return self._results or None
+
+    def _produce(self, source, items):
+        fetched = 0
+        blocked = 0.0
+        try:
+            for raw in source.fetch():
+                # put() blocks while the workers are behind: this is the backpressure
+                start = time.perf_counter()
+                items.put((source, raw))
+                blocked += time.perf_counter() - start
+                fetched += 1
+        except CacheFullError as e:
+            # The source has not moved its checkpoint, so it resumes here next run
+            logger.warning(f"⚠️ Source {source.name} paused: {e}")
+            self._count("deferred")
+        except Exception as e:
+            logger.error(f"💥 Source {source.name} failed: {e}")
+            self._count("source_errors")
+        self._count("fetched", fetched)
+        self._count("blocked_ms", round(blocked * 1000))
+
+    def _work(self, items, on_tweet):
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            source, raw = item
+            try:
+                self._process(source, raw, on_tweet)
+            except CacheFullError as e:
+                logger.warning(f"⚠️ Deferred newsletter from {source.name}: {e}")
+                self._count("deferred")
+            except Exception as e:
+                logger.error(f"💥 Failed to process newsletter from {source.name}: {e}")
+                self._count("failed")
+
+    def _process(self, source, raw, on_tweet):
+        cache = get_newsletter_cache()
+        with self.stages["parse"].slot():
+            newsletter = source.parse(raw)
+            if newsletter is None:
+                self._count("empty")
+                return
+            key = cache.put(newsletter)
+
+        if not self._claim(key):
+            self._count("duplicates")
+            return
+
+        with span("ingest_newsletter"):
+            logger.info(
+                f"📄 Processing newsletter: {(newsletter.get('subject') or '')[:50]}... ({source.name})"
+            )
+            compacted = None
+            if GENERATION_MODE != "chunked":
+                with self.stages["compact"].slot():
+                    compacted = compact_for_prompt(newsletter["content"])
+
+            with self.stages["generate"].slot():
+                result = generate_tweets_for_newsletter(
+                    newsletter["content"], on_tweet=on_tweet, compacted=compacted
+                )
+
+            if result is None:
+                # Left unprocessed, so the next run retries it from the cache
+                self._count("failed")
+                return
+            cache.mark_processed(key)
+            self._count("generated")
+            with self._lock:
+                self._results.extend(result)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        return {"counts": counts, "stages": {name: stage.stats() for name, stage in self.stages.items()}}
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_ingest_pipeline():
+    """Get the process-wide ingest pipeline"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = IngestPipeline()
+    return _pipeline
@@ -0,0 +1,72 @@
+import threading
+import time
+from logger_config import get_logger
+
+# Get logger for this module
+logger = get_logger("ratelimit")
+
+
+class TokenBucket:
+    """Thread-safe token bucket for pacing calls to a rate-limited API
+
+    Tokens refill continuously at `rate` per second up to `burst`. acquire()
+    blocks until a token is available. pause() holds every caller back for
+    a server-provided Retry-After, so one 429 slows the whole batch instead
+    of each thread finding out on its own.
+    """
+
+    def __init__(self, rate, burst=1, name="bucket"):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.name = name
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0.0
+        self.pauses = 0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns seconds waited"""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.acquired += 1
+                    waited = now - start
+                    self.waited += waited
+                    return waited
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds` (e.g. a Retry-After header)"""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = now
+            self.pauses += 1
+        logger.warning(f"⏸️ {self.name}: rate limited, pausing for {seconds:.1f}s")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "acquired": self.acquired,
+                "waited_s": round(self.waited, 3),
+                "pauses": self.pauses,
+            }
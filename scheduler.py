@@ -0,0 +1,173 @@
+import datetime
+import random
+import threading
+import time
+import schedule
+from logger_config import get_logger
+from state_db import get_connection
+from worker_pool import WorkerPool
+
+# Get logger for this module
+logger = get_logger("scheduler")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedule_runs (
+    job TEXT PRIMARY KEY,
+    last_run_at REAL NOT NULL
+);
+"""
+
+
+def parse_slots(value):
+    """Parse "11:00, 16:00,21:00" into a sorted list of "HH:MM" strings"""
+    slots = []
+    for slot in value.split(","):
+        slot = slot.strip()
+        if not slot:
+            continue
+        hour, minute = (int(part) for part in slot.split(":"))
+        slots.append(f"{hour:02d}:{minute:02d}")
+    return sorted(set(slots))
+
+
+def last_slot_before(slots, tz, now=None):
+    """Epoch time of the most recent daily slot at or before `now` in timezone `tz`"""
+    now = datetime.datetime.fromtimestamp(now or time.time(), tz)
+    latest = None
+    for days_back in (0, 1):
+        day = (now - datetime.timedelta(days=days_back)).date()
+        for slot in slots:
+            hour, minute = (int(part) for part in slot.split(":"))
+            at = tz.localize(datetime.datetime(day.year, day.month, day.day, hour, minute))
+            if at <= now and (latest is None or at > latest):
+                latest = at
+        if latest is not None:
+            break
+    return latest.timestamp() if latest else None
+
+
+class SlotScheduler:
+    """Resident scheduler for the bot's recurring jobs
+
+    Jobs fire at daily slots or fixed intervals (via the `schedule` library)
+    and run on a worker pool, so a slow job never delays another. Each job
+    has its own lock: if the previous run is still going when the next one
+    fires, the new run is skipped rather than stacked. Slot starts are
+    spread by a random jitter, and the time of each job's last run is kept
+    in the state database so slots missed while the daemon was down are
+    caught up on start.
+    """
+
+    def __init__(self, tz, jitter=0, catchup_window=0, workers=4, db_path=None):
+        self.tz = tz
+        self.jitter = jitter
+        self.catchup_window = catchup_window
+        self.db_path = db_path
+        self.pool = WorkerPool("scheduler", workers=workers, max_queue=workers * 4)
+        self._schedule = schedule.Scheduler()
+        self._jobs = {}
+        self._stopping = threading.Event()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def last_run(self, name):
+        row = self._conn().execute(
+            "SELECT last_run_at FROM schedule_runs WHERE job = ?", (name,)
+        ).fetchone()
+        return row["last_run_at"] if row else None
+
+    def _record_run(self, name, when):
+        self._conn().execute(
+            "INSERT INTO schedule_runs (job, last_run_at) VALUES (?, ?)"
+            " ON CONFLICT(job) DO UPDATE SET last_run_at = excluded.last_run_at",
+            (name, when),
+        )
+
+    def add_daily(self, name, slots, fn):
+        """Run fn at each "HH:MM" slot every day in the scheduler's timezone"""
+        self._jobs[name] = {"fn": fn, "lock": threading.Lock(), "slots": slots, "interval": None}
+        for slot in slots:
+            self._schedule.every().day.at(slot, self.tz).do(self._fire, name)
+        logger.info(f"🗓️ {name}: daily at {', '.join(slots)} ({self.tz.zone})")
+
+    def add_interval(self, name, minutes, fn):
+        """Run fn every `minutes` minutes"""
+        self._jobs[name] = {"fn": fn, "lock": threading.Lock(), "slots": None, "interval": minutes}
+        self._schedule.every(minutes).minutes.do(self._fire, name)
+        logger.info(f"🗓️ {name}: every {minutes} min")
+
+    def _fire(self, name, jitter=None):
+        """Called by the schedule loop; hands the run to a worker after the jitter delay"""
+        delay = random.uniform(0, self.jitter if jitter is None else jitter)
+        if delay:
+            logger.debug(f"🎲 {name}: starting in {delay:.0f}s")
+            timer = threading.Timer(delay, self._submit, args=(name,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._submit(name)
+
+    def _submit(self, name):
+        if self._stopping.is_set():
+            return
+        if not self.pool.submit(self._run_job, name):
+            logger.warning(f"🚧 {name}: worker pool is full, skipping this run")
+
+    def _run_job(self, name):
+        job = self._jobs[name]
+        if not job["lock"].acquire(blocking=False):
+            logger.warning(f"⏭️ {name}: previous run still in progress, skipping")
+            return
+        start = time.time()
+        try:
+            logger.info(f"▶️ {name}: running")
+            job["fn"]()
+            logger.info(f"✅ {name}: finished in {time.time() - start:.1f}s")
+        except Exception as e:
+            logger.error(f"💥 {name}: failed: {e}")
+        finally:
+            # A failed run still counts, otherwise every restart would retry it
+            self._record_run(name, start)
+            job["lock"].release()
+
+    def catch_up(self, now=None):
+        """Run jobs whose most recent slot (or interval) passed while the daemon was down"""
+        now = now or time.time()
+        for name, job in self._jobs.items():
+            last_run = self.last_run(name) or 0
+            if job["slots"]:
+                due = last_slot_before(job["slots"], self.tz, now)
+                missed = due is not None and last_run < due and now - due <= self.catchup_window
+            else:
+                missed = now - last_run >= job["interval"] * 60
+            if missed:
+                logger.info(f"⏰ {name}: missed a run while stopped, catching up")
+                self._fire(name, jitter=0)
+
+    def run_forever(self, poll_seconds=30):
+        """Catch up, then run due jobs until stop() is called
+
+        Returns once the jobs that were already running have finished.
+        """
+        self.catch_up()
+        while not self._stopping.is_set():
+            self._schedule.run_pending()
+            idle = self._schedule.idle_seconds
+            wait = poll_seconds if idle is None else min(max(idle, 0.5), poll_seconds)
+            self._stopping.wait(wait)
+        self.pool.shutdown(wait=True)
+
+    def stop(self):
+        """Stop firing jobs (safe to call from a signal handler)"""
+        self._stopping.set()
+
+    def next_runs(self):
+        """{job name: next run time} for logging"""
+        runs = {}
+        for entry in self._schedule.get_jobs():
+            name = entry.job_func.args[0]
+            if name not in runs or entry.next_run < runs[name]:
+                runs[name] = entry.next_run
+        return runs
@@ -1,25 +1,255 @@
 import os
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from clients import get_slack_client
 from logger_config import get_logger, log_performance
+from pending_store import get_pending_store
+from tweet_queue import make_tweet_id
+from tracing import span
+from rate_limiter import TokenBucket
 
 load_dotenv()
 
 # Get logger for this module
 logger = get_logger("slack")
 
+# slack_sdk is imported where it is used (as in clients.py), so importing this module stays cheap
+
+# chat.postMessage allows about one message per second per channel, with short bursts
+SLACK_POST_RATE = float(os.getenv("SLACK_POST_RATE", "1"))
+SLACK_POST_BURST = int(os.getenv("SLACK_POST_BURST", "3"))
+SLACK_BATCH_CONCURRENCY = int(os.getenv("SLACK_BATCH_CONCURRENCY", "4"))
+SLACK_MAX_RETRIES = int(os.getenv("SLACK_MAX_RETRIES", "3"))
+# Slack allows 50 blocks per message: a header plus two blocks per tweet
+DIGEST_MAX_TWEETS = 24
+
+
+def retry_after(response, default=1.0):
+    """Seconds to wait from a 429 response's Retry-After header, whatever its casing"""
+    for name, value in (response.headers or {}).items():
+        if name.lower() == "retry-after":
+            if isinstance(value, list):
+                value = value[0] if value else None
+            try:
+                return max(0.0, float(value))
+            except (TypeError, ValueError):
+                break
+    return default
+
+
+def status_label(status):
+    """Status line and emoji shown once a decision was made"""
+    if status == "approved":
+        return "*✅ Tweet Approved & Posted*", "✅"
+    elif status == "rejected":
+        return "*❌ Tweet Rejected*", "❌"
+    elif status == "edited":
+        return "*✏️ Tweet Updated & Posted*", "✏️"
+    return f"*{status.title()}*", "📝"
+
+
+def status_blocks(tweet_text, status):
+    """Blocks for an approval message after a decision: status line and a disabled button"""
+    status_text, status_emoji = status_label(status)
+
+    blocks = [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"*🐦 Tweet Ready for Approval*\n\n_{tweet_text}_",
+            },
+        },
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"{status_text}",
+            },
+        },
+        {
+            "type": "actions",
+            "elements": [
+                {
+                    "type": "button",
+                    "text": {
+                        "type": "plain_text",
+                        "text": f"{status_emoji} {status.title()}",
+                    },
+                    "style": "primary"
+                    if status == "approved"
+                    else "danger"
+                    if status == "rejected"
+                    else None,
+                    "action_id": "disabled_button",
+                    "value": "disabled",
+                }
+            ],
+        },
+    ]
+    return blocks
+
+
+def action_buttons(tweet_index, value):
+    """Approve / Edit / Reject buttons for one tweet"""
+    return [
+        {
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": "✅ Approve & Tweet",
+            },
+            "style": "primary",
+            "action_id": f"approve_tweet_{tweet_index}",
+            "value": value,
+        },
+        {
+            "type": "button",
+            "text": {"type": "plain_text", "text": "✏️ Edit Tweet"},
+            "action_id": f"edit_tweet_{tweet_index}",
+            "value": value,
+        },
+        {
+            "type": "button",
+            "text": {"type": "plain_text", "text": "❌ Reject"},
+            "style": "danger",
+            "action_id": f"reject_tweet_{tweet_index}",
+            "value": value,
+        },
+    ]
+
+
+def digest_blocks(tweets):
+    """Blocks for a digest message: one section per tweet, plus its own actions while pending
+
+    tweets are pending store rows (tweet_id, text, status, trace_id). Every
+    block is keyed by tweet ID and buttons carry only the ID, so a decision
+    on one tweet re-renders only that tweet's blocks.
+    """
+    pending = sum(1 for tweet in tweets if tweet["status"] == "pending")
+    blocks = [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"*🐦 {len(tweets)} Tweets Ready for Approval* ({pending} pending)",
+            },
+        }
+    ]
+    for index, tweet in enumerate(tweets):
+        tweet_id = tweet["tweet_id"]
+        blocks.append(
+            {
+                "type": "section",
+                "block_id": f"tweet:{tweet_id}",
+                "text": {"type": "mrkdwn", "text": f"*{index + 1}.* _{tweet['text']}_"},
+            }
+        )
+        if tweet["status"] == "pending":
+            blocks.append(
+                {
+                    "type": "actions",
+                    "block_id": f"tweet_actions:{tweet.get('trace_id') or ''}:{tweet_id}",
+                    "elements": action_buttons(index, tweet_id),
+                }
+            )
+        else:
+            blocks.append(
+                {
+                    "type": "context",
+                    "block_id": f"tweet_status:{tweet_id}",
+                    "elements": [{"type": "mrkdwn", "text": status_label(tweet["status"])[0]}],
+                }
+            )
+    return blocks
+
+
+def render_status_update(store, message_ts, status):
+    """chat.update arguments for a message as the store has it now
+
+    Returns (update, version), where version is the message version the
+    blocks were rendered from, or None when the message is unknown.
+    """
+    rows = store.list_by_message_ts(message_ts)
+    if not rows:
+        return None
+    first = rows[0]
+    if first["digest"]:
+        blocks = digest_blocks(rows)
+    else:
+        blocks = status_blocks(first["text"], first["status"])
+    update = {
+        "channel": first["channel"],
+        "ts": message_ts,
+        "text": f"Tweet {status}",
+        "blocks": blocks,
+    }
+    return update, max(row["version"] for row in rows)
+
+
+def prepare_status_update(store, message_ts, status, new_text=None, tweet_id=None):
+    """Record a decision and render its message, see render_status_update
+
+    Shared by the sync bot and the async webhook. Digest messages are
+    re-rendered from the store so only the decided tweet changes.
+
+    Decisions on one digest can be handled by different processes, and
+    their chat.update calls can reach Slack in any order. So after its
+    update the caller compares the version it rendered with the stored one
+    and, if another decision came in, renders and sends again. The last
+    update Slack applies is then always rendered from the latest version.
+    """
+    if tweet_id:
+        tweet_info = store.get(message_ts, tweet_id) or store.get_by_message_ts(message_ts)
+    else:
+        tweet_info = store.get_by_message_ts(message_ts)
+    if not tweet_info:
+        return None
+
+    store.update_status(message_ts, status, tweet_id=tweet_info["tweet_id"], text=new_text)
+    return render_status_update(store, message_ts, status)
+
 
 class SlackTweetBot:
     def __init__(self):
-        self.client = WebClient(token=os.getenv("SLACK_BOT_TOKEN"))
+        # Shared keep-alive client, so a bot created per process costs no new connections
+        self.client = get_slack_client()
         self.channel = os.getenv("SLACK_CHANNEL")  # e.g., "#tweets" or "@username"
-        self.pending_tweets = {}  # Store pending tweets with their message IDs
+        # Pending tweets with their message IDs, shared with the webhook process
+        self.pending_tweets = get_pending_store()
+        # Paces every chat.postMessage from this bot, single sends and batches alike
+        self.rate_limiter = TokenBucket(SLACK_POST_RATE, SLACK_POST_BURST, name="slack-post")
+
+    def _post_message(self, **kwargs):
+        """chat.postMessage through the rate limiter, retrying 429s after Retry-After"""
+        from slack_sdk.errors import SlackApiError
+
+        for attempt in range(SLACK_MAX_RETRIES + 1):
+            self.rate_limiter.acquire()
+            try:
+                return self.client.chat_postMessage(**kwargs)
+            except SlackApiError as e:
+                if e.response.status_code != 429 or attempt == SLACK_MAX_RETRIES:
+                    raise
+                self.rate_limiter.pause(retry_after(e.response))
 
     @log_performance
-    def send_tweet_for_approval(self, tweet_text, tweet_index=0):
+    def send_tweet_for_approval(self, tweet_text, tweet_index=0, tweet_id=None, trace_id=None):
+        """Send a tweet to Slack for approval with interactive buttons
+
+        Buttons carry only the tweet ID; the webhook resolves it to the text.
+        The trace ID travels in the actions block_id so the webhook can join
+        the same trace when a button is clicked.
+        """
         logger.info(f"channel: {self.channel}")
-        """Send a tweet to Slack for approval with interactive buttons"""
+        with span("send_tweet_for_approval", trace_id=trace_id) as trace_id:
+            return self._send_for_approval(tweet_text, tweet_index, tweet_id, trace_id)
+
+    def _send_for_approval(self, tweet_text, tweet_index, tweet_id, trace_id):
+        from slack_sdk.errors import SlackApiError
+
+        tweet_id = tweet_id or make_tweet_id(tweet_text)
         try:
             # Create the message blocks with interactive buttons
             blocks = [
@@ -32,36 +262,13 @@ class SlackTweetBot:
                 },
                 {
                     "type": "actions",
-                    "elements": [
-                        {
-                            "type": "button",
-                            "text": {
-                                "type": "plain_text",
-                                "text": "✅ Approve & Tweet",
-                            },
-                            "style": "primary",
-                            "action_id": f"approve_tweet_{tweet_index}",
-                            "value": tweet_text,
-                        },
-                        {
-                            "type": "button",
-                            "text": {"type": "plain_text", "text": "✏️ Edit Tweet"},
-                            "action_id": f"edit_tweet_{tweet_index}",
-                            "value": tweet_text,
-                        },
-                        {
-                            "type": "button",
-                            "text": {"type": "plain_text", "text": "❌ Reject"},
-                            "style": "danger",
-                            "action_id": f"reject_tweet_{tweet_index}",
-                            "value": tweet_text,
-                        },
-                    ],
+                    "block_id": f"tweet_actions:{trace_id}",
+                    "elements": action_buttons(tweet_index, tweet_id),
                 },
             ]
 
             # Send the message
-            response = self.client.chat_postMessage(
+            response = self._post_message(
                 channel=self.channel,
                 text=f"Tweet approval needed: {tweet_text[:50]}...",
                 blocks=blocks,
@@ -69,22 +276,113 @@ class SlackTweetBot:
 
             # Store the pending tweet
             message_ts = response["ts"]
-            self.pending_tweets[message_ts] = {
-                "text": tweet_text,
-                "index": tweet_index,
-                "status": "pending",
-            }
+            self.pending_tweets.add(
+                message_ts,
+                tweet_id,
+                tweet_text,
+                channel=response.get("channel"),
+                tweet_index=tweet_index,
+                trace_id=trace_id,
+            )
 
-            logger.info(f"✅ Tweet sent to Slack for approval: {tweet_text[:50]}...")
+            logger.info(
+                f"✅ Tweet sent to Slack for approval: {tweet_text[:50]}...",
+                extra={"tweet_id": tweet_id, "message_ts": message_ts},
+            )
             return message_ts
 
         except SlackApiError as e:
             logger.error(f"❌ Error sending to Slack: {e}")
             return None
 
+    @log_performance
+    def send_batch_for_approval(self, tweets, concurrency=None):
+        """Send a batch of tweets for approval as fast as Slack's rate limits allow
+
+        tweets is a list of dicts with "text" and optionally "id" and
+        "trace_id" (tweet queue records). Sends run on a bounded thread pool
+        and are paced by the shared token bucket. Returns the message
+        timestamps in input order, None where sending failed.
+        """
+        concurrency = concurrency or SLACK_BATCH_CONCURRENCY
+        if not tweets:
+            return []
+
+        def send(item):
+            index, tweet = item
+            return self.send_tweet_for_approval(
+                tweet["text"], index, tweet_id=tweet.get("id"), trace_id=tweet.get("trace_id")
+            )
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            results = list(pool.map(send, enumerate(tweets)))
+        elapsed = time.perf_counter() - start
+
+        sent = sum(1 for message_ts in results if message_ts)
+        logger.info(
+            f"📤 Sent {sent}/{len(tweets)} tweets for approval in {elapsed:.1f}s"
+            f" ({sent / elapsed if elapsed else 0:.2f} msg/s, limiter {self.rate_limiter.stats()})"
+        )
+        return results
+
+    @log_performance
+    def send_digest_for_approval(self, tweets):
+        """Send a batch as digest messages (one per DIGEST_MAX_TWEETS tweets)
+
+        tweets is a list of tweet queue records. Returns the message
+        timestamps in input order, None where sending failed.
+        """
+        results = []
+        for start in range(0, len(tweets), DIGEST_MAX_TWEETS):
+            chunk = [
+                {
+                    "id": tweet.get("id") or make_tweet_id(tweet["text"]),
+                    "text": tweet["text"],
+                    "trace_id": tweet.get("trace_id"),
+                }
+                for tweet in tweets[start : start + DIGEST_MAX_TWEETS]
+            ]
+            message_ts = self._send_digest(chunk)
+            results.extend([message_ts] * len(chunk))
+        return results
+
+    def _send_digest(self, tweets):
+        from slack_sdk.errors import SlackApiError
+
+        with span("send_digest_for_approval"):
+            rows = [
+                {
+                    "tweet_id": tweet["id"],
+                    "text": tweet["text"],
+                    "status": "pending",
+                    "trace_id": tweet["trace_id"],
+                }
+                for tweet in tweets
+            ]
+            try:
+                response = self._post_message(
+                    channel=self.channel,
+                    text=f"{len(tweets)} tweets need approval",
+                    blocks=digest_blocks(rows),
+                )
+            except SlackApiError as e:
+                logger.error(f"❌ Error sending digest to Slack: {e}")
+                return None
+
+            message_ts = response["ts"]
+            self.pending_tweets.add_many(message_ts, tweets, channel=response.get("channel"))
+            logger.info(
+                f"✅ Digest of {len(tweets)} tweets sent to Slack for approval",
+                extra={"message_ts": message_ts},
+            )
+            return message_ts
+
     @log_performance
     def send_edit_modal(self, trigger_id, tweet_text, tweet_index):
         """Send a modal for editing the tweet"""
+        from slack_sdk.errors import SlackApiError
+
         try:
             modal_view = {
                 "type": "modal",
@@ -117,84 +415,42 @@ class SlackTweetBot:
             return None
 
     @log_performance
-    def update_message_status(self, message_ts, status, new_text=None):
-        """Update the original message to show the action taken and disable buttons"""
-        try:
-            if message_ts in self.pending_tweets:
-                tweet_info = self.pending_tweets[message_ts]
-                original_text = new_text if new_text else tweet_info["text"]
-
-                # Create the updated blocks with disabled buttons
-                if status == "approved":
-                    status_text = "*✅ Tweet Approved & Posted*"
-                    status_emoji = "✅"
-                elif status == "rejected":
-                    status_text = "*❌ Tweet Rejected*"
-                    status_emoji = "❌"
-                elif status == "edited":
-                    status_text = "*✏️ Tweet Updated & Posted*"
-                    status_emoji = "✏️"
-                else:
-                    status_text = f"*{status.title()}*"
-                    status_emoji = "📝"
-
-                blocks = [
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": f"*🐦 Tweet Ready for Approval*\n\n_{original_text}_",
-                        },
-                    },
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": f"{status_text}",
-                        },
-                    },
-                    {
-                        "type": "actions",
-                        "elements": [
-                            {
-                                "type": "button",
-                                "text": {
-                                    "type": "plain_text",
-                                    "text": f"{status_emoji} {status.title()}",
-                                },
-                                "style": "primary"
-                                if status == "approved"
-                                else "danger"
-                                if status == "rejected"
-                                else None,
-                                "action_id": "disabled_button",
-                                "value": "disabled",
-                            }
-                        ],
-                    },
-                ]
+    def update_message_status(self, message_ts, status, new_text=None, tweet_id=None):
+        """Update the original message to show the action taken and disable buttons
 
-                # Update the message
-                self.client.chat_update(
-                    channel=self.channel,
-                    ts=message_ts,
-                    text=f"Tweet {status}",
-                    blocks=blocks,
-                )
+        For digest messages only the section of tweet_id changes.
+        """
+        from slack_sdk.errors import SlackApiError
 
-                # Clean up
-                del self.pending_tweets[message_ts]
-                logger.info(f"📝 Message updated with status: {status}")
+        try:
+            rendered = prepare_status_update(
+                self.pending_tweets, message_ts, status, new_text, tweet_id
+            )
+            if rendered is None:
+                logger.warning(f"⚠️ No pending tweet found for message {message_ts}")
+                return
+            while True:
+                update, version = rendered
+                update["channel"] = update["channel"] or self.channel
+                self.client.chat_update(**update)
+                if self.pending_tweets.message_version(message_ts) == version:
+                    break
+                # Decided elsewhere meanwhile; our update may have landed after theirs
+                logger.info(f"🔁 Message {message_ts} changed while updating, re-rendering")
+                rendered = render_status_update(self.pending_tweets, message_ts, status)
+            logger.info(f"📝 Message updated with status: {status}")
 
         except SlackApiError as e:
             logger.error(f"❌ Error updating message: {e}")
 
     def get_pending_tweet(self, message_ts):
         """Get pending tweet info by message timestamp"""
-        return self.pending_tweets.get(message_ts)
+        return self.pending_tweets.get_by_message_ts(message_ts)
 
     def send_simple_message(self, message):
         """Send a simple message to Slack"""
+        from slack_sdk.errors import SlackApiError
+
         try:
             response = self.client.chat_postMessage(channel=self.channel, text=message)
             logger.info(f"📤 Simple message sent: {message[:50]}...")
@@ -0,0 +1,198 @@
+"""
+Framework-independent parts of the Slack interaction servers
+
+slack_webhook.py (Flask, threads) and slack_webhook_async.py (aiohttp) both
+use these. Everything here is blocking; the async server runs it through
+asyncio.to_thread. Reply helpers return plain dicts, which each server wraps
+in its own JSON response.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import time
+from dotenv import load_dotenv
+from idempotency import DONE, get_idempotency_store
+from logger_config import get_logger, log_performance
+from pending_store import get_pending_store
+from tracing import current_trace_id
+from tweet_queue import POSTED, REJECTED, get_tweet_queue, make_tweet_id
+from x_poster import get_x_engine
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("webhook")
+
+APPROVED_TEXT = "⏳ Tweet approved, posting now..."
+EDITED_TEXT = "✏️ Edited tweet queued for posting!"
+REJECTED_TEXT = "❌ Tweet rejected and removed from queue."
+BUSY_TEXT = "⏳ Too many actions in progress. Please try again."
+
+
+def verify_slack_request(request_body, timestamp, signature):
+    """Verify that the request came from Slack"""
+    try:
+        # Skip verification in development if no signing secret is set
+        signing_secret = os.getenv("SLACK_SIGNING_SECRET")
+        if not signing_secret:
+            logger.warning(
+                "⚠️ SLACK_SIGNING_SECRET not set - skipping request verification"
+            )
+            return True
+
+        # Check if the timestamp is too old (replay attack protection)
+        if abs(time.time() - int(timestamp)) > 60 * 5:  # 5 minutes
+            logger.warning("⚠️ Request timestamp is too old")
+            return False
+
+        # Create the signature
+        sig_basestring = f"v0:{timestamp}:{request_body}"
+        computed_signature = (
+            "v0="
+            + hmac.new(
+                signing_secret.encode("utf-8"),
+                sig_basestring.encode("utf-8"),
+                hashlib.sha256,
+            ).hexdigest()
+        )
+
+        # Compare signatures
+        if hmac.compare_digest(computed_signature, signature):
+            return True
+        else:
+            logger.warning("⚠️ Request signature verification failed")
+            return False
+
+    except Exception as e:
+        logger.error(f"❌ Error verifying Slack request: {e}")
+        return False
+
+
+def modal_metadata(payload):
+    """The JSON private_metadata of a submitted modal"""
+    try:
+        return json.loads(payload["view"].get("private_metadata") or "{}")
+    except ValueError:
+        return {}
+
+
+def trace_id_from_payload(payload):
+    """Correlation ID carried in a Slack payload (actions block_id or modal metadata)
+
+    Action block IDs are "tweet_actions:<trace_id>" for single messages and
+    "tweet_actions:<trace_id>:<tweet_id>" for digest sections.
+    """
+    if payload.get("type") == "block_actions":
+        block_id = payload["actions"][0].get("block_id", "")
+        if block_id.startswith("tweet_actions:"):
+            return block_id.split(":")[1] or None
+    elif payload.get("type") == "view_submission":
+        return modal_metadata(payload).get("trace_id")
+    return None
+
+
+def resolve_tweet(message_ts, value):
+    """Map a button value to (tweet_id, tweet_text)
+
+    Buttons carry the tweet ID. It is resolved through the message's pending
+    record, then the tweet queue's in-memory index. Messages sent before IDs
+    were used carry the full text instead.
+    """
+    record = get_pending_store().get(message_ts, value)
+    if record:
+        return record["tweet_id"], record["text"]
+    tweet_text = get_tweet_queue().text_for(value)
+    if tweet_text is not None:
+        return value, tweet_text
+    return make_tweet_id(value), value
+
+
+def edit_modal_view(tweet_text, tweet_index, message_ts, trace_id=None, tweet_id=None):
+    """Modal for editing a tweet; trace and tweet IDs ride along in private_metadata"""
+    return {
+        "type": "modal",
+        "callback_id": f"edit_modal_{tweet_index}_{message_ts}",
+        "private_metadata": json.dumps({"trace_id": trace_id, "tweet_id": tweet_id}),
+        "title": {"type": "plain_text", "text": "Edit Tweet"},
+        "submit": {"type": "plain_text", "text": "Update & Approve"},
+        "close": {"type": "plain_text", "text": "Cancel"},
+        "blocks": [
+            {
+                "type": "input",
+                "block_id": "tweet_input",
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "tweet_text",
+                    "multiline": True,
+                    "initial_value": tweet_text,
+                    "max_length": 500,
+                },
+                "label": {"type": "plain_text", "text": "Tweet Content"},
+            }
+        ],
+    }
+
+
+def busy_reply():
+    """Reply used when too many actions are in flight"""
+    return {"text": BUSY_TEXT}
+
+
+def duplicate_reply(record):
+    """Reply for a repeated click or Slack retry of an already claimed action"""
+    if record["status"] == DONE and record["result"]:
+        return {"text": record["result"]}
+    return {"text": "⏳ This tweet is already being processed."}
+
+
+@log_performance
+def remove_tweet_from_queue(tweet_text, status, tweet_id=None):
+    """Move a tweet out of the queue as posted or rejected"""
+    try:
+        queue = get_tweet_queue()
+        tweet_id = tweet_id or make_tweet_id(tweet_text)
+        if status == POSTED:
+            removed = queue.mark_posted(tweet_id)
+        else:
+            removed = queue.mark_rejected(tweet_id)
+
+        if removed:
+            logger.info(
+                f"✅ Tweet removed from queue ({status}): {tweet_text[:50]}...",
+                extra={"tweet_id": tweet_id, "outcome": status},
+            )
+        else:
+            logger.warning(f"⚠️ Tweet not found in queue: {tweet_text[:50]}...")
+
+    except Exception as e:
+        logger.error(f"❌ Error removing tweet: {e}")
+
+
+def submit_for_posting(tweet_text, message_ts, tweet_id, key, action):
+    """Hand an approved or edited tweet to the X posting engine
+
+    The outbox is durable, so the interaction is done once the tweet is in
+    it; the engine reports the outcome through its callbacks. For edits,
+    tweet_id is the original's, so posting marks the original as posted.
+    """
+    if action == "edited":
+        logger.info(f"📝 Posting edited tweet: {tweet_text[:50]}...", extra={"message_ts": message_ts})
+    else:
+        logger.info(f"✅ Approving tweet: {tweet_text[:50]}...", extra={"message_ts": message_ts})
+    get_x_engine().submit(key, tweet_text, tweet_id, message_ts, action, current_trace_id())
+    get_idempotency_store().complete(key, EDITED_TEXT if action == "edited" else APPROVED_TEXT)
+
+
+def reject_tweet(tweet_text, message_ts, tweet_id, key):
+    """Reject a tweet in the queue (the caller updates the Slack message)"""
+    logger.info(f"❌ Rejecting tweet: {tweet_text[:50]}...", extra={"message_ts": message_ts})
+    remove_tweet_from_queue(tweet_text, REJECTED, tweet_id)
+    get_idempotency_store().complete(key, REJECTED_TEXT)
+
+
+def release_failed_post(job, error):
+    """X refused a tweet for good: let the user try again, returns the message for the channel"""
+    get_idempotency_store().fail(job["job_id"])
+    return f"❌ Failed to post tweet ({error}). Please try again: {job['text'][:50]}..."
@@ -1,13 +1,30 @@
 import os
 import json
-import tweepy
-import hmac
-import hashlib
-import time
-from flask import Flask, request, jsonify
-from slack_sdk import WebClient
+from flask import Flask, Response, request, jsonify
 from dotenv import load_dotenv
-from logger_config import get_logger, log_performance
+import metrics
+from logger_config import get_logger
+from slack_bot import SlackTweetBot
+from worker_pool import WorkerPool
+from idempotency import get_idempotency_store, interaction_key
+from tweet_queue import POSTED, get_tweet_queue
+from tracing import current_trace_id, span
+from x_poster import get_x_engine
+from slack_interactions import (
+    APPROVED_TEXT,
+    REJECTED_TEXT,
+    busy_reply,
+    duplicate_reply,
+    edit_modal_view,
+    modal_metadata,
+    reject_tweet,
+    release_failed_post,
+    remove_tweet_from_queue,
+    resolve_tweet,
+    submit_for_posting,
+    trace_id_from_payload,
+    verify_slack_request,
+)
 
 load_dotenv()
 
@@ -16,13 +33,32 @@ app = Flask(__name__)
 # Get logger for this module
 logger = get_logger("webhook")
 
-# Initialize clients
-slack_client = WebClient(token=os.getenv("SLACK_BOT_TOKEN"))
-twitter_client = tweepy.Client(
-    consumer_key=os.getenv("API_KEY"),
-    consumer_secret=os.getenv("API_SECRET"),
-    access_token=os.getenv("ACCESS_TOKEN"),
-    access_token_secret=os.getenv("ACCESS_TOKEN_SECRET"),
+# Background workers for Twitter posts and Slack message updates
+action_pool = WorkerPool(
+    "slack-actions",
+    workers=int(os.getenv("WEBHOOK_WORKERS", "4")),
+    max_queue=int(os.getenv("WEBHOOK_QUEUE_SIZE", "100")),
+)
+
+metrics.registry.register_gauge(
+    "webhook_action_queue",
+    "Slack action worker pool state",
+    lambda: {
+        key: value for key, value in action_pool.stats().items() if key != "workers"
+    },
+    label_name="state",
+)
+metrics.registry.register_gauge(
+    "x_outbox_jobs",
+    "X posting outbox jobs by status",
+    lambda: get_x_engine().outbox.stats(),
+    label_name="status",
+)
+metrics.registry.register_gauge(
+    "tweet_queue_tweets",
+    "Tweets in the queue by status",
+    lambda: get_tweet_queue().stats(),
+    label_name="status",
 )
 
 # Global reference to the slack bot instance
@@ -34,78 +70,76 @@ def set_slack_bot(bot_instance):
     slack_bot = bot_instance
 
 
-def verify_slack_request(request_body, timestamp, signature):
-    """Verify that the request came from Slack"""
-    try:
-        # Skip verification in development if no signing secret is set
-        signing_secret = os.getenv("SLACK_SIGNING_SECRET")
-        if not signing_secret:
-            logger.warning(
-                "⚠️ SLACK_SIGNING_SECRET not set - skipping request verification"
-            )
-            return True
-
-        # Check if the timestamp is too old (replay attack protection)
-        if abs(time.time() - int(timestamp)) > 60 * 5:  # 5 minutes
-            logger.warning("⚠️ Request timestamp is too old")
-            return False
-
-        # Create the signature
-        sig_basestring = f"v0:{timestamp}:{request_body}"
-        computed_signature = (
-            "v0="
-            + hmac.new(
-                signing_secret.encode("utf-8"),
-                sig_basestring.encode("utf-8"),
-                hashlib.sha256,
-            ).hexdigest()
-        )
-
-        # Compare signatures
-        if hmac.compare_digest(computed_signature, signature):
-            return True
-        else:
-            logger.warning("⚠️ Request signature verification failed")
-            return False
+def get_slack_bot():
+    """Get the Slack bot, creating one when running as a separate process
 
-    except Exception as e:
-        logger.error(f"❌ Error verifying Slack request: {e}")
-        return False
+    Pending approvals live in the shared state database, so a bot created
+    here can update messages that were posted by the tweet.py process.
+    """
+    global slack_bot
+    if slack_bot is None:
+        slack_bot = SlackTweetBot()
+    return slack_bot
 
 
-@log_performance
-def remove_tweet_from_json(tweet_text):
-    """Remove a tweet from the generated_tweets.json file"""
+def notify_channel(message):
+    """Tell the approval channel about a failure in a background action"""
     try:
-        with open("generated_tweets.json", "r+") as f:
-            tweets = json.load(f)
-            original_count = len(tweets)
-            # Remove the tweet if it exists
-            tweets = [tweet for tweet in tweets if tweet.get("tweet", "") != tweet_text]
-            new_count = len(tweets)
-            f.seek(0)
-            json.dump(tweets, f, indent=2)
-            f.truncate()
-
-        if original_count > new_count:
-            logger.info(f"✅ Tweet removed from queue: {tweet_text[:50]}...")
-        else:
-            logger.warning(f"⚠️ Tweet not found in queue: {tweet_text[:50]}...")
-
+        get_slack_bot().client.chat_postMessage(channel=os.getenv("SLACK_CHANNEL"), text=message)
     except Exception as e:
-        logger.error(f"❌ Error removing tweet: {e}")
+        logger.error(f"❌ Error notifying Slack channel: {e}")
 
 
-@log_performance
-def post_tweet_to_twitter(tweet_text):
-    """Post a tweet to Twitter"""
-    try:
-        response = twitter_client.create_tweet(text=tweet_text)
-        logger.info(f"✅ Tweet posted to Twitter: {tweet_text[:50]}...")
+def tweet_posted(job, x_tweet_id):
+    """X engine callback: the tweet is live, so close it out in the queue and in Slack"""
+    remove_tweet_from_queue(job["text"], POSTED, job["tweet_id"])
+    new_text = job["text"] if job["action"] == "edited" else None
+    get_slack_bot().update_message_status(
+        job["message_ts"], job["action"], new_text, tweet_id=job["tweet_id"]
+    )
+
+
+def tweet_post_failed(job, error):
+    """X engine callback: X refused the tweet for good; let the user try again"""
+    notify_channel(release_failed_post(job, error))
+
+
+def start_x_engine():
+    """Start draining the X outbox in this process (safe to call repeatedly)"""
+    get_x_engine().start(on_posted=tweet_posted, on_failed=tweet_post_failed)
+
+
+def process_approval(tweet_text, message_ts, tweet_id, key):
+    """Background job: hand an approved tweet to the X posting engine"""
+    with span("process_approval"):
+        start_x_engine()
+        submit_for_posting(tweet_text, message_ts, tweet_id, key, "approved")
+
+
+def process_rejection(tweet_text, message_ts, tweet_id, key):
+    """Background job: reject a tweet and update the Slack message"""
+    with span("process_rejection"):
+        reject_tweet(tweet_text, message_ts, tweet_id, key)
+        get_slack_bot().update_message_status(message_ts, "rejected", tweet_id=tweet_id)
+
+
+def process_edited_tweet(edited_tweet, message_ts, tweet_id, key):
+    """Background job: hand an edited tweet to the X posting engine"""
+    with span("process_edited_tweet"):
+        start_x_engine()
+        submit_for_posting(edited_tweet, message_ts, tweet_id, key, "edited")
+
+
+def submit_action(key, job, *args):
+    """Queue a claimed action, releasing the claim if the pool is full
+
+    The pool runs it in a copy of the current context, so it stays in the
+    interaction's trace.
+    """
+    if action_pool.submit(job, *args, key):
         return True
-    except Exception as e:
-        logger.error(f"❌ Error posting tweet to Twitter: {e}")
-        return False
+    get_idempotency_store().fail(key)
+    return False
 
 
 @app.route("/slack/interactions", methods=["POST"])
@@ -123,34 +157,45 @@ def handle_slack_interactions():
             logger.error("❌ Request verification failed - rejecting request")
             return jsonify({"error": "Request verification failed"}), 403
 
+        retry_num = request.headers.get("X-Slack-Retry-Num")
+        if retry_num:
+            logger.info(f"🔁 Slack retry #{retry_num} ({request.headers.get('X-Slack-Retry-Reason')})")
+
         payload = json.loads(request.form.get("payload"))
+        with span("slack_interaction", trace_id=trace_id_from_payload(payload)):
+            return handle_interaction_payload(payload)
+
+    except Exception as e:
+        logger.error(f"❌ Error handling Slack interaction: {e}")
+        return jsonify({"text": "❌ An error occurred processing your request."})
+
+
+def handle_interaction_payload(payload):
+    """Dispatch a verified Slack interaction payload"""
+    try:
         logger.debug(f"📨 Received Slack interaction: {payload.get('type', 'unknown')}")
 
         if payload["type"] == "block_actions":
             # Handle button clicks
             action = payload["actions"][0]
             action_id = action["action_id"]
-            tweet_text = action["value"]
             message_ts = payload["message"]["ts"]
+            tweet_id, tweet_text = resolve_tweet(message_ts, action["value"])
 
             logger.info(
                 f"🔘 Button clicked: {action_id} for tweet: {tweet_text[:30]}..."
             )
 
             if action_id.startswith("approve_tweet_"):
-                # Approve and post tweet
-                logger.info(f"✅ Approving tweet: {tweet_text[:50]}...")
-                success = post_tweet_to_twitter(tweet_text)
-                if success:
-                    remove_tweet_from_json(tweet_text)
-                    if slack_bot:
-                        slack_bot.update_message_status(message_ts, "approved")
-                    return jsonify({"text": "✅ Tweet approved and posted!"})
-                else:
-                    logger.warning("❌ Failed to post tweet to Twitter")
-                    return jsonify(
-                        {"text": "❌ Failed to post tweet. Please try again."}
-                    )
+                key = interaction_key(message_ts, "approve", tweet_id)
+                claimed, record = get_idempotency_store().claim(key)
+                if not claimed:
+                    return jsonify(duplicate_reply(record))
+
+                # Post in the background so Slack gets its ack right away
+                if not submit_action(key, process_approval, tweet_text, message_ts, tweet_id):
+                    return jsonify(busy_reply())
+                return jsonify({"text": APPROVED_TEXT})
 
             elif action_id.startswith("edit_tweet_"):
                 # Open edit modal
@@ -158,39 +203,23 @@ def handle_slack_interactions():
                 trigger_id = payload["trigger_id"]
                 tweet_index = action_id.split("_")[-1]
 
-                modal_view = {
-                    "type": "modal",
-                    "callback_id": f"edit_modal_{tweet_index}_{message_ts}",
-                    "title": {"type": "plain_text", "text": "Edit Tweet"},
-                    "submit": {"type": "plain_text", "text": "Update & Approve"},
-                    "close": {"type": "plain_text", "text": "Cancel"},
-                    "blocks": [
-                        {
-                            "type": "input",
-                            "block_id": "tweet_input",
-                            "element": {
-                                "type": "plain_text_input",
-                                "action_id": "tweet_text",
-                                "multiline": True,
-                                "initial_value": tweet_text,
-                                "max_length": 500,
-                            },
-                            "label": {"type": "plain_text", "text": "Tweet Content"},
-                        }
-                    ],
-                }
-
-                slack_client.views_open(trigger_id=trigger_id, view=modal_view)
+                modal_view = edit_modal_view(
+                    tweet_text, tweet_index, message_ts, current_trace_id(), tweet_id
+                )
+                get_slack_bot().client.views_open(trigger_id=trigger_id, view=modal_view)
 
                 return jsonify({"text": "Opening edit modal..."})
 
             elif action_id.startswith("reject_tweet_"):
                 # Reject tweet
-                logger.info(f"❌ Rejecting tweet: {tweet_text[:50]}...")
-                remove_tweet_from_json(tweet_text)
-                if slack_bot:
-                    slack_bot.update_message_status(message_ts, "rejected")
-                return jsonify({"text": "❌ Tweet rejected and removed from queue."})
+                key = interaction_key(message_ts, "reject", tweet_id)
+                claimed, record = get_idempotency_store().claim(key)
+                if not claimed:
+                    return jsonify(duplicate_reply(record))
+
+                if not submit_action(key, process_rejection, tweet_text, message_ts, tweet_id):
+                    return jsonify(busy_reply())
+                return jsonify({"text": REJECTED_TEXT})
 
             elif action_id == "disabled_button":
                 # Handle clicks on disabled buttons
@@ -204,31 +233,31 @@ def handle_slack_interactions():
             values = payload["view"]["state"]["values"]
             edited_tweet = values["tweet_input"]["tweet_text"]["value"]
 
-            # Extract message timestamp from callback_id
+            # Extract message timestamp from callback_id, the tweet from the metadata
             message_ts = callback_id.split("_")[-1]
+            tweet_id = modal_metadata(payload).get("tweet_id")
 
-            logger.info(f"📝 Posting edited tweet: {edited_tweet[:50]}...")
-
-            # Post the edited tweet
-            success = post_tweet_to_twitter(edited_tweet)
-            if success:
-                # Remove original tweet from queue
-                remove_tweet_from_json(edited_tweet)
-                if slack_bot:
-                    slack_bot.update_message_status(message_ts, "edited", edited_tweet)
-
+            key = interaction_key(message_ts, "edit", tweet_id)
+            claimed, record = get_idempotency_store().claim(key)
+            if not claimed:
                 return jsonify({"response_action": "clear"})
-            else:
-                logger.warning("❌ Failed to post edited tweet")
+
+            # Post the edited tweet in the background; failures are reported
+            # to the channel since the modal is already closed by then
+            if not submit_action(
+                key, process_edited_tweet, edited_tweet, message_ts, tweet_id
+            ):
                 return jsonify(
                     {
                         "response_action": "errors",
                         "errors": {
-                            "tweet_input": "Failed to post tweet. Please try again."
+                            "tweet_input": "Too many actions in progress. Please try again."
                         },
                     }
                 )
 
+            return jsonify({"response_action": "clear"})
+
         return jsonify({"status": "ok"})
 
     except Exception as e:
@@ -240,9 +269,28 @@ def handle_slack_interactions():
 def health_check():
     """Health check endpoint"""
     logger.debug("💓 Health check requested")
-    return jsonify({"status": "healthy"})
+    return jsonify(
+        {
+            "status": "healthy",
+            "action_queue": action_pool.stats(),
+            "idempotency": get_idempotency_store().stats(),
+            "x_posting": get_x_engine().stats(),
+        }
+    )
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus-style metrics endpoint"""
+    return Response(
+        metrics.registry.render(), mimetype="text/plain; version=0.0.4"
+    )
 
 
 if __name__ == "__main__":
-    logger.info("🚀 Starting Slack webhook server on port 5003...")
-    app.run(debug=True, port=5003, host="127.0.0.1")
+    # Development server only; use `gunicorn -c gunicorn.conf.py slack_webhook:app` in production
+    port = int(os.getenv("WEBHOOK_PORT", "5003"))
+    debug = os.getenv("FLASK_DEBUG", "0") == "1"
+    logger.info(f"🚀 Starting Slack webhook development server on port {port}...")
+    start_x_engine()
+    app.run(debug=debug, port=port, host="127.0.0.1", threaded=True)
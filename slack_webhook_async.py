@@ -0,0 +1,387 @@
+"""
+Async Slack interaction server (aiohttp)
+
+Same routes and behaviour as slack_webhook.py, but every interaction is a
+coroutine on one event loop instead of a thread. Slack calls go through a
+shared keep-alive session with a concurrency limit, so one process can keep
+hundreds of interactions in flight while only a bounded number of requests
+hit the API at once.
+
+There is no X client on the loop. Approving a tweet is one SQLite write to
+the X posting engine's outbox (run via asyncio.to_thread). The engine's own
+worker thread posts to X within the rate limits and hands each result back
+to the loop with run_coroutine_threadsafe. The request and queue logic
+shared with the threaded server lives in slack_interactions.py.
+
+    python slack_webhook_async.py
+"""
+
+import asyncio
+import json
+import os
+from urllib.parse import parse_qs
+import aiohttp
+from aiohttp import web
+from dotenv import load_dotenv
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+import metrics
+from logger_config import get_logger, shutdown_logging
+from idempotency import get_idempotency_store, interaction_key
+from pending_store import get_pending_store
+from slack_bot import prepare_status_update, render_status_update
+from slack_interactions import (
+    APPROVED_TEXT,
+    REJECTED_TEXT,
+    busy_reply,
+    duplicate_reply,
+    edit_modal_view,
+    modal_metadata,
+    reject_tweet,
+    release_failed_post,
+    remove_tweet_from_queue,
+    resolve_tweet,
+    submit_for_posting,
+    trace_id_from_payload,
+    verify_slack_request,
+)
+from tracing import current_trace_id, span
+from tweet_queue import POSTED
+from x_poster import get_x_engine
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("webhook")
+
+# Slack requests allowed in flight, also the size of its connection pool
+SLACK_CONCURRENCY = int(os.getenv("ASYNC_SLACK_CONCURRENCY", "20"))
+# Background actions (posts, message updates) allowed in flight before we answer "busy"
+MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "500"))
+UPSTREAM_TIMEOUT = float(os.getenv("ASYNC_UPSTREAM_TIMEOUT", "30"))
+GRACEFUL_TIMEOUT = float(os.getenv("WEBHOOK_GRACEFUL_TIMEOUT", "30"))
+
+
+class Upstreams:
+    """Shared Slack client with pooled keep-alive connections
+
+    Only Slack is called from the loop; X posting runs on the posting
+    engine's thread (see the module docstring).
+    """
+
+    def __init__(self):
+        timeout = aiohttp.ClientTimeout(total=UPSTREAM_TIMEOUT)
+        self.slack_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=SLACK_CONCURRENCY, keepalive_timeout=60),
+            timeout=timeout,
+        )
+
+        self.slack = AsyncWebClient(
+            token=os.getenv("SLACK_BOT_TOKEN"), session=self.slack_session
+        )
+
+        self.slack_limit = asyncio.Semaphore(SLACK_CONCURRENCY)
+
+    async def close(self):
+        await self.slack_session.close()
+
+
+upstreams_key = web.AppKey("upstreams", Upstreams)
+tasks_key = web.AppKey("tasks", set)
+
+
+async def update_message_status(upstreams, message_ts, status, new_text=None, tweet_id=None):
+    """Update the approval message to show the decision and disable its buttons"""
+    store = get_pending_store()
+    try:
+        rendered = await asyncio.to_thread(
+            prepare_status_update, store, message_ts, status, new_text, tweet_id
+        )
+        if rendered is None:
+            logger.warning(f"⚠️ No pending tweet found for message {message_ts}")
+            return
+
+        while True:
+            update, version = rendered
+            update["channel"] = update["channel"] or os.getenv("SLACK_CHANNEL")
+            async with upstreams.slack_limit:
+                await upstreams.slack.chat_update(**update)
+            if await asyncio.to_thread(store.message_version, message_ts) == version:
+                break
+            # Decided elsewhere meanwhile; our update may have landed after theirs
+            logger.info(f"🔁 Message {message_ts} changed while updating, re-rendering")
+            rendered = await asyncio.to_thread(render_status_update, store, message_ts, status)
+        logger.info(f"📝 Message updated with status: {status}")
+
+    except SlackApiError as e:
+        logger.error(f"❌ Error updating message: {e}")
+
+
+async def notify_channel(upstreams, message):
+    """Tell the approval channel about a failure in a background action"""
+    try:
+        async with upstreams.slack_limit:
+            await upstreams.slack.chat_postMessage(
+                channel=os.getenv("SLACK_CHANNEL"), text=message
+            )
+    except Exception as e:
+        logger.error(f"❌ Error notifying Slack channel: {e}")
+
+
+async def tweet_posted(upstreams, job, x_tweet_id):
+    """X engine callback: the tweet is live, so close it out in the queue and in Slack"""
+    await asyncio.to_thread(remove_tweet_from_queue, job["text"], POSTED, job["tweet_id"])
+    new_text = job["text"] if job["action"] == "edited" else None
+    await update_message_status(
+        upstreams, job["message_ts"], job["action"], new_text, tweet_id=job["tweet_id"]
+    )
+
+
+async def tweet_post_failed(upstreams, job, error):
+    """X engine callback: X refused the tweet for good; let the user try again"""
+    message = await asyncio.to_thread(release_failed_post, job, error)
+    await notify_channel(upstreams, message)
+
+
+async def process_approval(upstreams, tweet_text, message_ts, tweet_id, key):
+    """Background task: hand an approved tweet to the X posting engine"""
+    with span("process_approval"):
+        await asyncio.to_thread(
+            submit_for_posting, tweet_text, message_ts, tweet_id, key, "approved"
+        )
+
+
+async def process_rejection(upstreams, tweet_text, message_ts, tweet_id, key):
+    """Background task: reject a tweet and update the Slack message"""
+    with span("process_rejection"):
+        await asyncio.to_thread(reject_tweet, tweet_text, message_ts, tweet_id, key)
+        await update_message_status(upstreams, message_ts, "rejected", tweet_id=tweet_id)
+
+
+async def process_edited_tweet(upstreams, edited_tweet, message_ts, tweet_id, key):
+    """Background task: hand an edited tweet to the X posting engine"""
+    with span("process_edited_tweet"):
+        await asyncio.to_thread(
+            submit_for_posting, edited_tweet, message_ts, tweet_id, key, "edited"
+        )
+
+
+async def submit_action(app, key, job, *args):
+    """Start a claimed action as a background task, releasing the claim if we are at capacity
+
+    Tasks copy the current context, so they stay in the interaction's trace.
+    """
+    tasks = app[tasks_key]
+    if len(tasks) >= MAX_IN_FLIGHT:
+        logger.warning(f"🚧 {len(tasks)} actions in flight - rejecting {job.__name__}")
+        await asyncio.to_thread(get_idempotency_store().fail, key)
+        return False
+
+    task = asyncio.create_task(job(app[upstreams_key], *args, key))
+    tasks.add(task)
+
+    def finished(task):
+        tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"💥 {job.__name__} failed: {task.exception()}")
+
+    task.add_done_callback(finished)
+    return True
+
+
+async def claim(key):
+    return await asyncio.to_thread(get_idempotency_store().claim, key)
+
+
+async def handle_slack_interactions(request):
+    """Handle Slack button clicks and modal submissions"""
+    try:
+        logger.info("🔄 Handling Slack interaction")
+        timestamp = request.headers.get("X-Slack-Request-Timestamp")
+        signature = request.headers.get("X-Slack-Signature")
+        request_body = await request.text()
+
+        # Verify the request came from Slack
+        if not verify_slack_request(request_body, timestamp, signature):
+            logger.error("❌ Request verification failed - rejecting request")
+            return web.json_response({"error": "Request verification failed"}, status=403)
+
+        retry_num = request.headers.get("X-Slack-Retry-Num")
+        if retry_num:
+            logger.info(f"🔁 Slack retry #{retry_num} ({request.headers.get('X-Slack-Retry-Reason')})")
+
+        payload = json.loads(parse_qs(request_body)["payload"][0])
+        with span("slack_interaction", trace_id=trace_id_from_payload(payload)):
+            return await handle_interaction_payload(request.app, payload)
+
+    except Exception as e:
+        logger.error(f"❌ Error handling Slack interaction: {e}")
+        return web.json_response({"text": "❌ An error occurred processing your request."})
+
+
+async def handle_interaction_payload(app, payload):
+    """Dispatch a verified Slack interaction payload"""
+    logger.debug(f"📨 Received Slack interaction: {payload.get('type', 'unknown')}")
+
+    if payload["type"] == "block_actions":
+        action = payload["actions"][0]
+        action_id = action["action_id"]
+        message_ts = payload["message"]["ts"]
+        tweet_id, tweet_text = await asyncio.to_thread(resolve_tweet, message_ts, action["value"])
+
+        logger.info(f"🔘 Button clicked: {action_id} for tweet: {tweet_text[:30]}...")
+
+        if action_id.startswith("approve_tweet_"):
+            key = interaction_key(message_ts, "approve", tweet_id)
+            claimed, record = await claim(key)
+            if not claimed:
+                return web.json_response(duplicate_reply(record))
+            if not await submit_action(
+                app, key, process_approval, tweet_text, message_ts, tweet_id
+            ):
+                return web.json_response(busy_reply())
+            return web.json_response({"text": APPROVED_TEXT})
+
+        elif action_id.startswith("edit_tweet_"):
+            # trigger_id expires after 3 seconds, so the modal opens inline
+            logger.info(f"✏️ Opening edit modal for tweet: {tweet_text[:50]}...")
+            tweet_index = action_id.split("_")[-1]
+            upstreams = app[upstreams_key]
+            async with upstreams.slack_limit:
+                await upstreams.slack.views_open(
+                    trigger_id=payload["trigger_id"],
+                    view=edit_modal_view(
+                        tweet_text, tweet_index, message_ts, current_trace_id(), tweet_id
+                    ),
+                )
+            return web.json_response({"text": "Opening edit modal..."})
+
+        elif action_id.startswith("reject_tweet_"):
+            key = interaction_key(message_ts, "reject", tweet_id)
+            claimed, record = await claim(key)
+            if not claimed:
+                return web.json_response(duplicate_reply(record))
+            if not await submit_action(
+                app, key, process_rejection, tweet_text, message_ts, tweet_id
+            ):
+                return web.json_response(busy_reply())
+            return web.json_response({"text": REJECTED_TEXT})
+
+        elif action_id == "disabled_button":
+            logger.info("🚫 User clicked on disabled button - ignoring")
+            return web.json_response({"text": "This tweet has already been processed."})
+
+    elif payload["type"] == "view_submission":
+        logger.info("📝 Processing modal submission (edited tweet)")
+        callback_id = payload["view"]["callback_id"]
+        values = payload["view"]["state"]["values"]
+        edited_tweet = values["tweet_input"]["tweet_text"]["value"]
+        message_ts = callback_id.split("_")[-1]
+        tweet_id = modal_metadata(payload).get("tweet_id")
+
+        key = interaction_key(message_ts, "edit", tweet_id)
+        claimed, record = await claim(key)
+        if not claimed:
+            return web.json_response({"response_action": "clear"})
+
+        if not await submit_action(
+            app, key, process_edited_tweet, edited_tweet, message_ts, tweet_id
+        ):
+            return web.json_response(
+                {
+                    "response_action": "errors",
+                    "errors": {"tweet_input": "Too many actions in progress. Please try again."},
+                }
+            )
+        return web.json_response({"response_action": "clear"})
+
+    return web.json_response({"status": "ok"})
+
+
+async def health_check(request):
+    """Health check endpoint"""
+    return web.json_response(
+        {
+            "status": "healthy",
+            "in_flight": len(request.app[tasks_key]),
+            "max_in_flight": MAX_IN_FLIGHT,
+            "idempotency": get_idempotency_store().stats(),
+            "x_posting": await asyncio.to_thread(get_x_engine().stats),
+        }
+    )
+
+
+async def metrics_endpoint(request):
+    """Prometheus-style metrics endpoint"""
+    return web.Response(
+        text=metrics.registry.render(), content_type="text/plain", charset="utf-8"
+    )
+
+
+async def on_startup(app):
+    upstreams = app[upstreams_key] = Upstreams()
+    loop = asyncio.get_running_loop()
+
+    def on_posted(job, x_tweet_id):
+        # Called from the engine's worker thread; the follow-up runs on the loop
+        asyncio.run_coroutine_threadsafe(tweet_posted(upstreams, job, x_tweet_id), loop)
+
+    def on_failed(job, error):
+        asyncio.run_coroutine_threadsafe(tweet_post_failed(upstreams, job, error), loop)
+
+    await asyncio.to_thread(get_x_engine().start, on_posted=on_posted, on_failed=on_failed)
+    metrics.registry.register_gauge(
+        "webhook_async_in_flight",
+        "Background Slack actions in flight on the event loop",
+        lambda: len(app[tasks_key]),
+    )
+    metrics.registry.register_gauge(
+        "x_outbox_jobs",
+        "X posting outbox jobs by status",
+        lambda: get_x_engine().outbox.stats(),
+        label_name="status",
+    )
+    logger.info(
+        f"🚀 Async webhook ready (Slack x{SLACK_CONCURRENCY}, {MAX_IN_FLIGHT} actions in flight)"
+    )
+
+
+async def on_shutdown(app):
+    """Let in-flight actions finish before the sessions close"""
+    tasks = app[tasks_key]
+    if tasks:
+        logger.info(f"⏳ Draining {len(tasks)} in-flight action(s)...")
+        done, pending = await asyncio.wait(list(tasks), timeout=GRACEFUL_TIMEOUT)
+        if pending:
+            logger.warning(f"⚠️ {len(pending)} action(s) still running at shutdown - cancelling")
+            for task in pending:
+                task.cancel()
+
+
+async def on_cleanup(app):
+    # Unfinished outbox jobs stay in the database for the next start
+    await asyncio.to_thread(get_x_engine().stop, GRACEFUL_TIMEOUT)
+    await app[upstreams_key].close()
+    shutdown_logging()
+
+
+def create_app():
+    app = web.Application()
+    app[tasks_key] = set()
+    app.router.add_post("/slack/interactions", handle_slack_interactions)
+    app.router.add_get("/health", health_check)
+    app.router.add_get("/metrics", metrics_endpoint)
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(
+        create_app(),
+        host=os.getenv("WEBHOOK_HOST", "127.0.0.1"),
+        port=int(os.getenv("WEBHOOK_PORT", "5003")),
+        shutdown_timeout=GRACEFUL_TIMEOUT,
+        access_log=None,
+    )
@@ -0,0 +1,285 @@
+"""
+Newsletter sources for the ingestion pipeline
+
+A source has a `name` and two methods:
+
+- fetch() yields raw items (I/O only; runs on the source's producer thread)
+- parse(item) turns one raw item into a newsletter dict, or None to skip it
+  (CPU work; runs on the pipeline's workers under the parse limit)
+
+Newsletter dicts have the shape gmail_ingest.parse_newsletter produces:
+message_id, subject, from, date and content. Duplicates are dropped
+downstream by the newsletter cache, which keys on Message-ID (or on
+content when there is none), so sources can re-yield items freely.
+
+configured_sources() builds the sources listed in the environment.
+"""
+
+import glob
+import html
+import mailbox
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from dotenv import load_dotenv
+from clients import HTTP_TIMEOUT, get_http_session
+from gmail_ingest import GmailIngester, parse_newsletter
+from logger_config import get_logger
+from newsletter_cache import get_newsletter_cache
+from state_db import get_connection
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("sources")
+
+# Newest entries taken from each feed per poll
+FEED_MAX_ITEMS = int(os.getenv("FEED_MAX_ITEMS", "20"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feed_state (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+CONTENT_ENCODED = "{http://purl.org/rss/1.0/modules/content/}encoded"
+
+
+def _env_list(name, default=""):
+    return [value.strip() for value in os.getenv(name, default).split(",") if value.strip()]
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the visible text of an HTML fragment, one block per line"""
+
+    BLOCK_TAGS = {"p", "div", "br", "li", "h1", "h2", "h3", "h4", "tr", "blockquote"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                # Keep links so tweets can cite them
+                self.parts.append(f" {href} ")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(fragment):
+    """Plain text of an HTML fragment (feed items are usually HTML)"""
+    if "<" not in fragment:
+        return html.unescape(fragment)
+    extractor = _TextExtractor()
+    extractor.feed(fragment)
+    text = "".join(extractor.parts)
+    return re.sub(r"\n\s*\n+", "\n\n", text).strip()
+
+
+class GmailSource:
+    """New newsletters from one sender in a Gmail mailbox"""
+
+    def __init__(self, sender, mailbox=None):
+        self.ingester = GmailIngester(sender=sender, mailbox=mailbox)
+        self.name = f"gmail:{sender}"
+
+    def fetch(self):
+        for newsletter in self.ingester.fetch_new():
+            # Cache before the stored UID advances, so nothing is lost if we stop here
+            # (a full cache raises CacheFullError and the UID stays put)
+            get_newsletter_cache().put(newsletter)
+            yield newsletter
+
+    def parse(self, newsletter):
+        # The ingester already parsed it on the way in
+        return newsletter
+
+
+class FeedSource:
+    """Entries of an RSS 2.0 or Atom feed
+
+    Polls with If-None-Match / If-Modified-Since, so an unchanged feed costs
+    one empty 304 response.
+    """
+
+    def __init__(self, url, db_path=None):
+        self.url = url
+        self.name = f"feed:{url}"
+        self.db_path = db_path
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def fetch(self):
+        row = self._conn().execute(
+            "SELECT etag, last_modified FROM feed_state WHERE url = ?", (self.url,)
+        ).fetchone()
+        headers = {}
+        if row and row["etag"]:
+            headers["If-None-Match"] = row["etag"]
+        if row and row["last_modified"]:
+            headers["If-Modified-Since"] = row["last_modified"]
+
+        response = get_http_session().get(self.url, headers=headers, timeout=HTTP_TIMEOUT)
+        if response.status_code == 304:
+            logger.info(f"📭 Feed unchanged: {self.url}")
+            return
+        response.raise_for_status()
+
+        root = ET.fromstring(response.content)
+        if root.tag == f"{ATOM}feed":
+            entries = [self._atom_entry(entry) for entry in root.findall(f"{ATOM}entry")]
+        else:
+            entries = [self._rss_item(item) for item in root.iter("item")]
+        logger.info(f"📰 {len(entries)} entries in feed {self.url}")
+        for entry in entries[:FEED_MAX_ITEMS]:
+            newsletter = self._newsletter(entry)
+            if newsletter is not None:
+                # Cached first, so a full cache stops us before the validators are saved
+                get_newsletter_cache().put(newsletter)
+                yield newsletter
+
+        # Only remember the validators once every entry is cached
+        self._conn().execute(
+            "INSERT OR REPLACE INTO feed_state (url, etag, last_modified, updated_at)"
+            " VALUES (?, ?, ?, ?)",
+            (self.url, response.headers.get("ETag"), response.headers.get("Last-Modified"), time.time()),
+        )
+
+    def _rss_item(self, item):
+        return {
+            "id": item.findtext("guid") or item.findtext("link"),
+            "title": item.findtext("title") or "",
+            "link": item.findtext("link") or "",
+            "date": item.findtext("pubDate"),
+            "body": item.findtext(CONTENT_ENCODED) or item.findtext("description") or "",
+        }
+
+    def _atom_entry(self, entry):
+        link = entry.find(f"{ATOM}link[@rel='alternate']")
+        if link is None:
+            link = entry.find(f"{ATOM}link")
+        return {
+            "id": entry.findtext(f"{ATOM}id"),
+            "title": entry.findtext(f"{ATOM}title") or "",
+            "link": link.get("href", "") if link is not None else "",
+            "date": entry.findtext(f"{ATOM}updated") or entry.findtext(f"{ATOM}published"),
+            "body": entry.findtext(f"{ATOM}content") or entry.findtext(f"{ATOM}summary") or "",
+        }
+
+    def _newsletter(self, entry):
+        body = html_to_text(entry["body"])
+        if not body:
+            return None
+        return {
+            "message_id": entry["id"],
+            "subject": entry["title"],
+            "from": self.url,
+            "date": entry["date"],
+            "content": f"Subject: {entry['title']}\nFrom: {self.url}\nLink: {entry['link']}\n\n{body}",
+        }
+
+    def parse(self, newsletter):
+        # Converted and cached in fetch, before the feed state moved
+        return newsletter
+
+
+class LocalFileSource:
+    """Newsletters in local files: .eml messages, .mbox archives and plain .txt
+
+    A path may be a file, a directory (scanned for those extensions) or a
+    glob pattern.
+    """
+
+    EXTENSIONS = (".eml", ".mbox", ".txt")
+
+    def __init__(self, path):
+        self.path = path
+        self.name = f"file:{path}"
+
+    def _files(self):
+        if os.path.isdir(self.path):
+            for root, _, names in os.walk(self.path):
+                for name in sorted(names):
+                    if name.endswith(self.EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield from sorted(glob.glob(self.path))
+
+    def fetch(self):
+        for path in self._files():
+            if path.endswith(".mbox"):
+                archive = mailbox.mbox(path, create=False)
+                try:
+                    for message in archive:
+                        yield ("email", path, message.as_bytes())
+                finally:
+                    archive.close()
+            elif path.endswith(".eml"):
+                with open(path, "rb") as f:
+                    yield ("email", path, f.read())
+            else:
+                with open(path, "r", errors="replace") as f:
+                    yield ("text", path, f.read())
+
+    def parse(self, item):
+        kind, path, data = item
+        if kind == "email":
+            return parse_newsletter(data)
+        if not data.strip():
+            return None
+        # No Message-ID, so the cache keys it by content and it is processed once
+        return {"message_id": None, "subject": path, "content": data}
+
+
+_sources = None
+_sources_lock = threading.Lock()
+
+
+def configured_sources():
+    """Sources listed in the environment, built once per process
+
+    NEWSLETTER_SENDERS  comma-separated Gmail senders (needs GMAIL_USER/GMAIL_APP_PASSWORD)
+    NEWSLETTER_FEEDS    comma-separated RSS/Atom feed URLs
+    NEWSLETTER_PATHS    comma-separated files, directories or globs
+    """
+    global _sources
+    if _sources is None:
+        with _sources_lock:
+            if _sources is None:
+                sources = []
+                if os.getenv("GMAIL_USER") and os.getenv("GMAIL_APP_PASSWORD"):
+                    senders = _env_list(
+                        "NEWSLETTER_SENDERS", os.getenv("NEWSLETTER_SENDER", "news@smol.ai")
+                    )
+                    sources.extend(GmailSource(sender) for sender in senders)
+                sources.extend(FeedSource(url) for url in _env_list("NEWSLETTER_FEEDS"))
+                # No file source unless asked for: email.txt is only a sample
+                sources.extend(
+                    LocalFileSource(path)
+                    for path in _env_list("NEWSLETTER_PATHS", os.getenv("NEWSLETTER_FILE", ""))
+                )
+                _sources = sources
+                logger.info(f"🔌 Newsletter sources: {', '.join(s.name for s in sources) or 'none'}")
+    return _sources
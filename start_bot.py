@@ -12,8 +12,6 @@ import threading
 from dotenv import load_dotenv
 from logger_config import get_logger, setup_logging
 
-# Initialize logging first
-setup_logging()
 logger = get_logger("startup")
 
 
@@ -54,7 +52,11 @@ def start_webhook_server():
     """Start the Flask webhook server"""
     logger.info("🚀 Starting Slack webhook server...")
     try:
-        subprocess.run([sys.executable, "slack_webhook.py"], check=True)
+        if os.getenv("WEBHOOK_SERVER", "gunicorn") == "gunicorn":
+            command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "slack_webhook:app"]
+        else:
+            command = [sys.executable, "slack_webhook.py"]
+        subprocess.run(command, check=True)
     except subprocess.CalledProcessError as e:
         logger.error(f"❌ Webhook server failed: {e}")
     except KeyboardInterrupt:
@@ -75,6 +77,8 @@ def start_main_bot():
 
 def main():
     """Main function to orchestrate bot startup"""
+    # Initialize logging first
+    setup_logging()
     logger.info("🚀 Starting Slack Tweet Approval Bot...")
     logger.info("=" * 50)
 
@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from logger_config import get_logger
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("state")
+
+# Shared SQLite database used by both the bot and the webhook process
+DEFAULT_DB_PATH = os.getenv("TWEET_STATE_DB", "tweet_state.db")
+
+_local = threading.local()
+
+
+def get_connection(db_path=None):
+    """Get a per-thread SQLite connection in WAL mode
+
+    Connections are cached per thread and per database path, so request
+    threads never share a connection but also never pay the connect cost twice.
+    """
+    db_path = db_path or DEFAULT_DB_PATH
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        # isolation_level=None: we manage transactions explicitly with BEGIN
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        connections[db_path] = conn
+        logger.debug(f"🗄️ Opened state database: {db_path}")
+    return conn
+
+
+@contextmanager
+def transaction(conn):
+    """Run a block inside an IMMEDIATE (write-locking) transaction"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def ensure_column(conn, table, column, declaration):
+    """Add a column to an existing table if an older schema lacks it"""
+    columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+        logger.info(f"🗄️ Added column {table}.{column}")
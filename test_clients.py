@@ -0,0 +1,112 @@
+"""
+Tests for the pooled Slack client against the installed slack_sdk
+
+PooledWebClient overrides a private slack_sdk method, so these run it
+through the real WebClient request, error and retry paths against a local
+Flask app. Run with: python -m pytest test_clients.py
+"""
+
+import socket
+import threading
+from urllib.error import URLError
+import pytest
+from flask import Flask, jsonify, request
+from slack_sdk.errors import SlackApiError
+from slack_sdk.http_retry.builtin_handlers import ConnectionErrorRetryHandler, RateLimitErrorRetryHandler
+from werkzeug.serving import make_server
+import clients
+
+app = Flask(__name__)
+calls = []
+rate_limited = []
+
+
+@app.route("/api/chat.postMessage", methods=["POST"])
+def post_message():
+    calls.append((request.headers.get("Authorization"), request.get_json(silent=True) or request.form.to_dict()))
+    if rate_limited:
+        rate_limited.pop()
+        return jsonify({"ok": False, "error": "ratelimited"}), 429, {"retry-after": "0"}
+    return jsonify({"ok": True, "ts": "1.0", "channel": "C1"}), 200, {"X-Request-Id": "abc"}
+
+
+@app.route("/api/chat.update", methods=["POST"])
+def update():
+    return jsonify({"ok": False, "error": "message_not_found"}), 404
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/api/"
+    server.shutdown()
+
+
+@pytest.fixture
+def slack(base_url, monkeypatch):
+    monkeypatch.setenv("SLACK_BOT_TOKEN", "xoxb-test")
+    calls.clear()
+    rate_limited.clear()
+    client = clients._create_slack_client()
+    client.base_url = base_url
+    return client
+
+
+def test_override_is_used_with_pinned_slack_sdk(slack):
+    assert type(slack).__name__ == "PooledWebClient"
+
+
+def test_successful_call(slack):
+    response = slack.chat_postMessage(channel="C1", text="hi")
+
+    assert response["ts"] == "1.0"
+    assert response.status_code == 200
+    assert response.headers["X-Request-Id"] == "abc"
+    assert calls == [("Bearer xoxb-test", {"channel": "C1", "text": "hi"})]
+
+
+def test_error_status_raises_slack_api_error(slack):
+    with pytest.raises(SlackApiError) as error:
+        slack.chat_update(channel="C1", ts="1.0", text="hi")
+
+    assert error.value.response.status_code == 404
+    assert error.value.response["error"] == "message_not_found"
+
+
+def test_rate_limit_is_retried_by_slack_sdk_handler(slack):
+    slack.retry_handlers.append(RateLimitErrorRetryHandler(max_retry_count=1))
+    rate_limited.append(True)
+
+    assert slack.chat_postMessage(channel="C1", text="hi")["ok"]
+    assert len(calls) == 2
+
+
+def test_rate_limit_without_handler_surfaces_429(slack):
+    rate_limited.append(True)
+
+    with pytest.raises(SlackApiError) as error:
+        slack.chat_postMessage(channel="C1", text="hi")
+
+    assert error.value.response.status_code == 429
+    assert error.value.response.headers["retry-after"] == "0"
+
+
+def test_connection_errors_reach_slack_sdk_retry_handler(slack):
+    class CountingHandler(ConnectionErrorRetryHandler):
+        retries = 0
+
+        def prepare_for_next_attempt(self, **kwargs):
+            CountingHandler.retries += 1
+            super().prepare_for_next_attempt(**kwargs)
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        slack.base_url = f"http://127.0.0.1:{sock.getsockname()[1]}/api/"
+    slack.retry_handlers = [CountingHandler(max_retry_count=1)]
+
+    with pytest.raises(URLError):
+        slack.chat_postMessage(channel="C1", text="hi")
+
+    assert CountingHandler.retries == 1
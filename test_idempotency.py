@@ -0,0 +1,57 @@
+"""
+Tests for the Slack interaction idempotency store
+
+Each test gets a fresh state database. Run with: python -m pytest test_idempotency.py
+"""
+
+import time
+import pytest
+from idempotency import DONE, IdempotencyStore
+from state_db import get_connection
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(db_path=str(tmp_path / "state.db"), retention=3600)
+
+
+def rows(store):
+    return [row["key"] for row in get_connection(store.db_path).execute("SELECT key FROM interaction_results ORDER BY key")]
+
+
+def age(store, key, seconds):
+    get_connection(store.db_path).execute(
+        "UPDATE interaction_results SET updated_at = updated_at - ? WHERE key = ?", (seconds, key)
+    )
+
+
+def test_duplicate_claim_returns_stored_result(store):
+    assert store.claim("1.0:post") == (True, None)
+    store.complete("1.0:post", "posted")
+
+    claimed, record = store.claim("1.0:post")
+    assert not claimed
+    assert (record["status"], record["result"]) == (DONE, "posted")
+
+
+def test_purge_deletes_only_records_past_retention(store):
+    for key in ("old:post", "new:post"):
+        store.claim(key)
+        store.complete(key, "done")
+    age(store, "old:post", 7200)
+
+    assert store.purge() == 1
+    assert rows(store) == ["new:post"]
+    assert store.stats()["purged"] == 1
+
+
+def test_claim_purges_once_per_interval(store):
+    store.claim("old:post")  # the first claim of a process purges
+    age(store, "old:post", 7200)
+
+    store.claim("next:post")
+    assert "old:post" in rows(store)
+
+    store._last_purge = time.monotonic() - 7200
+    store.claim("later:post")
+    assert rows(store) == ["later:post", "next:post"]
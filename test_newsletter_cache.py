@@ -0,0 +1,65 @@
+"""
+Tests for newsletter cache eviction
+
+Each test gets a fresh state database and cache directory.
+Run with: python -m pytest test_newsletter_cache.py
+"""
+
+import time
+import pytest
+from newsletter_cache import CacheFullError, NewsletterCache, newsletter_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return NewsletterCache(
+        cache_dir=tmp_path / "newsletters", max_bytes=100, max_age=3600, db_path=str(tmp_path / "state.db")
+    )
+
+
+def newsletter(n, size=40):
+    return {"message_id": f"<{n}@example.com>", "subject": f"issue {n}", "content": str(n) * size}
+
+
+def test_evicts_oldest_processed_to_make_room(cache):
+    first, second = cache.put(newsletter(1)), cache.put(newsletter(2))
+    cache.mark_processed(first)
+
+    third = cache.put(newsletter(3))
+
+    assert cache.get(first) is None
+    assert cache.get(second) is not None
+    assert cache.get(third) is not None
+    assert cache.total_bytes() == 80
+
+
+def test_never_evicts_unprocessed(cache):
+    first, second = cache.put(newsletter(1)), cache.put(newsletter(2))
+
+    with pytest.raises(CacheFullError):
+        cache.put(newsletter(3))
+
+    assert cache.get(first) is not None
+    assert cache.get(second) is not None
+    assert not cache.contains(newsletter_key(newsletter(3)))
+    assert cache.total_bytes() == 80
+
+
+def test_put_returns_a_stored_key(cache):
+    cache.mark_processed(cache.put(newsletter(1)))
+    key = cache.put(newsletter(2, size=90))
+
+    assert cache.get(key)["subject"] == "issue 2"
+
+
+def test_evicts_expired_processed_entries(cache):
+    key = cache.put(newsletter(1))
+    cache.mark_processed(key)
+    pending = cache.put(newsletter(2))
+    cache._conn().execute("UPDATE newsletter_cache SET fetched_at = ?", (time.time() - 7200,))
+
+    assert cache.evict() == 40
+    assert cache.get(key) is None
+    assert cache.is_processed(key)
+    assert cache.get(pending) is not None
+
@@ -0,0 +1,57 @@
+"""
+Tests for Slack approval message updates
+
+Run with: python -m pytest test_slack_bot.py
+"""
+
+import pytest
+import slack_bot
+from pending_store import PendingApprovalStore
+
+
+class RecordingClient:
+    """chat_update stand-in that lets another decision slip in before the first update lands"""
+
+    def __init__(self):
+        self.landed = []
+        self.interleave = None
+
+    def chat_update(self, **update):
+        if self.interleave:
+            interleave, self.interleave = self.interleave, None
+            interleave()
+        statuses = {
+            block["block_id"]: block["elements"][0]["text"]
+            for block in update["blocks"]
+            if block.get("block_id", "").startswith("tweet_status:")
+        }
+        self.landed.append(statuses)
+
+
+@pytest.fixture
+def bot(tmp_path):
+    store = PendingApprovalStore(str(tmp_path / "state.db"))
+    store.add_many("100.1", [{"id": "a", "text": "A"}, {"id": "b", "text": "B"}], channel="C")
+    bot = slack_bot.SlackTweetBot.__new__(slack_bot.SlackTweetBot)
+    bot.client, bot.channel, bot.pending_tweets = RecordingClient(), "C", store
+    return bot
+
+
+def test_concurrent_digest_decisions_both_end_up_in_slack(bot):
+    # Rejecting b (as another worker would) lands before the update for a
+    bot.client.interleave = lambda: bot.update_message_status("100.1", "rejected", tweet_id="b")
+
+    bot.update_message_status("100.1", "approved", tweet_id="a")
+
+    final = bot.client.landed[-1]
+    assert final["tweet_status:a"] == slack_bot.status_label("approved")[0]
+    assert final["tweet_status:b"] == slack_bot.status_label("rejected")[0]
+    assert len(bot.client.landed) == 3
+    assert bot.pending_tweets.message_version("100.1") == 2
+
+
+def test_single_decision_updates_once(bot):
+    bot.update_message_status("100.1", "approved", tweet_id="a")
+
+    assert len(bot.client.landed) == 1
+    assert bot.pending_tweets.message_version("100.1") == 1
@@ -0,0 +1,191 @@
+"""
+Tests for the X posting engine against x_stub_server.py
+
+Each test gets a fresh state database and a reset stub listening on a free
+local port. Run with: python -m pytest test_x_poster.py
+"""
+
+import itertools
+import threading
+import time
+import pytest
+import requests
+from werkzeug.serving import make_server
+import x_poster
+import x_stub_server
+from x_poster import FAILED, PENDING, SENDING, SENT, QuotaLedger, XOutbox, XPostingEngine, XTransport
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = make_server("127.0.0.1", 0, x_stub_server.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def stub():
+    x_stub_server.config.update(limit_15min=50, limit_day=100, fail_rate=0.0, window_scale=1.0)
+    x_stub_server.state.update(posts=[], texts=set(), responses={})
+    x_stub_server.ids = itertools.count(1)
+    return x_stub_server
+
+
+@pytest.fixture
+def engine(tmp_path, stub_url, stub, monkeypatch):
+    monkeypatch.setattr(x_poster, "X_BACKOFF_BASE", 0.05)
+    db_path = str(tmp_path / "state.db")
+    # The stub does not check signatures, so a plain session stands in for OAuth1
+    transport = XTransport(base_url=stub_url, timeout=5, session=requests.Session())
+    engine = XPostingEngine(XOutbox(db_path), QuotaLedger(db_path), transport, poll_interval=0.05)
+    engine.posted, engine.failed = [], []
+    yield engine
+    engine.stop(timeout=5)
+
+
+def start(engine):
+    engine.start(
+        on_posted=lambda job, x_tweet_id: engine.posted.append((job["job_id"], x_tweet_id)),
+        on_failed=lambda job, error: engine.failed.append((job["job_id"], error)),
+    )
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def job(engine, job_id):
+    row = engine.outbox._conn().execute("SELECT * FROM x_outbox WHERE job_id = ?", (job_id,)).fetchone()
+    return dict(row)
+
+
+def test_posts_approved_tweet(engine, stub):
+    start(engine)
+    assert engine.submit("k1", "hello world", tweet_id="t1", message_ts="1.0")
+
+    assert wait_for(lambda: engine.posted)
+    assert engine.posted == [("k1", "1")]
+    assert job(engine, "k1")["status"] == SENT
+    assert stub.state["responses"] == {201: 1}
+    assert engine.ledger.usage()["last_15min"] == 1
+
+
+def test_rate_limited_post_waits_for_reset(engine, stub):
+    # One post per 0.9s window on the stub; the local ledger allows more
+    stub.config.update(limit_15min=1, window_scale=0.001)
+    start(engine)
+    engine.submit("k1", "first")
+    engine.submit("k2", "second")
+
+    assert wait_for(lambda: len(engine.posted) == 2)
+    assert stub.state["responses"][429] >= 1
+    # A 429 is the quota's fault, not the tweet's
+    assert job(engine, "k2")["attempts"] == 0
+    assert job(engine, "k2")["status"] == SENT
+
+
+def test_server_errors_retry_with_backoff(engine, stub):
+    stub.config.update(fail_rate=1.0)
+    start(engine)
+    engine.submit("k1", "flaky")
+
+    assert wait_for(lambda: job(engine, "k1")["attempts"] >= 2)
+    assert job(engine, "k1")["status"] in (PENDING, SENDING)
+    stub.config.update(fail_rate=0.0)
+
+    assert wait_for(lambda: engine.posted)
+    assert job(engine, "k1")["status"] == SENT
+    assert stub.state["responses"][201] == 1
+
+
+def test_duplicate_approval_posts_once(engine, stub):
+    start(engine)
+    assert engine.submit("k1", "same tweet")
+    # A second click on the same approval reuses the idempotency key
+    assert not engine.submit("k1", "same tweet")
+
+    assert wait_for(lambda: engine.posted)
+    time.sleep(0.2)
+    assert stub.state["responses"] == {201: 1}
+    assert engine.outbox.stats() == {SENT: 1}
+
+
+def test_duplicate_content_fails_without_retry(engine, stub):
+    start(engine)
+    engine.submit("k1", "same tweet")
+    assert wait_for(lambda: engine.posted)
+    engine.submit("k2", "same tweet")
+
+    assert wait_for(lambda: engine.failed)
+    assert engine.failed[0][0] == "k2"
+    assert "403" in engine.failed[0][1]
+    assert job(engine, "k2")["status"] == FAILED
+    assert stub.state["responses"] == {201: 1, 403: 1}
+
+
+def test_recovers_job_stranded_in_sending(engine, stub):
+    engine.submit("k1", "interrupted")
+    claimed = engine.outbox.claim_due()
+    assert claimed["status"] == SENDING
+    # The process that claimed it died mid-request a while ago
+    engine.outbox._conn().execute(
+        "UPDATE x_outbox SET updated_at = ? WHERE job_id = 'k1'", (time.time() - x_poster.SENDING_TIMEOUT - 1,)
+    )
+
+    start(engine)
+    assert wait_for(lambda: engine.posted)
+    assert job(engine, "k1")["status"] == SENT
+    assert stub.state["responses"] == {201: 1}
+
+
+def test_success_with_unexpected_body_is_still_sent(engine):
+    class PlainTextTransport:
+        session = requests.Session()
+
+        def create_tweet(self, text):
+            response = requests.models.Response()
+            response.status_code = 201
+            response._content = b"<html>created</html>"
+            return response
+
+    engine.transport = PlainTextTransport()
+    start(engine)
+    engine.submit("k1", "posted")
+
+    assert wait_for(lambda: engine.posted)
+    assert engine.posted == [("k1", None)]
+    assert job(engine, "k1")["status"] == SENT
+
+
+def test_missing_credentials_fail_fast(tmp_path, monkeypatch):
+    for name in ("API_KEY", "API_SECRET", "ACCESS_TOKEN", "ACCESS_TOKEN_SECRET"):
+        monkeypatch.delenv(name, raising=False)
+    db_path = str(tmp_path / "state.db")
+    engine = XPostingEngine(XOutbox(db_path), QuotaLedger(db_path), XTransport(base_url="http://127.0.0.1:1"))
+
+    with pytest.raises(RuntimeError, match="API_KEY"):
+        engine.start()
+    assert engine._thread is None
+
+
+def test_client_errors_are_permanent(engine):
+    class BrokenTransport:
+        session = requests.Session()
+
+        def create_tweet(self, text):
+            raise ValueError("Only unicode objects are escapable. Got None")
+
+    engine.transport = BrokenTransport()
+    start(engine)
+    engine.submit("k1", "never sent")
+
+    assert wait_for(lambda: engine.failed)
+    assert job(engine, "k1")["status"] == FAILED
+    assert job(engine, "k1")["attempts"] == 1
@@ -0,0 +1,213 @@
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from dotenv import load_dotenv
+from metrics import registry
+from logger_config import get_logger
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("trace")
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_span_name = contextvars.ContextVar("span_name", default=None)
+
+span_duration = registry.histogram(
+    "span_duration_seconds", "Duration of trace spans", ("span", "outcome")
+)
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+def current_trace_id():
+    """Correlation ID of the trace running in this context, if any"""
+    return _trace_id.get()
+
+
+_install_lock = threading.Lock()
+_installed = False
+
+
+def stamp(record):
+    """Set trace_id and span on a log record from the current context"""
+    record.trace_id = _trace_id.get()
+    record.span = _span_name.get()
+    return record
+
+
+def install():
+    """Stamp every log record with the active trace, on the thread that created it
+
+    Called by logger_config.setup_logging. Wraps whatever record factory is
+    installed at that point, so factories set by other libraries keep
+    working. Calling it again does nothing.
+    """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        previous = logging.getLogRecordFactory()
+
+        def record_factory(*args, **kwargs):
+            return stamp(previous(*args, **kwargs))
+
+        logging.setLogRecordFactory(record_factory)
+        _installed = True
+
+
+class SamplingProfiler:
+    """Opt-in sampling profiler attributing stack samples to active spans
+
+    A background thread samples sys._current_frames() every interval while
+    at least one span is being profiled. When a span runs longer than the
+    threshold its samples are written as collapsed stacks ("a;b;c count"),
+    which flamegraph.pl, speedscope and inferno read directly.
+
+    Samples are taken per thread. A span opened inside an asyncio task only
+    gets the event loop thread's samples while that task is the one running,
+    so concurrent tasks are not attributed to each other. Time the task
+    spends suspended in an await is therefore not sampled.
+    """
+
+    def __init__(self, interval=0.005, threshold=1.0, output_dir="logs/profiles"):
+        self.interval = interval
+        self.threshold = threshold
+        self.output_dir = Path(output_dir)
+        self._active = {}  # thread ident -> list of (sample Counter, asyncio task or None)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="sampling-profiler", daemon=True
+                )
+                self._thread.start()
+
+    @staticmethod
+    def _current_task():
+        # No asyncio import here: if nothing imported it, there is no task
+        asyncio = sys.modules.get("asyncio")
+        if asyncio is None:
+            return None
+        try:
+            return asyncio.current_task()
+        except RuntimeError:
+            return None
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for ident, entries in self._active.items():
+                    if ident == own_ident or ident not in frames:
+                        continue
+                    stack = None
+                    for samples, task in entries:
+                        # On an event loop thread the frame belongs to whichever task is running
+                        if task is not None and sys.modules["asyncio"].current_task(task.get_loop()) is not task:
+                            continue
+                        stack = stack or self._collapse(frames[ident])
+                        samples[stack] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def start(self):
+        """Start collecting samples for the calling thread, returns the sample bucket"""
+        samples = Counter()
+        task = self._current_task()
+        with self._lock:
+            self._active.setdefault(threading.get_ident(), []).append((samples, task))
+        self._ensure_started()
+        return samples
+
+    def stop(self, samples, name, trace_id, duration):
+        """Stop collecting; dump the samples if the span was slow"""
+        ident = threading.get_ident()
+        with self._lock:
+            entries = self._active.get(ident, [])
+            entries[:] = [entry for entry in entries if entry[0] is not samples]
+            if not entries:
+                self._active.pop(ident, None)
+
+        if duration < self.threshold or not samples:
+            return None
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"{int(time.time())}_{name}_{trace_id}.folded"
+        with open(path, "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(f"🔥 Slow span {name} ({duration:.2f}s) profile written to {path}")
+        return path
+
+
+_profiler = None
+if os.getenv("TRACE_PROFILE", "0") == "1":
+    _profiler = SamplingProfiler(
+        interval=float(os.getenv("TRACE_PROFILE_INTERVAL_MS", "5")) / 1000,
+        threshold=float(os.getenv("TRACE_PROFILE_THRESHOLD_MS", "1000")) / 1000,
+    )
+
+
+@contextmanager
+def span(name, trace_id=None):
+    """Time a unit of work as part of a trace
+
+    Joins the trace already active in this context, or the given trace_id
+    (e.g. one carried in a Slack payload), or starts a new one. Yields the
+    trace ID so callers can pass it on.
+    """
+    trace_id = trace_id or _trace_id.get() or new_trace_id()
+    parent = _span_name.get()
+    trace_token = _trace_id.set(trace_id)
+    span_token = _span_name.set(name)
+    samples = _profiler.start() if _profiler else None
+    start_time = time.perf_counter()
+    outcome = "success"
+    try:
+        yield trace_id
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start_time
+        span_duration.labels(name, outcome).observe(duration)
+        logger.debug(
+            f"🧭 span {name} [{trace_id}] {outcome} in {duration * 1000:.1f}ms",
+            extra={
+                "event": "span",
+                "function": name,
+                "duration_ms": round(duration * 1000, 3),
+                "outcome": outcome,
+                "parent_span": parent,
+            },
+        )
+        if samples is not None:
+            _profiler.stop(samples, name, trace_id, duration)
+        _span_name.reset(span_token)
+        _trace_id.reset(trace_token)
@@ -1,4 +1,3 @@
-import tweepy
 import json
 import random
 import schedule
@@ -23,13 +22,6 @@ ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
 ACCESS_TOKEN_SECRET = os.getenv("ACCESS_TOKEN_SECRET")
 
 
-client = tweepy.Client(
-    consumer_key=os.getenv("API_KEY"),
-    consumer_secret=os.getenv("API_SECRET"),
-    access_token=os.getenv("ACCESS_TOKEN"),
-    access_token_secret=os.getenv("ACCESS_TOKEN_SECRET")
-)
-
 # Option 1: Load quotes from a local file
 def load_local_quotes():
     with open("quotes.json", "r") as file:
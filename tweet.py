@@ -1,76 +1,142 @@
-import tweepy
-import json
 import os
+import signal
+import sys
+import threading
 from dotenv import load_dotenv
 import pytz
 from llm import generate_tweets_from_email
 from slack_bot import SlackTweetBot
-from slack_webhook import set_slack_bot
-from logger_config import get_logger, log_performance
+from tweet_queue import QUEUED, get_tweet_queue
+from logger_config import get_logger, log_performance, shutdown_logging
+from scheduler import SlotScheduler, parse_slots
 
-# Load environment variables
+# Load environment variables (GEMINI_API_KEY is read from the environment by llm)
 load_dotenv()
-os.environ["GEMINI_API_KEY"] = os.getenv("GEMINI_API_KEY")
 
 # Get logger for this module
 logger = get_logger("twitter")
 
-# X API credentials
-API_KEY = os.getenv("API_KEY")
-API_SECRET = os.getenv("API_SECRET")
-ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
-ACCESS_TOKEN_SECRET = os.getenv("ACCESS_TOKEN_SECRET")
+# Created on first use, so importing this module has no side effects
+_slack_bot = None
+_slack_bot_lock = threading.Lock()
 
-client = tweepy.Client(
-    consumer_key=os.getenv("API_KEY"),
-    consumer_secret=os.getenv("API_SECRET"),
-    access_token=os.getenv("ACCESS_TOKEN"),
-    access_token_secret=os.getenv("ACCESS_TOKEN_SECRET"),
-)
+timezone = pytz.timezone("Asia/Kolkata")
 
-# Initialize Slack bot
-slack_bot = SlackTweetBot()
-set_slack_bot(slack_bot)  # Set global reference for webhook handler
+# Tweets sent to Slack per run; above 1 they go out as one rate-limited batch
+APPROVAL_BATCH_SIZE = int(os.getenv("APPROVAL_BATCH_SIZE", "1"))
+# Send a batch as one digest message instead of one message per tweet
+APPROVAL_DIGEST = os.getenv("APPROVAL_DIGEST", "0") == "1"
 
-timezone = pytz.timezone("Asia/Kolkata")
+# Daemon schedule, in the timezone above
+POSTING_SLOTS = parse_slots(os.getenv("POSTING_SLOTS", "11:00,16:00,21:00"))
+GENERATION_INTERVAL_MIN = int(os.getenv("GENERATION_INTERVAL_MIN", "60"))
+SCHEDULE_JITTER_MIN = float(os.getenv("SCHEDULE_JITTER_MIN", "10"))
+SCHEDULE_CATCHUP_HOURS = float(os.getenv("SCHEDULE_CATCHUP_HOURS", "3"))
+
+# Held while Gemini is generating, so the generation job and an empty-queue
+# dispatch never process the same newsletters twice
+generation_lock = threading.Lock()
+
+
+def get_slack_bot():
+    """Get the Slack bot used to send tweets for approval"""
+    global _slack_bot
+    if _slack_bot is None:
+        with _slack_bot_lock:
+            if _slack_bot is None:
+                _slack_bot = SlackTweetBot()
+    return _slack_bot
+
+
+def dispatch_next_tweet(queue):
+    """Claim the next queued tweet and send it to Slack, returns True if sent"""
+    # Atomically claim the next tweet in queue (queued -> pending)
+    tweet_data = queue.pop()
+
+    if not tweet_data:
+        logger.warning("📭 No tweets in queue")
+        return False
+
+    tweet_text = tweet_data["text"]
+
+    # Send to Slack for approval, continuing the trace started at generation
+    message_ts = get_slack_bot().send_tweet_for_approval(
+        tweet_text, 0, tweet_id=tweet_data["id"], trace_id=tweet_data.get("trace_id")
+    )
+
+    if message_ts:
+        logger.info(f"✅ Tweet sent to Slack for approval: {tweet_text[:50]}...")
+        return True
+
+    logger.error("❌ Failed to send tweet to Slack")
+    queue.requeue(tweet_data["id"])
+    return False
+
+
+def dispatch_batch(queue, size):
+    """Claim up to `size` queued tweets and send them to Slack as a batch, returns the number sent"""
+    batch = []
+    while len(batch) < size:
+        tweet_data = queue.pop()
+        if not tweet_data:
+            break
+        batch.append(tweet_data)
+
+    if not batch:
+        logger.warning("📭 No tweets in queue")
+        return 0
+
+    if APPROVAL_DIGEST:
+        results = get_slack_bot().send_digest_for_approval(batch)
+    else:
+        results = get_slack_bot().send_batch_for_approval(batch)
+    for tweet_data, message_ts in zip(batch, results):
+        if not message_ts:
+            queue.requeue(tweet_data["id"])
+    return sum(1 for message_ts in results if message_ts)
 
 
 @log_performance
 def send_tweet_for_approval():
     """Send the next tweet to Slack for approval instead of posting directly"""
     try:
-        with open("generated_tweets.json", "r") as f:
-            tweets = json.load(f)
-
-        if tweets:
-            # Get the next tweet in queue
-            tweet_data = tweets[0]
-            tweet_text = (
-                tweet_data.get("tweet", "")
-                if isinstance(tweet_data, dict)
-                else tweet_data
-            )
-
-            # Send to Slack for approval
-            message_ts = slack_bot.send_tweet_for_approval(tweet_text, 0)
-
-            if message_ts:
-                logger.info(
-                    f"✅ Tweet sent to Slack for approval: {tweet_text[:50]}..."
-                )
-            else:
-                logger.error("❌ Failed to send tweet to Slack")
-
+        queue = get_tweet_queue()
+        # Pick up tweets left in the legacy JSON file (no-op once imported)
+        queue.import_json("generated_tweets.json")
+
+        # Only tweets still waiting to be sent count; posted and rejected ones stay in the table
+        if queue.count(QUEUED) == 0:
+            if not generation_lock.acquire(blocking=False):
+                logger.warning("📭 Tweet queue is empty and generation is already running")
+                return
+            logger.warning("📭 Tweet queue is empty. Generating new tweets...")
+            dispatched = []
+            dispatch_lock = threading.Lock()
+
+            def send_first_tweet(tweet_id, tweet_text):
+                # In stream mode this runs while the rest is still being generated,
+                # possibly from several pipeline workers at once
+                with dispatch_lock:
+                    if dispatched:
+                        return
+                    dispatched.append(tweet_id)
+                dispatch_next_tweet(queue)
+
+            on_tweet = send_first_tweet if APPROVAL_BATCH_SIZE <= 1 else None
+            try:
+                generated = generate_tweets_from_email(on_tweet=on_tweet)
+            finally:
+                generation_lock.release()
+            if generated is None:
+                return
+            if dispatched:
+                return
+
+        if APPROVAL_BATCH_SIZE > 1:
+            dispatch_batch(queue, APPROVAL_BATCH_SIZE)
         else:
-            logger.warning("📭 No tweets in queue. Generating new tweets...")
-            # generate_tweets_from_email()
-            # # Try again after generating
-            # send_tweet_for_approval()
+            dispatch_next_tweet(queue)
 
-    except FileNotFoundError:
-        logger.warning("📄 generated_tweets.json not found. Generating new tweets...")
-        generate_tweets_from_email()
-        send_tweet_for_approval()
     except Exception as e:
         logger.error(f"❌ An error occurred: {e}")
 
@@ -81,15 +147,55 @@ def post_generated_tweet():
     send_tweet_for_approval()
 
 
-# Generate tweets from email at the start
-logger.info("🚀 Starting tweet automation with Slack approval workflow...")
-logger.info("📧 Generating tweets from latest email...")
-# generate_tweets_from_email()
+def generate_new_tweets():
+    """Scheduled job: queue tweets for any newsletters that arrived since the last run"""
+    if not generation_lock.acquire(blocking=False):
+        logger.info("⏭️ Generation already running, skipping")
+        return
+    try:
+        generate_tweets_from_email()
+    finally:
+        generation_lock.release()
+
+
+def run_daemon():
+    """Stay resident and send tweets for approval at the configured slots"""
+    scheduler = SlotScheduler(
+        timezone,
+        jitter=SCHEDULE_JITTER_MIN * 60,
+        catchup_window=SCHEDULE_CATCHUP_HOURS * 3600,
+    )
+    scheduler.add_interval("generate", GENERATION_INTERVAL_MIN, generate_new_tweets)
+    scheduler.add_daily("dispatch", POSTING_SLOTS, post_generated_tweet)
+    # Build the Slack client now so every slot reuses the same warm connection
+    get_slack_bot()
+
+    def stop(signum, frame):
+        logger.info("🛑 Stopping scheduler...")
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for name, next_run in scheduler.next_runs().items():
+        logger.info(f"⏭️ {name}: next run {next_run:%Y-%m-%d %H:%M}")
+    # Returns after a running generation or dispatch has finished
+    scheduler.run_forever()
+    shutdown_logging()
+
+
+def main():
+    logger.info("🚀 Starting tweet automation with Slack approval workflow...")
+
+    if "--once" in sys.argv:
+        # One-shot mode: send the next tweet for approval and exit
+        logger.info("📨 Sending next tweet to Slack for approval...")
+        send_tweet_for_approval()
+    else:
+        logger.info("📱 Make sure to run the Slack webhook server: python slack_webhook.py")
+        logger.info("🔄 Bot will send tweets to Slack for approval at scheduled times")
+        run_daemon()
 
-# Send first tweet for approval
-logger.info("📨 Sending first tweet to Slack for approval...")
-send_tweet_for_approval()
 
-logger.info("✅ Tweet automation ready!")
-logger.info("📱 Make sure to run the Slack webhook server: python slack_webhook.py")
-logger.info("🔄 Bot will send tweets to Slack for approval at scheduled times")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from state_db import ensure_column, get_connection, transaction
+from logger_config import get_logger
+
+# Get logger for this module
+logger = get_logger("queue")
+
+# Tweet lifecycle: queued -> pending -> posted / rejected
+QUEUED = "queued"
+PENDING = "pending"
+POSTED = "posted"
+REJECTED = "rejected"
+
+# Tweet texts kept in memory by ID for resolving Slack button payloads
+INDEX_SIZE = int(os.getenv("TWEET_INDEX_SIZE", "10000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweet_queue (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    trace_id TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tweet_queue_status_seq ON tweet_queue (status, seq);
+CREATE TABLE IF NOT EXISTS tweet_queue_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def make_tweet_id(tweet_text):
+    """Build a stable tweet ID from the tweet content"""
+    return hashlib.sha256(tweet_text.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def _tweet_text(tweet_data):
+    """Extract tweet text from a generated tweet entry (dict or plain string)"""
+    if isinstance(tweet_data, dict):
+        return tweet_data.get("tweet", "")
+    return tweet_data
+
+
+def _tweet_id(tweet_data):
+    """ID assigned to a generated tweet entry at generation time, if any"""
+    if isinstance(tweet_data, dict):
+        return tweet_data.get("id")
+    return None
+
+
+class TweetQueue:
+    """Durable tweet queue backed by SQLite in WAL mode
+
+    Every lookup goes through an index (primary key or (status, seq)), so peek,
+    pop and remove stay O(log n) regardless of how many tweets are queued, and
+    state transitions are single conditional UPDATEs so the bot and webhook
+    processes can safely share the same database.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        ensure_column(conn, "tweet_queue", "trace_id", "TEXT")
+        # ID -> text; a tweet's text never changes for its ID, so this is safe to
+        # share with other processes writing the same database
+        self._texts = OrderedDict()
+        self._texts_lock = threading.Lock()
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def _row_to_dict(self, row):
+        if not row:
+            return None
+        record = dict(row)
+        self._remember(record["id"], record["text"])
+        return record
+
+    def _remember(self, tweet_id, tweet_text):
+        with self._texts_lock:
+            self._texts[tweet_id] = tweet_text
+            self._texts.move_to_end(tweet_id)
+            while len(self._texts) > INDEX_SIZE:
+                self._texts.popitem(last=False)
+
+    def text_for(self, tweet_id):
+        """Resolve a tweet ID to its text: in-memory index first, then the database"""
+        with self._texts_lock:
+            tweet_text = self._texts.get(tweet_id)
+        if tweet_text is not None:
+            return tweet_text
+        record = self.get(tweet_id)
+        return record["text"] if record else None
+
+    def enqueue(self, tweet_text, tweet_id=None, trace_id=None):
+        """Add a tweet to the end of the queue, returns its ID"""
+        tweet_id = tweet_id or make_tweet_id(tweet_text)
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR IGNORE INTO tweet_queue (id, text, status, trace_id, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (tweet_id, tweet_text, QUEUED, trace_id, now, now),
+        )
+        self._remember(tweet_id, tweet_text)
+        return tweet_id
+
+    def enqueue_many(self, tweets, trace_id=None):
+        """Add several tweets in one transaction, returns the number added"""
+        now = time.time()
+        conn = self._conn()
+        with transaction(conn):
+            before = conn.total_changes
+            for tweet_data in tweets:
+                tweet_text = _tweet_text(tweet_data)
+                if not tweet_text:
+                    continue
+                tweet_id = _tweet_id(tweet_data) or make_tweet_id(tweet_text)
+                conn.execute(
+                    "INSERT OR IGNORE INTO tweet_queue"
+                    " (id, text, status, trace_id, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (tweet_id, tweet_text, QUEUED, trace_id, now, now),
+                )
+                self._remember(tweet_id, tweet_text)
+            added = conn.total_changes - before
+        return added
+
+    def get(self, tweet_id):
+        """Get a tweet record by ID"""
+        row = self._conn().execute(
+            "SELECT * FROM tweet_queue WHERE id = ?", (tweet_id,)
+        ).fetchone()
+        return self._row_to_dict(row)
+
+    def get_by_text(self, tweet_text):
+        """Get a tweet record by its exact text"""
+        return self.get(make_tweet_id(tweet_text))
+
+    def peek(self):
+        """Return the next queued tweet without changing its state"""
+        row = self._conn().execute(
+            "SELECT * FROM tweet_queue WHERE status = ? ORDER BY seq LIMIT 1",
+            (QUEUED,),
+        ).fetchone()
+        return self._row_to_dict(row)
+
+    def pop(self):
+        """Atomically move the next queued tweet to pending and return it"""
+        conn = self._conn()
+        with transaction(conn):
+            row = conn.execute(
+                "SELECT * FROM tweet_queue WHERE status = ? ORDER BY seq LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE tweet_queue SET status = ?, updated_at = ? WHERE seq = ?",
+                (PENDING, now, row["seq"]),
+            )
+        record = self._row_to_dict(row)
+        record["status"] = PENDING
+        record["updated_at"] = now
+        return record
+
+    def transition(self, tweet_id, from_statuses, to_status):
+        """Move a tweet to a new status if it is currently in one of from_statuses"""
+        placeholders = ", ".join("?" for _ in from_statuses)
+        cursor = self._conn().execute(
+            f"UPDATE tweet_queue SET status = ?, updated_at = ?"
+            f" WHERE id = ? AND status IN ({placeholders})",
+            (to_status, time.time(), tweet_id, *from_statuses),
+        )
+        return cursor.rowcount == 1
+
+    def mark_posted(self, tweet_id):
+        # Queued is accepted too, for approval messages sent before the queue existed
+        return self.transition(tweet_id, (PENDING, QUEUED), POSTED)
+
+    def mark_rejected(self, tweet_id):
+        return self.transition(tweet_id, (PENDING, QUEUED), REJECTED)
+
+    def requeue(self, tweet_id):
+        """Put a pending tweet back in the queue (e.g. Slack delivery failed)"""
+        return self.transition(tweet_id, (PENDING,), QUEUED)
+
+    def remove(self, tweet_id):
+        """Delete a tweet from the queue entirely"""
+        cursor = self._conn().execute(
+            "DELETE FROM tweet_queue WHERE id = ?", (tweet_id,)
+        )
+        return cursor.rowcount == 1
+
+    def count(self, status=QUEUED):
+        """Number of tweets in the given status (None for all)"""
+        if status is None:
+            row = self._conn().execute("SELECT COUNT(*) FROM tweet_queue").fetchone()
+        else:
+            row = self._conn().execute(
+                "SELECT COUNT(*) FROM tweet_queue WHERE status = ?", (status,)
+            ).fetchone()
+        return row[0]
+
+    def stats(self):
+        """Number of tweets per status"""
+        rows = self._conn().execute(
+            "SELECT status, COUNT(*) AS n FROM tweet_queue GROUP BY status"
+        ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def import_json(self, path="generated_tweets.json"):
+        """One-shot import of a legacy generated_tweets.json file
+
+        The file's mtime is recorded, so calling this again is a cheap no-op
+        until the file changes. Tweets already known (by ID) are left untouched.
+        """
+        if not os.path.exists(path):
+            return 0
+
+        key = f"imported:{os.path.abspath(path)}"
+        mtime = str(os.path.getmtime(path))
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value FROM tweet_queue_meta WHERE key = ?", (key,)
+        ).fetchone()
+        if row and row["value"] == mtime:
+            return 0
+
+        try:
+            with open(path, "r") as f:
+                tweets = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Could not read {path} for import: {e}")
+            return 0
+
+        added = self.enqueue_many(tweets)
+        conn.execute(
+            "INSERT OR REPLACE INTO tweet_queue_meta (key, value) VALUES (?, ?)",
+            (key, mtime),
+        )
+        logger.info(f"📥 Imported {added} tweets from {path} into the queue")
+        return added
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_tweet_queue():
+    """Get the process-wide tweet queue"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = TweetQueue()
+    return _queue
+
+
+if __name__ == "__main__":
+    queue = get_tweet_queue()
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+
+    if command == "import":
+        path = sys.argv[2] if len(sys.argv) > 2 else "generated_tweets.json"
+        print(f"Imported {queue.import_json(path)} tweets from {path}")
+    elif command == "stats":
+        print(json.dumps(queue.stats(), indent=2))
+    else:
+        print("Usage: python tweet_queue.py [import [path] | stats]")
+        sys.exit(1)
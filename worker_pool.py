@@ -0,0 +1,115 @@
+import contextvars
+import queue
+import threading
+import time
+from logger_config import get_logger
+
+# Get logger for this module
+logger = get_logger("workers")
+
+_STOP = object()
+
+
+class WorkerPool:
+    """Bounded pool of background threads fed by a bounded job queue
+
+    Used to move slow work (X posts, Slack message updates) off request
+    threads. submit() never blocks: when the queue is full it returns False
+    so the caller can tell the user to retry instead of timing out.
+
+    Each job runs in a copy of the context it was submitted from, so it stays
+    in the submitter's trace.
+    """
+
+    def __init__(self, name, workers=4, max_queue=100):
+        self.name = name
+        self.workers = workers
+        self._jobs = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._closed = False
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"🧵 Started {self.workers} workers for {self.name}")
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                self._jobs.task_done()
+                return
+
+            fn, args, kwargs, context, enqueued_at = job
+            with self._lock:
+                self._active += 1
+            try:
+                wait = time.monotonic() - enqueued_at
+                logger.debug(f"▶️ {self.name}: {fn.__name__} started after {wait:.3f}s in queue")
+                context.run(fn, *args, **kwargs)
+                with self._lock:
+                    self._completed += 1
+            except Exception as e:
+                logger.error(f"💥 {self.name}: {fn.__name__} failed: {e}")
+                with self._lock:
+                    self._failed += 1
+            finally:
+                with self._lock:
+                    self._active -= 1
+                self._jobs.task_done()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) for a worker, returns False if the queue is full"""
+        if self._closed:
+            return False
+        self._ensure_started()
+        try:
+            self._jobs.put_nowait(
+                (fn, args, kwargs, contextvars.copy_context(), time.monotonic())
+            )
+            return True
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            logger.warning(f"🚧 {self.name} queue is full - rejecting {fn.__name__}")
+            return False
+
+    def depth(self):
+        """Number of jobs waiting for a worker"""
+        return self._jobs.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self._jobs.qsize(),
+                "queue_capacity": self._jobs.maxsize,
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and let workers drain what is already queued"""
+        self._closed = True
+        for _ in self._threads:
+            self._jobs.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        logger.info(f"🛑 {self.name} stopped")
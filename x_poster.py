@@ -0,0 +1,441 @@
+"""
+Rate-limit-aware posting engine for X
+
+Approved tweets go into a persistent outbox in the shared state database
+instead of being posted inline. A background worker drains it:
+
+- transient failures (5xx, timeouts) retry with exponential backoff and jitter
+- 429 responses pause all posting until the x-rate-limit-reset time
+- a local ledger of successful posts enforces the 15-minute and daily quotas,
+  so requests that X would refuse are never sent
+- permanent errors (4xx such as duplicate content or bad credentials) fail
+  the job once
+
+Jobs survive restarts, and several processes can drain the same outbox
+because claiming a job is a single conditional UPDATE.
+
+The API base URL comes from X_API_BASE_URL, so the engine can be pointed at
+x_stub_server.py for testing.
+"""
+
+import os
+import random
+import threading
+import time
+import requests
+from dotenv import load_dotenv
+from clients import X_TIMEOUT, get_x_session
+from logger_config import get_logger, log_performance
+from state_db import get_connection, transaction
+from tracing import span
+
+load_dotenv()
+
+# Get logger for this module
+logger = get_logger("twitter")
+
+X_API_BASE_URL = os.getenv("X_API_BASE_URL", "https://api.twitter.com")
+X_QUOTA_15MIN = int(os.getenv("X_QUOTA_15MIN", "50"))
+X_QUOTA_DAILY = int(os.getenv("X_QUOTA_DAILY", "100"))
+X_MAX_ATTEMPTS = int(os.getenv("X_MAX_ATTEMPTS", "8"))
+X_BACKOFF_BASE = float(os.getenv("X_BACKOFF_BASE", "2"))
+X_BACKOFF_MAX = float(os.getenv("X_BACKOFF_MAX", "900"))
+
+# Outbox job states
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# A job stuck in "sending" this long belongs to a process that died mid-request
+SENDING_TIMEOUT = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS x_outbox (
+    job_id TEXT PRIMARY KEY,
+    tweet_id TEXT,
+    text TEXT NOT NULL,
+    message_ts TEXT,
+    action TEXT NOT NULL DEFAULT 'approved',
+    trace_id TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    x_tweet_id TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_x_outbox_status_due ON x_outbox (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS x_post_log (
+    posted_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_x_post_log_posted_at ON x_post_log (posted_at);
+CREATE TABLE IF NOT EXISTS x_rate_state (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+class XTransport:
+    """Minimal X API v2 client (OAuth 1.0a user context) on the shared keep-alive session"""
+
+    def __init__(self, base_url=None, timeout=None, session=None):
+        self.base_url = (base_url or X_API_BASE_URL).rstrip("/")
+        self.timeout = timeout or X_TIMEOUT
+        self._session = session
+
+    @property
+    def session(self):
+        """The signed session; raises RuntimeError if the X credentials are missing"""
+        if self._session is None:
+            self._session = get_x_session()
+        return self._session
+
+    def create_tweet(self, text):
+        """POST /2/tweets, returns the requests.Response"""
+        return self.session.post(
+            f"{self.base_url}/2/tweets",
+            json={"text": text},
+            timeout=self.timeout,
+        )
+
+
+class QuotaLedger:
+    """Local record of posts and server-imposed pauses, shared across processes"""
+
+    def __init__(self, db_path=None, per_15min=None, per_day=None):
+        self.db_path = db_path
+        self.per_15min = per_15min or X_QUOTA_15MIN
+        self.per_day = per_day or X_QUOTA_DAILY
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def record_post(self, now=None):
+        now = now or time.time()
+        conn = self._conn()
+        conn.execute("INSERT INTO x_post_log (posted_at) VALUES (?)", (now,))
+        # Nothing older than the daily window is ever needed again
+        conn.execute("DELETE FROM x_post_log WHERE posted_at < ?", (now - 86400,))
+
+    def block_until(self, until):
+        """Refuse to post until the given epoch time (from a 429 or an exhausted quota header)"""
+        self._conn().execute(
+            "INSERT INTO x_rate_state (key, value) VALUES ('blocked_until', ?)"
+            " ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)",
+            (until,),
+        )
+
+    def wait_time(self, now=None):
+        """Seconds until the next post is allowed (0 if one is allowed now)"""
+        now = now or time.time()
+        conn = self._conn()
+        waits = [0.0]
+
+        row = conn.execute("SELECT value FROM x_rate_state WHERE key = 'blocked_until'").fetchone()
+        if row and row["value"] > now:
+            waits.append(row["value"] - now)
+
+        for window, limit in ((900, self.per_15min), (86400, self.per_day)):
+            rows = conn.execute(
+                "SELECT posted_at FROM x_post_log WHERE posted_at > ? ORDER BY posted_at DESC LIMIT ?",
+                (now - window, limit),
+            ).fetchall()
+            if len(rows) >= limit:
+                # The oldest of the last `limit` posts has to leave the window first
+                waits.append(rows[-1]["posted_at"] + window - now)
+        return max(waits)
+
+    def usage(self, now=None):
+        now = now or time.time()
+        conn = self._conn()
+        last_15min = conn.execute(
+            "SELECT COUNT(*) FROM x_post_log WHERE posted_at > ?", (now - 900,)
+        ).fetchone()[0]
+        last_day = conn.execute(
+            "SELECT COUNT(*) FROM x_post_log WHERE posted_at > ?", (now - 86400,)
+        ).fetchone()[0]
+        return {
+            "last_15min": last_15min,
+            "limit_15min": self.per_15min,
+            "last_day": last_day,
+            "limit_day": self.per_day,
+            "wait_s": round(self.wait_time(now), 1),
+        }
+
+
+class XOutbox:
+    """Persistent queue of tweets waiting to be posted"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def add(self, job_id, text, tweet_id=None, message_ts=None, action="approved", trace_id=None):
+        """Add a job, returns False if a job with this ID already exists"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT OR IGNORE INTO x_outbox"
+            " (job_id, tweet_id, text, message_ts, action, trace_id, status,"
+            " next_attempt_at, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, tweet_id, text, message_ts, action, trace_id, PENDING, now, now, now),
+        )
+        return cursor.rowcount == 1
+
+    def claim_due(self, now=None):
+        """Atomically move the oldest due job to "sending" and return it"""
+        now = now or time.time()
+        conn = self._conn()
+        with transaction(conn):
+            row = conn.execute(
+                "SELECT * FROM x_outbox WHERE status = ? AND next_attempt_at <= ?"
+                " ORDER BY next_attempt_at LIMIT 1",
+                (PENDING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE x_outbox SET status = ?, updated_at = ? WHERE job_id = ?",
+                (SENDING, now, row["job_id"]),
+            )
+        job = dict(row)
+        job["status"] = SENDING
+        return job
+
+    def next_due_at(self):
+        row = self._conn().execute(
+            "SELECT MIN(next_attempt_at) FROM x_outbox WHERE status = ?", (PENDING,)
+        ).fetchone()
+        return row[0]
+
+    def mark_sent(self, job_id, x_tweet_id):
+        self._conn().execute(
+            "UPDATE x_outbox SET status = ?, x_tweet_id = ?, last_error = NULL, updated_at = ?"
+            " WHERE job_id = ?",
+            (SENT, x_tweet_id, time.time(), job_id),
+        )
+
+    def retry_at(self, job_id, when, error, count_attempt=True):
+        self._conn().execute(
+            "UPDATE x_outbox SET status = ?, next_attempt_at = ?, last_error = ?,"
+            " attempts = attempts + ?, updated_at = ? WHERE job_id = ?",
+            (PENDING, when, error, 1 if count_attempt else 0, time.time(), job_id),
+        )
+
+    def mark_failed(self, job_id, error):
+        self._conn().execute(
+            "UPDATE x_outbox SET status = ?, last_error = ?, attempts = attempts + 1,"
+            " updated_at = ? WHERE job_id = ?",
+            (FAILED, error, time.time(), job_id),
+        )
+
+    def recover_stale(self, now=None):
+        """Return jobs abandoned in "sending" by a dead process to the queue"""
+        now = now or time.time()
+        cursor = self._conn().execute(
+            "UPDATE x_outbox SET status = ?, next_attempt_at = ?, updated_at = ?"
+            " WHERE status = ? AND updated_at < ?",
+            (PENDING, now, now, SENDING, now - SENDING_TIMEOUT),
+        )
+        return cursor.rowcount
+
+    def stats(self):
+        rows = self._conn().execute(
+            "SELECT status, COUNT(*) AS n FROM x_outbox GROUP BY status"
+        ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with jitter: half fixed, half random, capped at X_BACKOFF_MAX"""
+    delay = min(X_BACKOFF_MAX, X_BACKOFF_BASE * 2 ** max(0, attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+@log_performance
+def post_tweet_to_twitter(transport, text):
+    """Send one tweet to X (timed under the name log_query.py reports on)"""
+    return transport.create_tweet(text)
+
+
+def _posted_tweet_id(response):
+    """ID of the created tweet, or None if the 2xx body is not the JSON we expect"""
+    try:
+        return ((response.json() or {}).get("data") or {}).get("id")
+    except (ValueError, AttributeError):
+        return None
+
+
+def _header_time(response, name):
+    try:
+        return float(response.headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class XPostingEngine:
+    """Background worker that drains the outbox within X's rate limits
+
+    on_posted(job, x_tweet_id) and on_failed(job, error) are called from the
+    worker thread once a job is finished either way.
+    """
+
+    def __init__(self, outbox=None, ledger=None, transport=None, poll_interval=5.0):
+        self.outbox = outbox or XOutbox()
+        self.ledger = ledger or QuotaLedger()
+        self.transport = transport or XTransport()
+        self.poll_interval = poll_interval
+        self.on_posted = None
+        self.on_failed = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, on_posted=None, on_failed=None):
+        """Start the worker thread (idempotent) and register completion callbacks
+
+        Raises RuntimeError if the X credentials are missing, instead of
+        failing every post later on.
+        """
+        self.on_posted = on_posted or self.on_posted
+        self.on_failed = on_failed or self.on_failed
+        with self._lock:
+            if self._thread is None:
+                # Raises here, once, when the X credentials are missing
+                self.transport.session
+                recovered = self.outbox.recover_stale()
+                if recovered:
+                    logger.warning(f"♻️ Recovered {recovered} interrupted X post(s)")
+                self._thread = threading.Thread(target=self._run, name="x-poster", daemon=True)
+                self._thread.start()
+                logger.info(f"🐦 X posting engine started ({X_API_BASE_URL})")
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def submit(self, job_id, text, tweet_id=None, message_ts=None, action="approved", trace_id=None):
+        """Persist a tweet for posting; returns False if the job was already submitted"""
+        added = self.outbox.add(job_id, text, tweet_id, message_ts, action, trace_id)
+        if added:
+            wait = self.ledger.wait_time()
+            if wait > 0:
+                logger.info(f"⏳ X quota reached - tweet queued, next post in {wait:.0f}s")
+            self._wakeup.set()
+        return added
+
+    def _sleep(self, seconds):
+        self._wakeup.wait(max(0.05, seconds))
+        self._wakeup.clear()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                wait = self.ledger.wait_time()
+                if wait > 0:
+                    self._sleep(min(wait, self.poll_interval * 12))
+                    continue
+
+                job = self.outbox.claim_due()
+                if job is None:
+                    next_due = self.outbox.next_due_at()
+                    delay = self.poll_interval if next_due is None else next_due - time.time()
+                    self._sleep(min(delay, self.poll_interval))
+                    continue
+
+                self._post(job)
+            except Exception as e:
+                logger.error(f"💥 X posting engine error: {e}")
+                self._sleep(self.poll_interval)
+
+    def _post(self, job):
+        with span("post_tweet_to_twitter", trace_id=job["trace_id"]):
+            extra = {"tweet_id": job["tweet_id"], "message_ts": job["message_ts"]}
+            try:
+                response = post_tweet_to_twitter(self.transport, job["text"])
+            except requests.RequestException as e:
+                self._retry(job, f"network error: {e}")
+                return
+            except Exception as e:
+                # Anything else (e.g. credentials OAuth1 cannot sign with) fails the same way
+                # on every attempt, so the job must not be retried or stranded in "sending"
+                self._fail(job, f"client error: {e}")
+                return
+
+            now = time.time()
+            if 200 <= response.status_code < 300:
+                # The tweet is live: record that before anything else can go wrong,
+                # or a restart would post it a second time
+                x_tweet_id = _posted_tweet_id(response)
+                self.outbox.mark_sent(job["job_id"], x_tweet_id)
+                self.ledger.record_post(now)
+                # X also reports the remaining 24h posting allowance; stop before it runs out
+                if response.headers.get("x-user-limit-24hour-remaining") == "0":
+                    reset = _header_time(response, "x-user-limit-24hour-reset")
+                    if reset:
+                        self.ledger.block_until(reset)
+                logger.info(f"✅ Tweet posted to Twitter: {job['text'][:50]}...", extra=extra)
+                if self.on_posted:
+                    self.on_posted(job, x_tweet_id)
+
+            elif response.status_code == 429:
+                reset = (
+                    _header_time(response, "x-rate-limit-reset")
+                    or _header_time(response, "x-user-limit-24hour-reset")
+                    or now + 60
+                )
+                self.ledger.block_until(reset)
+                # A 429 is not the tweet's fault, so it does not use up an attempt
+                self.outbox.retry_at(job["job_id"], reset, "rate limited (429)", count_attempt=False)
+                logger.warning(f"🚦 X rate limit hit - posting paused for {reset - now:.0f}s", extra=extra)
+
+            elif response.status_code >= 500:
+                self._retry(job, f"HTTP {response.status_code}")
+
+            else:
+                # Any other 4xx (duplicate, unauthorized, forbidden...) will not change on retry
+                self._fail(job, f"HTTP {response.status_code}: {response.text[:200]}")
+
+    def _fail(self, job, error):
+        self.outbox.mark_failed(job["job_id"], error)
+        logger.error(
+            f"❌ X refused tweet: {error}",
+            extra={"tweet_id": job["tweet_id"], "message_ts": job["message_ts"]},
+        )
+        if self.on_failed:
+            self.on_failed(job, error)
+
+    def _retry(self, job, error):
+        attempts = job["attempts"] + 1
+        if attempts >= X_MAX_ATTEMPTS:
+            self._fail(job, f"gave up after {attempts} attempts: {error}")
+            return
+        delay = backoff_delay(attempts)
+        self.outbox.retry_at(job["job_id"], time.time() + delay, error)
+        logger.warning(f"🔁 X post failed ({error}), retry {attempts} in {delay:.1f}s")
+
+    def stats(self):
+        return {"outbox": self.outbox.stats(), "quota": self.ledger.usage()}
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_x_engine():
+    """Get the process-wide X posting engine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = XPostingEngine()
+    return _engine
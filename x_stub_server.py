@@ -0,0 +1,99 @@
+"""
+Local stand-in for the X API's POST /2/tweets, for exercising x_poster.py
+
+Enforces a 15-minute and a daily post limit (429 with x-rate-limit-reset),
+rejects duplicate text with 403 like X does, and fails a configurable share
+of requests with 503 to exercise retries.
+
+    python x_stub_server.py --port 5010 --limit-15min 5 --fail-rate 0.2
+    X_API_BASE_URL=http://127.0.0.1:5010 API_KEY=stub API_SECRET=stub \
+        ACCESS_TOKEN=stub ACCESS_TOKEN_SECRET=stub python slack_webhook.py
+
+The stub does not check OAuth signatures, but the engine refuses to start
+without credentials, so any non-empty values will do.
+"""
+
+import argparse
+import itertools
+import random
+import threading
+import time
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+
+config = {"limit_15min": 50, "limit_day": 100, "fail_rate": 0.0, "window_scale": 1.0}
+state = {"posts": [], "texts": set(), "responses": {}}
+lock = threading.Lock()
+ids = itertools.count(1)
+
+
+def count(status):
+    state["responses"][status] = state["responses"].get(status, 0) + 1
+
+
+@app.route("/2/tweets", methods=["POST"])
+def create_tweet():
+    text = (request.get_json(silent=True) or {}).get("text", "")
+    now = time.time()
+    window_15min = 900 * config["window_scale"]
+    window_day = 86400 * config["window_scale"]
+
+    with lock:
+        if random.random() < config["fail_rate"]:
+            count(503)
+            return jsonify({"title": "Service Unavailable"}), 503
+
+        recent = [t for t in state["posts"] if t > now - window_15min]
+        today = [t for t in state["posts"] if t > now - window_day]
+        if len(recent) >= config["limit_15min"] or len(today) >= config["limit_day"]:
+            window, posts = (window_15min, recent) if len(recent) >= config["limit_15min"] else (window_day, today)
+            reset = int(posts[0] + window) + 1
+            count(429)
+            return (
+                jsonify({"title": "Too Many Requests"}),
+                429,
+                {"x-rate-limit-reset": str(reset), "x-rate-limit-remaining": "0"},
+            )
+
+        if text in state["texts"]:
+            count(403)
+            return jsonify({"detail": "You are not allowed to create a Tweet with duplicate content."}), 403
+
+        state["posts"].append(now)
+        state["texts"].add(text)
+        count(201)
+        remaining = config["limit_day"] - len(today) - 1
+        return (
+            jsonify({"data": {"id": str(next(ids)), "text": text}}),
+            201,
+            {
+                "x-user-limit-24hour-remaining": str(remaining),
+                "x-user-limit-24hour-reset": str(int(now + window_day)),
+            },
+        )
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    with lock:
+        return jsonify({"posted": len(state["posts"]), "responses": state["responses"]})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub X API for testing the posting engine")
+    parser.add_argument("--port", type=int, default=5010)
+    parser.add_argument("--limit-15min", type=int, default=50)
+    parser.add_argument("--limit-day", type=int, default=100)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered 503")
+    parser.add_argument(
+        "--window-scale", type=float, default=1.0, help="shrink the rate windows (0.01 = 9s / 864s)"
+    )
+    args = parser.parse_args()
+    config.update(
+        limit_15min=args.limit_15min,
+        limit_day=args.limit_day,
+        fail_rate=args.fail_rate,
+        window_scale=args.window_scale,
+    )
+    app.run(host="127.0.0.1", port=args.port, threaded=True)